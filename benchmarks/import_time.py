@@ -0,0 +1,144 @@
+'''Benchmark measuring the time it takes to import modules of schema classes.
+
+Run from the root directory of the repository:
+
+.. code-block:: sh
+
+    python -m benchmarks.import_time                  # 3000 classes
+    python -m benchmarks.import_time --classes 10000  # more classes
+    python -m benchmarks.import_time --profile        # where is time spent?
+
+This generates the source code of a module defining lots of schema classes
+(a mix of plain schemas, schemas inheriting from other schemas and schemas
+using ``__lima_args__``) and measures how long it takes to execute the
+module's (already compiled) code - just like importing it from a cached
+bytecode file would. The same module with a plain class standing in for
+``Schema`` (same classes, same fields, no schema machinery) is measured for
+reference, so the difference is what lima's schema class creation costs.
+Both are reported as the median of several runs.
+
+'''
+import argparse
+import cProfile
+import gc
+import pstats
+import statistics
+import sys
+import textwrap
+import time
+
+import lima
+
+
+TEMPLATES = [
+    '''\
+class Schema{i}(Schema):
+    f0 = fields.String()
+{fields}
+''',
+    '''\
+class Schema{i}(Schema{prev}):
+    extra = fields.Integer()
+''',
+    '''\
+class Schema{i}(Schema{prev}):
+    __lima_args__ = {{'exclude': ['f0', 'extra']}}
+    other = fields.Embed(schema='Schema{prev}')
+''',
+    '''\
+class Schema{i}(Schema{prev}):
+    __lima_args__ = {{'only': ['f1', 'other'],
+                      'include': {{'at__id': fields.Integer()}}}}
+''',
+]
+'''Templates of schema classes, used in turn (each one based on the last).'''
+
+
+HEADER = 'from lima import fields\nfrom lima.schema import Schema\n\n'
+'''Header of the generated module.'''
+
+PLAIN_HEADER = 'from lima import fields\n\n\nclass Schema:\n    pass\n\n'
+'''Header of the generated module without schema machinery (for reference).'''
+
+
+def generate(class_count, field_count, plain=False):
+    '''Return the source code of a module defining class_count classes.
+
+    If plain is True(ish), ``Schema`` is a plain class, so the classes are
+    created without lima's schema machinery.
+
+    '''
+    field_lines = ''.join('    f{} = fields.String()\n'.format(j)
+                          for j in range(1, field_count))
+    chunks = [PLAIN_HEADER if plain else HEADER]
+    for i in range(class_count):
+        tpl = TEMPLATES[i % len(TEMPLATES)]
+        chunks.append('\n' + tpl.format(i=i, prev=i - 1, fields=field_lines))
+    return ''.join(chunks)
+
+
+def measure(codes, repeat=5):
+    '''Return the median times (in seconds) it takes to execute codes.
+
+    Runs of the codes are interleaved (so things like CPU frequency changes
+    affect all of them alike), with garbage collection disabled.
+
+    '''
+    times = [[] for code in codes]
+    for run in range(repeat):
+        for code, code_times in zip(codes, times):
+            # a new module name per run (classes get registered by name)
+            namespace = {'__name__': 'benchmarks._import_time_{}'.format(run)}
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                exec(code, namespace)
+                code_times.append(time.perf_counter() - start)
+            finally:
+                gc.enable()
+    return [statistics.median(code_times) for code_times in times]
+
+
+def main(args=None):
+    '''Entry point of ``python -m benchmarks.import_time``.'''
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.import_time',
+        description='Measure the time it takes to create schema classes.'
+    )
+    parser.add_argument('--classes', type=int, default=3000,
+                        help='number of schema classes (default: 3000)')
+    parser.add_argument('--fields', type=int, default=10,
+                        help='number of fields per base schema (default: 10)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of measurements (default: 5)')
+    parser.add_argument('--profile', action='store_true',
+                        help='print a profile of schema class creation')
+    args = parser.parse_args(args)
+
+    source = generate(args.classes, args.fields)
+    code = compile(source, '<schemas>', 'exec')
+    reference = compile(generate(args.classes, args.fields, plain=True),
+                        '<plain>', 'exec')
+
+    print('lima {}: {} schema classes\n'.format(lima.__version__,
+                                                args.classes))
+    total, plain = measure([code, reference], args.repeat)
+    schemas = total - plain
+    print(textwrap.dedent('''\
+        total:          {:>10.1f} ms
+        plain classes:  {:>10.1f} ms
+        schema classes: {:>10.1f} ms ({:.1f} us per class)\
+    ''').format(total * 1e3, plain * 1e3, schemas * 1e3,
+                schemas / args.classes * 1e6))
+
+    if args.profile:
+        profile = cProfile.Profile()
+        profile.runcall(exec, code, {'__name__': 'benchmarks._import_time'})
+        print()
+        pstats.Stats(profile).sort_stats('tottime').print_stats(15)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
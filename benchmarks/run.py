@@ -0,0 +1,226 @@
+'''Benchmarks measuring the throughput of Schema.dump.
+
+Run from the root directory of the repository:
+
+.. code-block:: sh
+
+    python -m benchmarks.run                          # run all benchmarks
+    python -m benchmarks.run --quick                  # skip the slowest ones
+    python -m benchmarks.run -k many                  # only matching names
+    python -m benchmarks.run --save baseline.json     # save results
+    python -m benchmarks.run --compare baseline.json  # compare to baseline
+
+Every benchmark varies one aspect of a base case (a schema with 10 fields
+getting values via ``attr``, no nesting, dumping 1000 objects, unordered).
+Since the base case has no nesting, other kinds of links than ``Embed`` are
+measured at every nesting depth instead (like ``depth=1,link=reference``). For
+every benchmark, the number of objects marshalled per second (ops/sec) and the
+time it takes to marshal a single object (latency) are reported.
+
+When comparing to a baseline, benchmarks whose throughput dropped by more than
+the threshold (see ``--threshold``) are reported as regressions and the
+process exits with a status of 1. Note that results are only comparable if
+they were measured on the same machine with the same Python version.
+
+'''
+import argparse
+import json
+import platform
+import sys
+import timeit
+from collections import OrderedDict
+
+import lima
+from lima import fields
+
+
+BASE = dict(field_count=10, depth=0, link='embed', many=1000, ordered=False,
+            access='attr')
+'''The parameters of the base case all benchmarks are derived from.'''
+
+VARIATIONS = [
+    ('field_count', [1, 10, 50, 100, 500]),
+    ('depth', [1, 2, 3]),
+    ('many', [1, 100, 10000, 100000, 1000000]),
+    ('ordered', [True]),
+    ('access', ['key', 'get', 'val']),
+]
+'''Parameters to vary (one at a time), along with the values to try.'''
+
+LINKS = ['reference']
+'''Links to try (instead of ``embed``) at every depth in VARIATIONS.'''
+
+SLOW = {('many', 100000), ('many', 1000000)}
+'''Variations skipped when running with ``--quick``.'''
+
+
+class Obj:
+    '''An object with attributes f0 ... fN (and maybe a linked object).'''
+    def __init__(self, field_count, child=None):
+        for i in range(field_count):
+            setattr(self, 'f{}'.format(i), i)
+        self.child = child
+
+
+def _make_obj(field_count, depth, access):
+    '''Return an object (a dict for key access) with depth linked objects.'''
+    child = None
+    for level in range(depth + 1):
+        obj = Obj(field_count, child)
+        if access == 'key':
+            obj = dict(vars(obj))
+        child = obj
+    return obj
+
+
+def _make_field(access, i):
+    '''Return an integer field getting its value via access.'''
+    name = 'f{}'.format(i)
+    if access == 'attr':
+        return fields.Integer(attr=name)
+    if access == 'key':
+        return fields.Integer(key=name)
+    if access == 'get':
+        return fields.Integer(get=lambda obj: i)
+    return fields.Integer(val=i)
+
+
+def _make_schema(field_count, depth, link, many, ordered, access):
+    '''Return a schema object for the parameters specified.'''
+    schema = None
+    for level in range(depth + 1):
+        include = OrderedDict(
+            ('f{}'.format(i), _make_field(access, i))
+            for i in range(field_count)
+        )
+        if schema is not None:
+            kwargs = {'key': 'child'} if access == 'key' else {}
+            if link == 'embed':
+                include['child'] = fields.Embed(schema=schema, **kwargs)
+            else:
+                include['child'] = fields.Reference(schema=schema, field='f0',
+                                                    **kwargs)
+        is_root = level == depth
+        schema = lima.Schema(include=include,
+                             many=is_root and many != 1,
+                             ordered=ordered)
+    return schema
+
+
+def benchmarks(quick=False, pattern=None):
+    '''Yield (name, params)-tuples of the benchmarks to run.'''
+    cases = [('base', BASE)]
+    for param, values in VARIATIONS:
+        for value in values:
+            if value == BASE[param] or (quick and (param, value) in SLOW):
+                continue
+            name = '{}={}'.format(param, value)
+            cases.append((name, dict(BASE, **{param: value})))
+    for link in LINKS:
+        for depth in dict(VARIATIONS)['depth']:
+            name = 'depth={},link={}'.format(depth, link)
+            cases.append((name, dict(BASE, depth=depth, link=link)))
+    for name, params in cases:
+        if pattern is None or pattern in name:
+            yield name, params
+
+
+def measure(params, min_time=0.2, repeat=3):
+    '''Return the best time (in seconds) a dump takes for params.'''
+    schema = _make_schema(**params)
+    obj = _make_obj(params['field_count'], params['depth'], params['access'])
+    if params['many'] != 1:
+        obj = [obj] * params['many']
+    dump = schema.dump
+    dump(obj)  # create dump functions
+
+    timer = timeit.Timer(lambda: dump(obj))
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(quick=False, pattern=None, min_time=0.2):
+    '''Run benchmarks and return the results (see main).'''
+    results = OrderedDict()
+    for name, params in benchmarks(quick, pattern):
+        seconds = measure(params, min_time)
+        results[name] = {
+            'ops': params['many'] / seconds,
+            'latency': seconds / params['many'],
+        }
+        _report(name, results[name])
+    return results
+
+
+def _report(name, result, baseline=None):
+    '''Write a line describing a result to stdout.'''
+    line = '{:<24} {:>14,.0f} ops/sec {:>10.3f} us/obj'.format(
+        name, result['ops'], result['latency'] * 1e6
+    )
+    if baseline is not None:
+        line += ' {:>+8.1%}'.format(result['ops'] / baseline['ops'] - 1)
+    print(line, flush=True)
+
+
+def compare(results, baseline, threshold):
+    '''Return the names of benchmarks slower than in baseline.'''
+    print('\nCompared to baseline:')
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        _report(name, result, baseline[name])
+        if result['ops'] < baseline[name]['ops'] * (1 - threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main(args=None):
+    '''Entry point of ``python -m benchmarks.run``.'''
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Measure the throughput of lima.Schema.dump.'
+    )
+    parser.add_argument('-k', metavar='pattern', dest='pattern',
+                        help='only run benchmarks with names containing this')
+    parser.add_argument('--quick', action='store_true',
+                        help='skip the slowest benchmarks')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        metavar='seconds',
+                        help='minimum duration of a measurement')
+    parser.add_argument('--save', metavar='file',
+                        help='save results to a JSON file')
+    parser.add_argument('--compare', metavar='file',
+                        help='compare results to a JSON file saved before')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown considered a regression '
+                             '(default: 0.1)')
+    args = parser.parse_args(args)
+
+    print('lima {} on {} {}\n'.format(lima.__version__,
+                                      platform.python_implementation(),
+                                      platform.python_version()))
+    results = run(args.quick, args.pattern, args.min_time)
+
+    if args.save is not None:
+        data = {
+            'lima': lima.__version__,
+            'python': platform.python_version(),
+            'results': results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('\nRegressions: {}'.format(', '.join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,6 +4,6 @@
 from lima import exc
 from lima import fields
 from lima import schema
-from lima.schema import Schema
+from lima.schema import Schema, warmup
 
 __version__ = '0.6.dev0'
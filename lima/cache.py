@@ -0,0 +1,283 @@
+'''Caching marshalled representations of objects across dumps.
+
+Schema objects created with a :class:`ResultCache` (``Schema(cache=...)``)
+look up the marshalled representation of every object they dump in this
+cache before actually marshalling it - in ``many`` mode as well as for
+objects linked via :class:`lima.fields.Embed` fields whose schemas have a
+cache. An example:
+
+.. code-block:: python
+
+    from lima import cache
+
+    product_cache = cache.ResultCache(
+        key=lambda product: product.id,
+        version=lambda product: product.updated_at,
+        maxsize=10000,
+        ttl=60,
+    )
+    product_schema = ProductSchema(many=True, cache=product_cache)
+    product_schema.dump(products)  # marshals products
+    product_schema.dump(products)  # takes results from the cache
+    product_cache.stats()
+    # {'hits': 1000, 'misses': 1000, 'stale': 0, 'hit_rate': 0.5}
+
+Cached results are keyed by a fingerprint of the schema object (see
+:meth:`ResultCache.wrap`) and the key of the object. If a ``version``
+function is provided, a cached result is only used if the object's version
+did not change since the result was cached.
+
+Results taken from the cache are the very same objects for every dump, so
+don't modify them in place.
+
+'''
+import inspect
+import threading
+import time
+
+from lima import util
+
+
+token_cache_size = 256
+'''The maximum number of schema fingerprints a :class:`ResultCache` tracks.
+
+Every distinct fingerprint (see :meth:`ResultCache.wrap`) gets a token used
+in the keys of cached results. Tokens of the least recently wrapped
+fingerprints get forgotten, so schema objects created over and over with
+new fields (like via ``include``) don't keep their fields alive forever.
+Schema objects wrapped before keep using their tokens; only new schema
+objects with a forgotten fingerprint don't share their results. Changes
+only affect result caches created afterwards.
+
+'''
+
+
+class CacheBackend:
+    '''Base class for storages of cached results (see :class:`ResultCache`).
+
+    A backend is a mapping of hashable keys to values that may forget
+    entries at any time (to limit its size or because they expired).
+    Implement :meth:`get`, :meth:`set` and :meth:`clear` to store results
+    elsewhere (like in shared memory). Backends must be thread-safe.
+
+    '''
+    def get(self, key):
+        '''Return the value stored for key (or None if there is none).'''
+        raise NotImplementedError
+
+    def set(self, key, value):
+        '''Store value for key.'''
+        raise NotImplementedError
+
+    def clear(self):
+        '''Remove all entries.'''
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    '''An in-process backend with least-recently-used eviction.
+
+    Args:
+        maxsize: The maximum number of entries. When adding an entry to a full
+            backend, the least recently used entry gets evicted.
+
+        ttl: An optional number of seconds after which entries expire.
+            Defaults to ``None`` (entries never expire).
+
+    '''
+    def __init__(self, maxsize=1024, ttl=None):
+        if ttl is not None and ttl <= 0:
+            raise ValueError('ttl must be positive: {!r}'.format(ttl))
+        self._lru = util.LRUCache(maxsize)
+        self.ttl = ttl
+
+    def __len__(self):
+        return len(self._lru)
+
+    def get(self, key):
+        '''Return the value stored for key (or None if there is none).'''
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires is not None and expires < time.monotonic():
+            self._lru.pop(key)
+            return None
+        return value
+
+    def set(self, key, value):
+        '''Store value for key.'''
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        self._lru.set(key, (expires, value))
+
+    def clear(self):
+        '''Remove all entries.'''
+        self._lru.clear()
+
+
+class _Token:
+    '''A token standing in for a fingerprint in cache keys.'''
+    __slots__ = ()
+
+
+class ResultCache:
+    '''A cache of marshalled representations of objects.
+
+    Args:
+        key: A function returning a hashable key for an object to dump (like
+            ``lambda obj: obj.id``). Objects with equal keys are considered
+            to be the same object.
+
+        version: An optional function returning the version of an object to
+            dump (like ``lambda obj: obj.updated_at``). Results cached for
+            another version of an object are not used. Defaults to ``None``
+            (results are used as long as they are cached).
+
+        maxsize: The maximum number of cached results (if no ``backend`` is
+            provided). Defaults to 1024.
+
+        ttl: An optional number of seconds after which cached results expire
+            (if no ``backend`` is provided). Defaults to ``None``.
+
+        backend: An optional :class:`CacheBackend` to store results in.
+            Defaults to a :class:`MemoryBackend` with ``maxsize`` and
+            ``ttl``.
+
+    A single cache can be shared by multiple schema objects (results are
+    keyed by schema as well). Use :meth:`stats` to find out how well the
+    cache works.
+
+    .. versionadded:: 0.6
+
+    '''
+    def __init__(self,
+                 *,
+                 key,
+                 version=None,
+                 maxsize=1024,
+                 ttl=None,
+                 backend=None):
+        if not callable(key):
+            raise TypeError('key must be callable: {!r}'.format(key))
+        if version is not None and not callable(version):
+            raise TypeError('version must be callable: {!r}'.format(version))
+        if backend is None:
+            backend = MemoryBackend(maxsize, ttl)
+        elif not isinstance(backend, CacheBackend):
+            msg = 'backend must be a CacheBackend: {!r}'
+            raise TypeError(msg.format(backend))
+        self.key = key
+        self.version = version
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._tokens = util.LRUCache(token_cache_size)  # see _token
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _token(self, fingerprint):
+        '''Return a small object standing in for fingerprint in keys.
+
+        Equal fingerprints get the same token, so schema objects with equal
+        fingerprints share results - without hashing (possibly large)
+        fingerprints for every lookup. Only the tokens of the
+        :data:`token_cache_size` most recently wrapped fingerprints are
+        remembered.
+
+        '''
+        with self._lock:
+            token = self._tokens.get(fingerprint)
+            if token is None:
+                token = _Token()
+                self._tokens.set(fingerprint, token)
+            return token
+
+    def wrap(self, fingerprint, func):
+        '''Return a version of a single object dump function using the cache.
+
+        Args:
+            fingerprint: A hashable value identifying the dump function (and
+                thereby the schema object it belongs to). For schema objects,
+                this is a tuple of the schema's fully module-qualified class
+                name, its fields (compared by identity, including the fields
+                of linked schemas) and the type of its results.
+
+            func: A function expecting a single object to dump (and maybe
+                additional positional arguments, which are passed on). If
+                ``func`` is a coroutine function, so is the result.
+
+        Returns:
+            A function behaving just like ``func``, taking results from the
+            cache if possible (and caching them otherwise).
+
+        '''
+        token = self._token(fingerprint)
+        get_key = self.key
+        get_version = self.version
+        backend = self.backend
+        lock = self._lock
+
+        def lookup(obj):
+            '''Return (key, version, cached result or None) for obj.'''
+            key = (token, get_key(obj))
+            version = get_version(obj) if get_version is not None else None
+            entry = backend.get(key)
+            if entry is not None and entry[0] == version:
+                with lock:
+                    self.hits += 1
+                return key, version, entry
+            with lock:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.stale += 1
+            return key, version, None
+
+        if inspect.iscoroutinefunction(func):
+            async def dump_async(obj, *args):
+                key, version, entry = lookup(obj)
+                if entry is not None:
+                    return entry[1]
+                result = await func(obj, *args)
+                backend.set(key, (version, result))
+                return result
+
+            return dump_async
+
+        def dump(obj, *args):
+            key, version, entry = lookup(obj)
+            if entry is not None:
+                return entry[1]
+            result = func(obj, *args)
+            backend.set(key, (version, result))
+            return result
+
+        return dump
+
+    def stats(self):
+        '''Return a dict containing statistics on the usage of the cache.
+
+        Returns:
+            A dict containing the number of cache ``hits``, the number of
+            ``misses`` (no result cached), the number of ``stale`` results
+            (a result was cached for another version of the object) and the
+            ``hit_rate`` (the ratio of hits to lookups, or ``None`` if there
+            were no lookups yet).
+
+        '''
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+    def clear(self):
+        '''Remove all cached results and reset statistics.'''
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.stale = 0
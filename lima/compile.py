@@ -0,0 +1,212 @@
+'''Ahead-of-time compilation of dump functions.
+
+lima creates the dump functions of schema objects dynamically (via
+:func:`exec`) when they are needed for the first time. For applications with
+many schemas, the time this takes at startup might add up. To avoid this, the
+source code of those functions can be written to a real Python module ahead of
+time:
+
+.. code-block:: sh
+
+    python -m lima.compile mypkg.schemas -o mypkg/_lima_compiled.py
+
+This imports the module ``mypkg.schemas`` (more than one module can be
+specified), generates the dump functions for all schema classes defined
+therein (and for all schemas linked by their fields) and writes their source
+code to ``mypkg/_lima_compiled.py``.
+
+Importing the generated module at runtime is enough to make lima use the
+precompiled functions instead of creating them via :func:`exec` (the
+generated module calls :func:`load` itself). Since the generated module is a
+real Python module, its bytecode gets cached by Python as usual.
+
+Precompiled functions are looked up by a hash of their source code. If a
+schema changes after the module was generated, lima silently falls back to
+creating the dump functions dynamically.
+
+'''
+import argparse
+import importlib
+import sys
+import textwrap
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from lima import fields
+from lima import registry
+from lima import schema
+from lima import util
+
+
+HEADER = """\
+'''Precompiled lima dump functions.
+
+Generated by ``python -m lima.compile {modules}``. Do not edit.
+
+'''
+import lima.compile
+"""
+
+
+def load(functions):
+    '''Make lima use precompiled functions.
+
+    Args:
+        functions: A module generated by :mod:`lima.compile` (or its
+            ``FUNCTIONS`` attribute, a mapping of code hashes to function
+            factories).
+
+    Generated modules call this function themselves when being imported.
+
+    '''
+    functions = getattr(functions, 'FUNCTIONS', functions)
+    schema._precompiled.update(functions)
+
+
+@contextmanager
+def _local_caches():
+    '''Context manager making lima use fresh function and variant caches.
+
+    Within, all dump functions are actually made (and not just taken from
+    :data:`lima.schema.function_cache`), without throwing away the caches
+    (and their statistics) of the running process: The original caches get
+    restored afterwards.
+
+    '''
+    saved = schema.function_cache, schema.variant_cache
+    schema.function_cache = util.LRUCache(maxsize=saved[0].maxsize)
+    schema.variant_cache = util.LRUCache(maxsize=saved[1].maxsize)
+    try:
+        yield
+    finally:
+        schema.function_cache, schema.variant_cache = saved
+
+
+def _schema_classes(module_names):
+    '''Return registered schema classes defined in (sub)modules specified.'''
+    for module_name in module_names:
+        importlib.import_module(module_name)
+
+    for cls in registry.global_registry:
+        module = cls.__module__
+        if any(module == name or module.startswith(name + '.')
+               for name in module_names):
+            yield cls
+
+
+def _make_functions(schema_inst, seen):
+    '''Make the dump functions of a schema object and its linked schemas.
+
+    Args:
+        schema_inst: A schema object.
+
+        seen: A dict mapping IDs of schema objects already visited to those
+            objects (referencing the objects keeps their IDs unique).
+
+    The functions are made by calling the factories in :mod:`lima.schema`
+    directly (with the same arguments the schema object would use), so
+    functions that are already stored on schema objects or fields (which
+    might be shared with other schemas) get made all the same.
+
+    '''
+    if id(schema_inst) in seen:
+        return
+    seen[id(schema_inst)] = schema_inst
+
+    with util.exception_context(schema._schema_name(schema_inst)):
+        s_fields, many = schema_inst._fields, schema_inst._many
+        variants = {many, False} if schema_inst._cache is not None else {many}
+        for variant_many in sorted(variants):
+            schema._dump_fields_func(s_fields, schema_inst._ordered,
+                                     variant_many,
+                                     inline=schema.inline_depth,
+                                     output=schema_inst._output)
+            schema._dump_fields_json_func(s_fields, variant_many)
+
+        for field in s_fields.values():
+            if not isinstance(field, fields._LinkedObjectField):
+                continue
+            nested = field._schema_inst
+            if isinstance(field, fields.Reference):
+                name = field._field
+                schema._dump_field_func(nested._fields[name], name,
+                                        nested._many)
+                schema._dump_field_json_func(nested._fields[name], name,
+                                             nested._many)
+            elif isinstance(nested, schema.Schema):
+                _make_functions(nested, seen)
+
+
+def generate(module_names):
+    '''Return the source code of a module containing precompiled functions.
+
+    Args:
+        module_names: A sequence of names of modules containing schema
+            classes. Those modules (and their submodules) are searched for
+            schema classes to generate dump functions for. Modules that were
+            not imported yet get imported.
+
+    Returns:
+        The source code of a module containing the generated dump functions
+        of all schema classes found (for default and ``many=True`` schema
+        objects), as well as the dump functions of all schemas linked to
+        them.
+
+    '''
+    # make sure all dump functions are actually made (and not just taken from
+    # the caches of the running process)
+    with _local_caches(), schema._recording_code() as recorded:
+        seen = {}
+        for cls in _schema_classes(module_names):
+            for many in (False, True):
+                with util.exception_context(cls.__qualname__):
+                    _make_functions(cls(many=many), seen)
+
+    chunks = [HEADER.format(modules=' '.join(module_names))]
+    factories = OrderedDict()
+    for name, code, globals_names in recorded:
+        code_hash = schema._code_hash(code)
+        if code_hash in factories:
+            continue
+        factory = factories[code_hash] = '_f{}'.format(len(factories))
+        params = ''.join('{}, '.format(p) for p in globals_names)
+        if params:
+            params = '*, ' + params
+        chunks.append(
+            '\n\ndef {factory}({params}**_):\n'
+            '{code}\n'
+            '    return {name}\n'.format(factory=factory, params=params,
+                                         code=textwrap.indent(code, '    '),
+                                         name=name)
+        )
+
+    chunks.append('\n\nFUNCTIONS = {\n')
+    chunks.extend("    '{}': {},\n".format(code_hash, factory)
+                  for code_hash, factory in factories.items())
+    chunks.append('}\n\nlima.compile.load(FUNCTIONS)\n')
+    return ''.join(chunks)
+
+
+def main(args=None):
+    '''Entry point of ``python -m lima.compile``.'''
+    parser = argparse.ArgumentParser(
+        prog='python -m lima.compile',
+        description='Write precompiled lima dump functions to a module.'
+    )
+    parser.add_argument('modules', nargs='+', metavar='module',
+                        help='name of a module containing schema classes')
+    parser.add_argument('-o', '--output', metavar='file',
+                        help='file to write to (default: standard output)')
+    args = parser.parse_args(args)
+
+    source = generate(args.modules)
+
+    if args.output is None:
+        sys.stdout.write(source)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(source)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,28 +2,55 @@
 
 import datetime
 import decimal
+import json
+from json.encoder import encode_basestring_ascii
 
 from lima import abc
 from lima import registry
 from lima import util
 
 
+_INFINITY = float('inf')
+
+
 class Field(abc.FieldABC):
     '''Base class for fields.
 
     Args:
-        attr: The optional name of the corresponding attribute.
+        attr: The optional name of the corresponding attribute. This can be
+            a dotted path (like ``'author.address.city'``) to get the value
+            from an attribute of an attribute of the object.
 
-        key: The optional name of the corresponding key.
+        key: The optional name of the corresponding key. A list of keys
+            (like ``['meta', 'tags']``) is a path of keys to get the value
+            from an item of an item of the object.
 
         get: An optional getter function accepting an object as its only
             parameter and returning the field value.
 
         val: An optional constant value for the field.
 
+        blocking: An optional boolean indicating that determining the field's
+            value might block (because :attr:`get` waits for I/O, for
+            example). Values of blocking fields can be determined
+            concurrently by providing an executor to
+            :meth:`lima.schema.Schema.dump`. Defaults to ``False``.
+
+        none_safe: An optional boolean indicating that paths specified via
+            ``attr`` or ``key`` may contain ``None`` along the way. If so, the
+            field's value is ``None`` as well (instead of an error being
+            raised). Defaults to ``False``.
+
     .. versionadded:: 0.3
         The ``val`` parameter.
 
+    .. versionadded:: 0.6
+        The ``blocking`` parameter.
+
+    .. versionadded:: 0.6
+        The ``none_safe`` parameter, as well as paths for ``attr`` and
+        ``key``.
+
     :attr:`attr`, :attr:`key`, :attr:`get` and :attr:`val` are mutually
     exclusive.
 
@@ -40,17 +67,47 @@ class Field(abc.FieldABC):
     as the field has within the corresponding :class:`lima.schema.Schema`
     instance.
 
+    Fields converting their values via a ``pack`` method can additionally
+    provide a ``pack_template``: A string containing a Python expression
+    equivalent to ``pack`` (including the handling of ``None``), with
+    ``{val}`` as placeholder for the value to pack. Dump functions then
+    contain this expression instead of calling ``pack``. Other placeholders
+    in the template refer to the keys of an optional mapping ``pack_globals``
+    of objects the expression needs (the expression can't use builtins
+    directly). Templates are only used if they were defined along with (or
+    after) ``pack``. An example:
+
+    .. code-block:: python
+
+        class Upper(String):
+            pack_template = 'None if {val} is None else {upper}({val})'
+            pack_globals = {'upper': str.upper}
+
+            @staticmethod
+            def pack(val):
+                return None if val is None else str.upper(val)
+
+    .. versionadded:: 0.6
+        The ``pack_template`` protocol.
+
     '''
-    def __init__(self, *, attr=None, key=None, get=None, val=None):
+    blocking = False
+    none_safe = False
+
+    def __init__(self, *, attr=None, key=None, get=None, val=None,
+                 blocking=False, none_safe=False):
         if sum(v is not None for v in (attr, key, get, val)) > 1:
             raise ValueError('attr, key, get and val are mutually exclusive.')
 
         if attr is not None:
-            if not isinstance(attr, str) or not str.isidentifier(attr):
+            if (not isinstance(attr, str) or
+                    not all(map(str.isidentifier, attr.split('.')))):
                 msg = 'attr is not a valid Python identifier: {}'.format(attr)
                 raise ValueError(msg)
             self.attr = attr
         elif key is not None:
+            if key == []:
+                raise ValueError('key must not be an empty list.')
             self.key = key
         elif get is not None:
             if not callable(get):
@@ -59,6 +116,12 @@ class Field(abc.FieldABC):
         elif val is not None:
             self.val = val
 
+        if blocking:
+            self.blocking = True
+
+        if none_safe:
+            self.none_safe = True
+
 
 class Boolean(Field):
     '''A boolean field.
@@ -69,7 +132,14 @@ class Boolean(Field):
     code future-proof.
 
     '''
-    pass
+    @staticmethod
+    def pack_json(val):
+        '''Return the JSON representation of ``val``.'''
+        if val is True:
+            return 'true'
+        if val is False:
+            return 'false'
+        return json.dumps(val)
 
 
 class Decimal(Field):
@@ -78,10 +148,20 @@ class Decimal(Field):
     Decimal values get serialized as strings, this way, no precision is lost.
 
     '''
+    pack_template = '{str}({val}) if {val} is not None else None'
+    pack_globals = {'str': str}
+
     @staticmethod
     def pack(val):
         return str(val) if val is not None else None
 
+    @staticmethod
+    def pack_json(val):
+        '''Return the JSON representation of ``val`` (a JSON string).'''
+        if val.__class__ is decimal.Decimal:
+            return '"' + str(val) + '"'  # no escaping needed
+        return encode_basestring_ascii(str(val)) if val is not None else 'null'
+
 
 class Float(Field):
     '''A float field.
@@ -92,7 +172,12 @@ class Float(Field):
     code future-proof.
 
     '''
-    pass
+    @staticmethod
+    def pack_json(val):
+        '''Return the JSON representation of ``val``.'''
+        if val.__class__ is float and -_INFINITY < val < _INFINITY:
+            return float.__repr__(val)
+        return json.dumps(val)
 
 
 class Integer(Field):
@@ -104,7 +189,12 @@ class Integer(Field):
     code future-proof.
 
     '''
-    pass
+    @staticmethod
+    def pack_json(val):
+        '''Return the JSON representation of ``val``.'''
+        if val.__class__ is int:
+            return int.__repr__(val)
+        return json.dumps(val)
 
 
 class String(Field):
@@ -116,13 +206,20 @@ class String(Field):
     code future-proof.
 
     '''
-    pass
+    @staticmethod
+    def pack_json(val):
+        '''Return the JSON representation of ``val`` (a JSON string).'''
+        if val.__class__ is str:
+            return encode_basestring_ascii(val)
+        return json.dumps(val)
 
 
 class Date(Field):
     '''A date field.
 
     '''
+    pack_template = '{val}.isoformat() if {val} is not None else None'
+
     @staticmethod
     def pack(val):
         '''Return a string representation of ``val``.
@@ -135,11 +232,24 @@ class Date(Field):
         '''
         return val.isoformat() if val is not None else None
 
+    @staticmethod
+    def pack_json(val):
+        '''Return the JSON representation of ``val`` (a JSON string).
+
+        ISO 8601-representations contain no characters that would have to be
+        escaped, so this is a lot cheaper than encoding the result of
+        :meth:`pack` as JSON.
+
+        '''
+        return '"' + val.isoformat() + '"' if val is not None else 'null'
+
 
 class DateTime(Field):
     '''A DateTime field.
 
     '''
+    pack_template = '{val}.isoformat() if {val} is not None else None'
+
     @staticmethod
     def pack(val):
         '''Return a string representation of ``val``.
@@ -156,6 +266,21 @@ class DateTime(Field):
         '''
         return val.isoformat() if val is not None else None
 
+    @staticmethod
+    def pack_json(val):
+        '''Return the JSON representation of ``val`` (a JSON string).
+
+        See :meth:`Date.pack_json`.
+
+        '''
+        return '"' + val.isoformat() + '"' if val is not None else 'null'
+
+
+def _shared_schema(cls, kwargs):
+    '''Return a (shared, if possible) schema object of cls for kwargs.'''
+    variant = getattr(cls, 'variant', None)
+    return variant(**kwargs) if variant is not None else cls(**kwargs)
+
 
 class _LinkedObjectField(Field):
     '''A base class for fields that represent linked objects.
@@ -182,6 +307,20 @@ class _LinkedObjectField(Field):
 
         val: See :class:`Field`.
 
+        blocking: See :class:`Field`.
+
+        none_safe: See :class:`Field`.
+
+        memoize: An optional boolean indicating if linked objects should be
+            packed only once per dump: If True(ish), the packed
+            representations of linked objects are remembered by the identity
+            of the linked objects for the duration of a single dump (of the
+            schema this field belongs to), and an object linked more than
+            once gets the same representation every time. Lazy dumps
+            (``dump_iter`` and ``dump_chunks``) remember linked objects per
+            object only, so streams don't keep them in memory. Defaults to
+            ``False``.
+
         kwargs: Optional keyword arguments to pass to the :class:`Schema`'s
             constructor when the time has come to instance it. Must be empty if
             ``schema`` is a :class:`lima.schema.Schema` object.
@@ -198,20 +337,32 @@ class _LinkedObjectField(Field):
                  key=None,
                  get=None,
                  val=None,
+                 blocking=False,
+                 none_safe=False,
+                 memoize=False,
                  **kwargs):
-        super().__init__(attr=attr, key=key, get=get, val=val)
+        super().__init__(attr=attr, key=key, get=get, val=val,
+                         blocking=blocking, none_safe=none_safe)
+        self.memoize = memoize
 
         # those will be evaluated later on (in _schema_inst)
         self._schema_arg = schema
         self._schema_kwargs = kwargs
 
+    def __getstate__(self):
+        '''Return picklable state (without lazily evaluated attributes).'''
+        return util.unreified_state(self)
+
     @util.reify
     def _schema_inst(self):
         '''Determine and return the associated Schema instance (reified).
 
         If no associated Schema instance exists at call time (because only a
         Schema class name was supplied to the constructor), find the Schema
-        class in the global registry and instantiate it.
+        class in the global registry and instantiate it. Schema objects
+        created from classes (or class names) are shared with other fields
+        and code using the same arguments (see
+        :meth:`lima.schema.Schema.variant`).
 
         Returns:
             A schema instance for the linked object.
@@ -243,12 +394,12 @@ class _LinkedObjectField(Field):
             # in case schema is a schema class
             elif (isinstance(schema, type) and
                   issubclass(schema, abc.SchemaABC)):
-                return schema(**kwargs)
+                return _shared_schema(schema, kwargs)
 
             # in case schema is a string
             elif isinstance(schema, str):
                 cls = registry.global_registry.get(schema)
-                return cls(**kwargs)
+                return _shared_schema(cls, kwargs)
 
             # otherwise fail
             msg = 'schema arg supplied to constructor has illegal type ({})'
@@ -279,6 +430,16 @@ class Embed(_LinkedObjectField):
 
         val: See :class:`Field`.
 
+        blocking: See :class:`Field`.
+
+        none_safe: See :class:`Field`.
+
+        memoize: An optional boolean indicating if linked objects should be
+            packed only once per dump (see :class:`_LinkedObjectField`). Use
+            this if many objects link to the same few objects - like books
+            linking to their authors. Note that the dumped representations
+            of those objects are then the *same* dicts (not just equal ones).
+
         kwargs: Optional keyword arguments to pass to the :class:`Schema`'s
             constructor when the time has come to instance it. Must be empty if
             ``schema`` is a :class:`lima.schema.Schema` object.
@@ -335,6 +496,24 @@ class Embed(_LinkedObjectField):
         '''
         return self._pack_func(val) if val is not None else None
 
+    @util.reify
+    def _pack_json_func(self):
+        '''Return the associated schema's JSON dump *function* (reified).'''
+        return self._schema_inst._dump_fields_json
+
+    def pack_json(self, val):
+        '''Return the JSON representation of val.
+
+        Args:
+            val: The linked object to embed.
+
+        Returns:
+            A string containing the JSON representation of the marshalled
+            ``val`` (see :meth:`pack`).
+
+        '''
+        return self._pack_json_func(val) if val is not None else 'null'
+
 
 class Reference(_LinkedObjectField):
     '''A Field to reference linked objects.
@@ -355,6 +534,12 @@ class Reference(_LinkedObjectField):
 
         val: see :class:`Field`.
 
+        blocking: see :class:`Field`.
+
+        none_safe: see :class:`Field`.
+
+        memoize: see :class:`Embed`.
+
         kwargs: see :class:`Embed`.
 
 
@@ -367,15 +552,21 @@ class Reference(_LinkedObjectField):
                  key=None,
                  get=None,
                  val=None,
+                 blocking=False,
+                 none_safe=False,
+                 memoize=False,
                  **kwargs):
         super().__init__(schema=schema,
-                         attr=attr, key=key, get=get, val=val, **kwargs)
+                         attr=attr, key=key, get=get, val=val,
+                         blocking=blocking, none_safe=none_safe,
+                         memoize=memoize, **kwargs)
         self._field = field
 
     @util.reify
     def _pack_func(self):
         '''Return the associated schema's dump field *function* (reified).'''
-        return self._schema_inst._dump_field_func(self._field)
+        schema = self._schema_inst
+        return schema._metered(schema._dump_field_func(self._field))
 
     def pack(self, val):
         '''Return value of reference field of marshalled representation of val.
@@ -396,6 +587,26 @@ class Reference(_LinkedObjectField):
         '''
         return self._pack_func(val) if val is not None else None
 
+    @util.reify
+    def _pack_json_func(self):
+        '''Return the associated schema's JSON dump field *function*.'''
+        schema = self._schema_inst
+        return schema._metered(schema._dump_field_json_func(self._field),
+                               size=True)
+
+    def pack_json(self, val):
+        '''Return the JSON representation of the reference to val.
+
+        Args:
+            val: The nested object to get the reference to.
+
+        Returns:
+            A string containing the JSON representation of the value of the
+            reference field (see :meth:`pack`).
+
+        '''
+        return self._pack_json_func(val) if val is not None else 'null'
+
 
 TYPE_MAPPING = {
     bool: Boolean,
@@ -0,0 +1,284 @@
+'''Metrics of dumps per schema.
+
+Schema objects created with the ``metrics`` argument record how often they
+dump data, how many objects they marshal, how long this takes and how large
+the results are (for :meth:`lima.schema.Schema.dump_json`). This includes
+dumps of linked objects via :class:`lima.fields.Embed` and
+:class:`lima.fields.Reference` fields. An example:
+
+.. code-block:: python
+
+    from lima import metrics
+
+    class AddressSchema(Schema):
+        city = fields.String()
+
+    class PersonSchema(Schema):
+        name = fields.String()
+        address = fields.Embed(schema=AddressSchema, metrics=True)
+
+    person_schema = PersonSchema(many=True, metrics=True)
+    person_schema.dump(persons)
+    metrics.registry.snapshot()
+    # {'mymodule.PersonSchema': {'dumps': 1, 'objects': 1000, ...},
+    #  'mymodule.AddressSchema': {'dumps': 1000, 'objects': 1000, ...}}
+
+Schema objects without metrics don't record anything and use the same dump
+functions as always.
+
+'''
+import bisect
+import inspect
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+'''Default upper bounds (in seconds) of the buckets of latency histograms.'''
+
+
+def _count(obj, result, many):
+    '''Return the number of objects dumped (obj being dumped to result).'''
+    if not many:
+        return 1
+    if isinstance(result, list):
+        return len(result)
+    try:
+        return len(obj)
+    except TypeError:
+        return 0  # unknown
+
+
+class _SchemaMetrics:
+    '''Metrics recorded for dumps of one schema (see MetricsRegistry).
+
+    Dumps and objects are counted per thread, in ``[dumps, objects]``-lists
+    only ever changed by their own thread, so counting doesn't need a lock.
+    Counters of finished threads are folded into ``totals``. Everything else
+    is recorded for sampled dumps only (holding the registry's lock).
+
+    '''
+    def __init__(self, bucket_count):
+        self._local = threading.local()
+        self.counters = {}  # thread idents -> [dumps, objects]
+        self.reset(bucket_count)
+
+    def __getstate__(self):
+        '''Return picklable state (with all counters folded into totals).'''
+        state = self.__dict__.copy()
+        del state['_local'], state['sequence']
+        state['totals'] = self.count()
+        state['counters'] = {}
+        return state
+
+    def __setstate__(self, state):
+        '''Restore state (without counters of threads).'''
+        self.__dict__.update(state)
+        self._local = threading.local()
+        self.sequence = itertools.count(self.totals[0] + 1)
+
+    def reset(self, bucket_count):
+        '''Reset metrics to zero.'''
+        for counters in list(self.counters.values()):
+            counters[:] = [0, 0]
+        self.totals = [0, 0]
+        self.sequence = itertools.count(1)  # numbers dumps for sampling
+        self.sampled = 0
+        self.seconds = 0.0
+        self.size = 0
+        self.histogram = [0] * (bucket_count + 1)  # last bucket: overflow
+
+    def thread_counters(self, lock):
+        '''Return the ``[dumps, objects]``-list of the current thread.'''
+        try:
+            return self._local.counters
+        except AttributeError:
+            counters = self._local.counters = [0, 0]
+            with lock:
+                # fold counters of a finished thread with the same ident
+                self._fold(self.counters.pop(threading.get_ident(), None))
+                self.counters[threading.get_ident()] = counters
+            return counters
+
+    def _fold(self, counters):
+        '''Add counters (unless None) to totals.'''
+        if counters is not None:
+            self.totals = [t + c for t, c in zip(self.totals, counters)]
+
+    def count(self):
+        '''Return ``[dumps, objects]`` of all threads (call with lock held).
+
+        Counters of threads that finished get folded into totals.
+
+        '''
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [i for i in self.counters if i not in alive]:
+            self._fold(self.counters.pop(ident))
+        result = list(self.totals)
+        for counters in self.counters.values():
+            result = [r + c for r, c in zip(result, counters)]
+        return result
+
+
+class MetricsRegistry:
+    '''A thread-safe registry of metrics of dumps per schema.
+
+    Args:
+        sample_rate: Measure only one in ``sample_rate`` dumps (per schema).
+            Dumps and objects are always counted (per thread, without
+            locking), but the time a dump takes and the size of its result
+            are only measured for sampled dumps. Defaults to 1 (every dump
+            is sampled).
+
+        buckets: An ascending sequence of upper bounds (in seconds) of the
+            buckets of latency histograms. Defaults to
+            :data:`DEFAULT_BUCKETS`.
+
+    '''
+    def __init__(self, sample_rate=1, buckets=DEFAULT_BUCKETS):
+        if not isinstance(sample_rate, int) or sample_rate < 1:
+            msg = 'sample_rate must be a positive integer: {!r}'
+            raise ValueError(msg.format(sample_rate))
+        self.sample_rate = sample_rate
+        self.buckets = tuple(buckets)
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        '''Return picklable state (without lock).'''
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        '''Restore state (with a new lock).'''
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __reduce_ex__(self, protocol):
+        '''Pickle the default registry by reference.'''
+        if self is registry:
+            return 'registry'
+        return super().__reduce_ex__(protocol)
+
+    def _schema_metrics(self, name):
+        '''Return the metrics for a schema name (creating them if needed).'''
+        with self._lock:
+            metrics = self._metrics.get(name)
+            if metrics is None:
+                metrics = _SchemaMetrics(len(self.buckets))
+                self._metrics[name] = metrics
+            return metrics
+
+    def wrap(self, name, func, many, size=False):
+        '''Return a dump function recording metrics.
+
+        Args:
+            name: The name to record metrics under (usually the qualified
+                name of a schema class).
+
+            func: The dump function to wrap. It may expect additional
+                positional arguments (after the object to dump), which are
+                passed on. If ``func`` is a coroutine function, so is the
+                result (recording the time until the coroutine finishes).
+
+            many: If True(ish), ``func`` expects a collection of objects.
+
+            size: If True(ish), the length of the result gets recorded as
+                size (for dump functions returning strings).
+
+        Returns:
+            A function behaving just like ``func``.
+
+        '''
+        metrics = self._schema_metrics(name)
+        lock = self._lock
+        sample_rate = self.sample_rate
+        buckets = self.buckets
+        perf_counter = time.perf_counter
+
+        def start_dump():
+            '''Count a dump, returning (counters, sampled)-tuple.'''
+            # unsampled dumps are counted without taking the lock (next() on
+            # itertools.count is atomic)
+            counters = metrics.thread_counters(lock)
+            counters[0] += 1
+            return counters, not next(metrics.sequence) % sample_rate
+
+        def record(counters, obj, result, seconds):
+            '''Record a sampled dump.'''
+            bucket = bisect.bisect_left(buckets, seconds)
+            counters[1] += _count(obj, result, many)
+            with lock:
+                metrics.sampled += 1
+                metrics.seconds += seconds
+                metrics.histogram[bucket] += 1
+                if size:
+                    metrics.size += len(result)
+
+        if inspect.iscoroutinefunction(func):
+            async def dump_async(obj, *args):
+                counters, sampled = start_dump()
+                start = perf_counter()
+                result = await func(obj, *args)
+                if sampled:
+                    record(counters, obj, result, perf_counter() - start)
+                else:
+                    counters[1] += _count(obj, result, many)
+                return result
+
+            return dump_async
+
+        def dump(obj, *args):
+            counters, sampled = start_dump()
+            if not sampled:
+                result = func(obj, *args)
+                counters[1] += _count(obj, result, many)
+                return result
+
+            start = perf_counter()
+            result = func(obj, *args)
+            record(counters, obj, result, perf_counter() - start)
+            return result
+
+        return dump
+
+    def snapshot(self):
+        '''Return the metrics recorded so far as a dict.
+
+        Returns:
+            A dict mapping schema names to dicts containing the number of
+            ``dumps``, the number of ``objects`` dumped, the number of
+            ``sampled`` dumps, the total time these took (``seconds``), the
+            total ``size`` of their results (for JSON dumps) and a latency
+            ``histogram``: A list of ``(upper_bound, count)``-tuples, the
+            upper bound of the last bucket being ``float('inf')``.
+
+        '''
+        bounds = self.buckets + (float('inf'), )
+        with self._lock:
+            counts = {name: metrics.count()
+                      for name, metrics in self._metrics.items()}
+            return {
+                name: {
+                    'dumps': counts[name][0],
+                    'objects': counts[name][1],
+                    'sampled': metrics.sampled,
+                    'seconds': metrics.seconds,
+                    'size': metrics.size,
+                    'histogram': list(zip(bounds, metrics.histogram)),
+                }
+                for name, metrics in self._metrics.items()
+            }
+
+    def reset(self):
+        '''Reset all metrics recorded so far to zero.'''
+        with self._lock:
+            for metrics in self._metrics.values():
+                metrics.reset(len(self.buckets))
+
+
+registry = MetricsRegistry()
+'''The default registry (used by schema objects created with metrics=True).'''
@@ -47,6 +47,10 @@ class Registry:
         self._classes[fullname] = cls
         self._defining_modules[qualname].add(module)
 
+    def __iter__(self):
+        '''Return an iterator over all registered classes.'''
+        return iter(list(self._classes.values()))
+
     def get(self, name):
         '''Get a registered class by its name and return it.
 
@@ -1,24 +1,100 @@
 '''Schema class and related code.'''
+import array
+import asyncio
+import codecs
+import functools
+import hashlib
+import importlib.util
+import inspect
+import io
+import json
 import keyword
+import marshal
+import os
+import string
+import sys
+import tempfile
 import textwrap
-from collections import OrderedDict
+import threading
+import time
+from collections import OrderedDict, abc as collections_abc, namedtuple
+from concurrent import futures
+from contextlib import contextmanager
 
 from lima import abc
+from lima import cache as lima_cache
 from lima import exc
+from lima import fields as lima_fields
+from lima import metrics as lima_metrics
 from lima import registry
 from lima import util
 
 
 # Helper functions ############################################################
 
-def _fields_from_bases(bases):
-    '''Return fields determined from a list of base classes'''
-    fields = OrderedDict()
+_ARRAY_TYPECODES = [
+    (lima_fields.Integer, 'q'),
+    (lima_fields.Float, 'd'),
+]
+'''Typecodes of :class:`array.array` columns for numeric field types.'''
+
+
+def _array_typecode(field):
+    '''Return the array typecode for a field (or None if not numeric).'''
+    for field_cls, typecode in _ARRAY_TYPECODES:
+        if isinstance(field, field_cls):
+            return typecode
+    return None
+
+
+_NUMPY_FIELD_TYPES = (
+    lima_fields.Boolean,
+    lima_fields.Float,
+    lima_fields.Integer,
+)
+'''Field types supported by :meth:`Schema.dump_array`.'''
+
+
+def _native_type(field):
+    '''Return the native Python type of a numeric field.
 
+    The type is determined via :data:`lima.fields.TYPE_MAPPING`.
+
+    Raises:
+        TypeError: If ``field`` is not of one of the types mentioned in
+            :data:`_NUMPY_FIELD_TYPES`.
+
+    '''
+    if isinstance(field, _NUMPY_FIELD_TYPES):
+        native_types = {v: k for k, v in lima_fields.TYPE_MAPPING.items()}
+        for cls in type(field).__mro__:
+            if cls in native_types:
+                return native_types[cls]
+    msg = 'Field type not supported by NumPy output: {}'
+    raise TypeError(msg.format(type(field).__name__))
+
+
+def _import_numpy():
+    '''Import and return numpy (which is an optional dependency of lima).'''
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('NumPy is required for this feature.') from None
+    return numpy
+
+
+def _fields_from_bases(bases):
+    '''Return fields determined from a list of base classes.'''
     # determine base classes that are actually Schemas by checking if they
     # inherit from abc.SchemaABC
-    schema_bases = [b for b in bases if (issubclass(b, abc.SchemaABC) and
-                                         b != abc.SchemaABC)]
+    schema_bases = [b for b in bases if (b is not abc.SchemaABC and
+                                         issubclass(b, abc.SchemaABC))]
+
+    # a single base schema: a (fast) shallow copy of its fields is enough
+    if len(schema_bases) == 1:
+        return schema_bases[0].__fields__.copy()
+
+    fields = OrderedDict()
 
     # Add fields of base schemas. Bases listed first have precedence (to
     # reflect how python inherits class attributes). Their items are also
@@ -42,35 +118,263 @@ def _fields_include(fields, include):
     return result
 
 
+def _field_names(names, fields):
+    '''Return names as a set after making sure they all name fields.
+
+    The checks producing meaningful error messages only run if some name
+    isn't found in fields (field names are always strings).
+
+    '''
+    try:
+        result = set(names)
+    except TypeError:
+        result = None  # unhashable names: let the checks below complain
+    if result is None or not result.issubset(fields):
+        util.ensure_only_instances_of(names, str)
+        util.ensure_subset_of(names, fields)
+    return result
+
+
 def _fields_exclude(fields, remove):
     '''Return a copy of fields with fields mentioned in exclude missing.'''
-    util.ensure_only_instances_of(remove, str)
-    util.ensure_subset_of(remove, fields)
+    remove = _field_names(remove, fields)
     return OrderedDict([(k, v) for k, v in fields.items() if k not in remove])
 
 
 def _fields_only(fields, only):
     '''Return a copy of fields containing only fields mentioned in only.'''
-    util.ensure_only_instances_of(only, str)
-    util.ensure_subset_of(only, fields)
+    only = _field_names(only, fields)
     return OrderedDict([(k, v) for k, v in fields.items() if k in only])
 
 
+def _selection_key(selection):
+    '''Return a normalized, hashable form of a field selection.
+
+    Args:
+        selection: A field name, a mapping of field names to nested
+            selections (or ``None`` for no nested selection) or a sequence
+            of field names and such mappings (see :meth:`Schema.dump`).
+
+    Returns:
+        A tuple of ``(field_name, nested_key)``-tuples sorted by field name,
+        ``nested_key`` being the key of a nested selection (or ``None``).
+
+    Raises:
+        TypeError: If the selection contains things other than field names
+            (strings) and mappings.
+
+        ValueError: If a field is selected twice with different nested
+            selections.
+
+    This gets called for every dump with a selection, so it's kept cheap.
+
+    '''
+    if not selection:
+        return ()  # empty selections select all fields
+    if isinstance(selection, (str, collections_abc.Mapping)):
+        selection = [selection]
+
+    keys = {}
+    for item in selection:
+        if isinstance(item, str):
+            pairs = [(item, None)]
+        elif isinstance(item, collections_abc.Mapping):
+            pairs = item.items()
+        else:
+            raise TypeError('No field name or mapping: {!r}'.format(item))
+        for name, nested in pairs:
+            if not isinstance(name, str):
+                raise TypeError('No field name: {!r}'.format(name))
+            if nested is not None:
+                nested = _selection_key(nested)
+            if keys.get(name, nested) != nested:
+                msg = 'Conflicting selections of field {!r}'
+                raise ValueError(msg.format(name))
+            keys[name] = nested
+
+    return tuple(sorted(keys.items()))
+
+
+_selected_field_cache = util.LRUCache(maxsize=1024)
+'''A cache of copies of linked object fields per nested selection.
+
+Keyed by ``(field, key, exclude)``-tuples (see :func:`_selected_field`).
+Reusing the same copy for the same selection keeps the fields of schema
+variants identical, so dump functions of variants are shared via
+:data:`function_cache` (and cached results via the result cache).
+
+'''
+
+
+def _selected_field(field, key, exclude):
+    '''Return a copy of a linked object field using a schema variant.
+
+    Copies are created once per field and selection (see
+    :data:`_selected_field_cache`).
+
+    '''
+    if not isinstance(field, lima_fields.Embed):
+        raise ValueError('Nested selections require Embed fields.')
+    cache_key = (field, key, bool(exclude))
+    result = _selected_field_cache.get(cache_key)
+    if result is not None:
+        return result
+
+    nested = field._schema_inst
+    if not isinstance(nested, Schema):
+        raise TypeError('Nested selections require lima Schema objects.')
+
+    # skip lazily evaluated attributes (those refer to the original schema)
+    result = object.__new__(type(field))
+    result.__dict__.update(util.unreified_state(field))
+    result._schema_arg = nested._selection(key, exclude)
+    result._schema_kwargs = {}
+    _selected_field_cache.set(cache_key, result)
+    return result
+
+
+def _selected_fields(fields, key, exclude):
+    '''Return a copy of fields reflecting a selection key.
+
+    Args:
+        fields: An ordered mapping of field names to fields.
+
+        key: A selection key (see :func:`_selection_key`).
+
+        exclude: If True(ish), fields selected without nested selection are
+            removed and all others remain. Otherwise only the selected fields
+            remain.
+
+    Fields with nested selections get replaced by copies whose schemas are
+    variants of the original ones (see :meth:`Schema._selection`). Fields with
+    empty nested selections remain as they are.
+
+    '''
+    selected = dict(key)
+    util.ensure_subset_of(selected, fields)
+    result = OrderedDict()
+    for field_name, field in fields.items():
+        if field_name not in selected:
+            if exclude:
+                result[field_name] = field
+        elif selected[field_name] == ():
+            result[field_name] = field  # empty nested selection: all fields
+        elif selected[field_name] is not None:
+            with util.exception_context(field_name):
+                result[field_name] = _selected_field(
+                    field, selected[field_name], exclude
+                )
+        elif not exclude:
+            result[field_name] = field
+    return result
+
+
+_mangle_prefixes = dict(at='@', dash='-', dot='.', hash='#', plus='+', nil='')
+'''A mapping of field name prefixes to replacements (see _mangle_name).'''
+
+
 def _mangle_name(name):
     '''Return mangled field name.
 
     Mangled field names have some name prefixes replaced with others (see
-    mapping in code). This is to allow some field names with special chars in
-    them to be defined via Schema class attributes.
+    :data:`_mangle_prefixes`). This is to allow some field names with special
+    chars in them to be defined via Schema class attributes.
 
     '''
-    mapping = dict(at='@', dash='-', dot='.', hash='#', plus='+', nil='')
     if '__' not in name:
         return name
     before, after = name.split('__', 1)
-    if before not in mapping:
+    if before not in _mangle_prefixes:
         return name
-    return mapping[before] + after
+    return _mangle_prefixes[before] + after
+
+
+_precompiled = {}
+'''A mapping of code hashes to factories of precompiled functions.
+
+Filled by :func:`lima.compile.load`. See :func:`_make_function`.
+
+'''
+
+_code_recorders = []
+'''A stack of lists recording the code of functions made by _make_function.
+
+See :func:`_recording_code`.
+
+'''
+
+
+code_cache_dir = os.environ.get('LIMA_CODE_CACHE_DIR') or None
+'''The directory to cache compiled code of dump functions in (or None).
+
+If set, the code objects of dynamically created dump functions are persisted
+to this directory (marshalled, keyed by a hash of their source code and the
+Python version). Fresh processes creating the same dump functions later can
+load them from there, skipping the compilation step. Defaults to the value of
+the environment variable ``LIMA_CODE_CACHE_DIR`` (or None if not set).
+
+'''
+
+
+def _code_hash(code):
+    '''Return a hash identifying the source code of a generated function.'''
+    return hashlib.sha1(code.encode('utf-8')).hexdigest()
+
+
+def _compile(code):
+    '''Return the code object for a code string, using the code cache.
+
+    If :data:`code_cache_dir` is set, code objects are loaded from there if
+    possible. Newly compiled code objects are stored there. Any errors when
+    accessing the cache directory are ignored.
+
+    '''
+    if code_cache_dir is None:
+        return compile(code, '<string>', 'exec')
+
+    cache_key = hashlib.sha1(importlib.util.MAGIC_NUMBER +
+                             code.encode('utf-8')).hexdigest()
+    filename = '{}-{}.marshal'.format(sys.implementation.cache_tag, cache_key)
+    path = os.path.join(code_cache_dir, filename)
+
+    with util.suppress(OSError, EOFError, ValueError, TypeError):
+        with open(path, 'rb') as f:
+            code_obj = marshal.load(f)
+        if isinstance(code_obj, type(_compile.__code__)):
+            return code_obj
+
+    code_obj = compile(code, '<string>', 'exec')
+
+    # write atomically (other processes might be reading the same file)
+    with util.suppress(OSError):
+        os.makedirs(code_cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=code_cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                marshal.dump(code_obj, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    return code_obj
+
+
+@contextmanager
+def _recording_code():
+    '''Context manager recording the code of functions made within.
+
+    Yields a list that gets filled with ``(name, code, globals_names)``-tuples
+    for every function created by :func:`_make_function` while the context
+    manager is active.
+
+    '''
+    recorded = []
+    _code_recorders.append(recorded)
+    try:
+        yield recorded
+    finally:
+        _code_recorders.remove(recorded)
 
 
 def _make_function(name, code, globals_=None):
@@ -88,281 +392,1662 @@ def _make_function(name, code, globals_=None):
         globals_: A dict of globals to mix into the new function's namespace.
             ``__builtins__`` must be provided explicitly if required.
 
+    If a precompiled version of ``code`` was loaded before (see
+    :mod:`lima.compile`), the function is not created via :func:`exec`, but by
+    passing ``globals_`` to the precompiled function's factory instead.
+    Otherwise, the compiled code might be taken from (or stored in) the code
+    cache (see :data:`code_cache_dir`).
+
     .. warning:
 
         All pitfalls of using :func:`exec` apply to this function as well.
 
     '''
+    for recorded in _code_recorders:
+        recorded.append((name, code, sorted(globals_ or ())))
+
+    if _precompiled:
+        factory = _precompiled.get(_code_hash(code))
+        if factory is not None:
+            return factory(**(globals_ or {}))
+
     namespace = dict(__builtins__={})
     if globals_:
         namespace.update(globals_)
-    exec(code, namespace)
+    exec(_compile(code), namespace)
     return namespace[name]
 
 
-def _field_val_cns(field, field_name, field_num):
-    '''Return (code, namespace)-tuple for determining a field's value.
+function_cache = util.LRUCache(maxsize=1024)
+'''A process-wide cache of instance-specific dump functions.
 
-    Args:
-        field: A :class:`lima.fields.Field` instance.
+Dump functions are generated from a schema's field configuration. Schema
+objects with the same configuration (the same fields in the same order and
+the same values for :attr:`Schema.ordered`, :attr:`Schema.many` etc.) share
+dump functions via this cache, regardless of whether they were created
+directly or by linked object fields.
 
-        field_name: The name (key) of the field.
+Use ``function_cache.stats()`` to get a dict containing the number of cache
+hits, misses and evictions. To change the maximum number of cached functions,
+set ``function_cache.maxsize``.
 
-        field_num: A schema-wide unique number for the field
+'''
 
-    Returns:
-        A tuple consisting of: a) a fragment of Python code to determine the
-        field's value for an object called ``obj`` and b) a namespace dict
-        containing the objects necessary for this code fragment to work.
 
-    For a field ``myfield`` that has a ``pack`` and a ``get`` callable defined,
-    the output of this function could look something like this:
+def _fingerprint(fields):
+    '''Return a hashable fingerprint of an ordered mapping of fields.
 
-    .. code-block:: python
+    Fields are compared by identity, so the fingerprint is equal for all field
+    mappings containing the same field objects under the same names in the
+    same order.
 
-        (
-            'pack3(get3(obj))',  # the code
-            {'get3': myfield.get, 'pack3': myfield.pack}  # the namespace
-        )
     '''
-    namespace = {}
-    if hasattr(field, 'val'):
-        # add constant-field-value-shortcut to namespace
-        name = 'val{}'.format(field_num)
-        namespace[name] = field.val
+    return tuple(fields.items())
 
-        # later, get value using this shortcut
-        val_code = name
 
-    elif hasattr(field, 'get'):
-        # add getter-shortcut to namespace
-        name = 'get{}'.format(field_num)
-        namespace[name] = field.get
+def _deep_fingerprint(schema, seen=None):
+    '''Return a fingerprint of the fields of a schema and of linked schemas.
 
-        # later, get value by calling this shortcut
-        val_code = '{}(obj)'.format(name)
+    Like :func:`_fingerprint`, but the fingerprints of schemas linked via
+    :class:`lima.fields.Embed` and :class:`lima.fields.Reference` fields are
+    part of the result as well.
 
-    elif hasattr(field, 'key'):
-        # add key-shortcut to namespace
-        name = 'key{}'.format(field_num)
-        namespace[name] = field.key
+    Args:
+        schema: A schema object.
 
-        # later, get value by using this shortcut
-        val_code = 'obj[{}]'.format(name)
+        seen: A set of ids of schemas already visited. Used to stop recursion
+            for schemas linking to themselves.
 
-    else:
-        # neither constant val nor getter: try to get value via attr
-        # (if attr is not specified, use field name as attr)
-        obj_attr = getattr(field, 'attr', field_name)
+    '''
+    if seen is None:
+        seen = set()
+    seen.add(id(schema))
+
+    items = []
+    for name, field in schema._fields.items():
+        nested = None
+        if isinstance(field, (lima_fields.Embed, lima_fields.Reference)):
+            nested = field._schema_inst
+        if isinstance(nested, Schema) and id(nested) not in seen:
+            items.append((name, field, _deep_fingerprint(nested, seen)))
+        else:
+            items.append((name, field))
+    return tuple(items)
 
-        if not str.isidentifier(obj_attr) or keyword.iskeyword(obj_attr):
-            msg = 'Not a valid attribute name: {!r}'
-            raise ValueError(msg.format(obj_attr))
 
-        # later, get value using this attr
-        val_code = 'obj.{}'.format(obj_attr)
+def _frozen(value):
+    '''Return a hashable equivalent of value (for use in cache keys).
 
-    if hasattr(field, 'pack'):
-        # add pack-shortcut to namespace
-        name = 'pack{}'.format(field_num)
-        namespace[name] = field.pack
+    Mappings become tuples of ``(key, value)``-tuples, other iterables
+    (except strings) become tuples. Elements are frozen recursively. All
+    other values are returned as they are (and might not be hashable).
 
-        # later, pass field value to this shortcut
-        val_code = '{}({})'.format(name, val_code)
+    '''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, collections_abc.Mapping):
+        return tuple((k, _frozen(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_frozen(v) for v in value)
+    return value
 
-    return val_code, namespace
 
+def _cached(factory):
+    '''Decorator caching the functions returned by factory.
 
-def _dump_field_func(field, field_name, many):
-    '''Return a customized function that dumps a single field.
+    The results of the decorated function-generating function get stored in
+    :data:`function_cache`, keyed by the function's (normalized) arguments.
+    Mappings of fields are replaced by their :func:`_fingerprint`. If the
+    arguments are not hashable, no caching takes place.
 
-    Args:
-        field: The field.
+    '''
+    signature = inspect.signature(factory)
+
+    @functools.wraps(factory)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (factory.__name__, ) + tuple(
+            _fingerprint(arg) if isinstance(arg, collections_abc.Mapping)
+            else arg for arg in bound.args
+        )
+        try:
+            func = function_cache.get(key)
+        except TypeError:
+            return factory(*args, **kwargs)  # unhashable arguments
+        if func is None:
+            func = factory(*args, **kwargs)
+            function_cache.set(key, func)
+        return func
 
-        field_name: The name (key) of the field.
+    return wrapper
 
-        many: If True(ish), the resulting function will expect collections of
-            objects, otherwise it will expect a single object.
 
-    Returns:
-        A custom function that expects an object (or a collection of objects
-        depending on ``many``), and returns a single field's value per object.
+def _binding_clauses(bindings):
+    '''Return comprehension clauses binding values (see _field_val_cns).'''
+    return ''.join(' for {} in ({},)'.format(name, code)
+                   for name, code in bindings)
+
+
+def _memo_statements(memos):
+    '''Return statements creating the memo dicts named in memos.'''
+    return ''.join('    {} = {{}}\n'.format(name) for name in memos)
+
+
+def _memoized(pack):
+    '''Return a version of pack remembering results in a memo dict.
+
+    The returned function expects a memo dict and a value. Results are
+    remembered by the identity of the value. The value itself is kept in the
+    memo dict as well, so its identity can't be reused as long as the memo
+    dict exists: For the duration of a single dump - or, for lazy dumps
+    (:meth:`Schema.dump_iter` and :meth:`Schema.dump_chunks`), for a single
+    object only.
 
     '''
-    val_code, namespace = _field_val_cns(field, field_name, 0)
+    def memo_pack(memo, val):
+        key = id(val)
+        entry = memo.get(key)
+        if entry is None:
+            entry = memo[key] = (val, pack(val))
+        return entry[1]
 
-    if many:
-        func_tpl = 'def dump_field(objs): return [{val_code} for obj in objs]'
-    else:
-        func_tpl = 'def dump_field(obj): return {val_code}'
+    return memo_pack
 
-    # assemble function code
-    code = func_tpl.format(val_code=val_code)
 
-    # finally create and return function
-    return _make_function('dump_field', code, namespace)
+def _binding_statements(bindings):
+    '''Return indented statements binding values (see _field_val_cns).'''
+    return ''.join('    {} = {}\n'.format(name, code)
+                   for name, code in bindings)
 
 
-def _dump_fields_func(fields, ordered, many):
-    '''Return a customized function that dumps multiple fields.
+def _field_steps(field, field_name, field_num):
+    '''Return (steps, namespace)-tuple for getting a field's unpacked value.
 
     Args:
-        fields: An ordered mapping of field names to fields.
+        field: A :class:`lima.fields.Field` instance without constant value.
 
-        ordered: If True(ish), the resulting function will return OrderedDict
-            objects, otherwise it will return ordinary dicts.
+        field_name: The name (key) of the field.
 
-        many: If True(ish), the resulting function will expect collections of
-            objects, otherwise it will expect a single object.
+        field_num: A schema-wide unique number for the field
 
     Returns:
-        A custom function that expects an object (or a collectionof objects
-        depending on ``many``), and returns multiple fields' values per object.
+        A tuple consisting of: a) a list of ``(step, template)``-tuples, one
+        per step on the way from an object to the field's (not yet packed)
+        value and b) a namespace dict containing the objects necessary for
+        the templates to work. ``template`` is a fragment of Python code with
+        ``{}`` as placeholder for the object the step is taken from. ``step``
+        is a hashable description of the step that is equal for equal steps
+        of different fields (or ``None`` if there is no such description).
 
     '''
-    # Get correct templates & namespace depending on "ordered" and "many" args
-    if ordered:
-        if many:
-            func_tpl = (
-                'def dump_fields(objs):\n'
-                '    return [OrderedDict([{joined_entries}]) for obj in objs]'
-            )
+    namespace = {}
+    if hasattr(field, 'get'):
+        # add getter-shortcut to namespace
+        name = 'get{}'.format(field_num)
+        namespace[name] = field.get
+
+        # later, get value by calling this shortcut (getters that can't be
+        # hashed are not shared)
+        step = ('get', field.get)
+        try:
+            hash(step)
+        except TypeError:
+            step = None
+        return [(step, name + '({})')], namespace
+
+    if hasattr(field, 'key'):
+        # a list of keys is a path of keys (lists can't be keys themselves)
+        if isinstance(field.key, list):
+            names = ['keys{}_{}'.format(field_num, key_num)
+                     for key_num in range(len(field.key))]
+            keys = field.key
         else:
-            func_tpl = (
-                'def dump_fields(obj):\n'
-                '    return OrderedDict([{joined_entries}])'
-            )
-        entry_tpl = '({field_name!r}, {val_code})'
-        namespace = {'OrderedDict': OrderedDict}
+            names = ['key{}'.format(field_num)]
+            keys = [field.key]
+
+        # add key-shortcuts to namespace
+        namespace.update(zip(names, keys))
+
+        # later, get value by using these shortcuts
+        steps = []
+        for name, key in zip(names, keys):
+            step = ('key', key)
+            try:
+                hash(step)
+            except TypeError:
+                step = None
+            steps.append((step, '{}[' + name + ']'))
+        return steps, namespace
+
+    # neither constant val nor getter: try to get value via attr
+    # (if attr is not specified, use field name as attr)
+    if hasattr(field, 'attr'):
+        obj_attrs = field.attr.split('.')
     else:
-        if many:
-            func_tpl = (
-                'def dump_fields(objs):\n'
-                '    return [{{{joined_entries}}} for obj in objs]'
-            )
-        else:
-            func_tpl = (
-                'def dump_fields(obj):\n'
-                '    return {{{joined_entries}}}'
-            )
-        entry_tpl = '{field_name!r}: {val_code}'
-        namespace = {}
+        obj_attrs = [field_name]
 
-    # one entry per field
-    entries = []
+    for obj_attr in obj_attrs:
+        if not str.isidentifier(obj_attr) or keyword.iskeyword(obj_attr):
+            msg = 'Not a valid attribute name: {!r}'
+            raise ValueError(msg.format(getattr(field, 'attr', obj_attr)))
 
-    # iterate over fields to fill up entries
-    for field_num, (field_name, field) in enumerate(fields.items()):
-        val_code, val_ns = _field_val_cns(field, field_name, field_num)
-        namespace.update(val_ns)
+    # later, get value using these attrs
+    steps = [(('attr', obj_attr), '{}.' + obj_attr) for obj_attr in obj_attrs]
+    return steps, namespace
 
-        # add entry
-        entries.append(
-            entry_tpl.format(field_name=field_name, val_code=val_code)
-        )
 
-    # assemble function code
-    code = func_tpl.format(joined_entries=', '.join(entries))
+def _path(field, steps):
+    '''Return a hashable description of a field's access path.
 
-    # finally create and return function
-    return _make_function('dump_fields', code, namespace)
+    Paths of fields with the same steps (see :func:`_field_steps`) and the
+    same ``none_safe`` setting are equal. Paths end before the first step
+    that has no description.
 
+    '''
+    path = [bool(getattr(field, 'none_safe', False))]
+    for step, _ in steps:
+        if step is None:
+            break
+        path.append(step)
+    return tuple(path)
 
-# Schema Metaclass ############################################################
 
-class SchemaMeta(type):
-    '''Metaclass of Schema.
+def _chain_code(start, templates, none_safe, nullable, name_prefix,
+                bindings):
+    '''Return code taking steps (given via templates) from start on.
 
-    .. note::
-       The metaclass :class:`SchemaMeta` is used internally to simplify the
-       configuration of new :class:`Schema` classes. For users of the library
-       there should be no need to use :class:`SchemaMeta` directly.
+    Args:
+        start: A fragment of code to start from (usually a name).
 
-    When defining a new :class:`Schema` (sub)class, :class:`SchemaMeta` makes
-    sure that the new class has a class attribute :attr:`__fields__` of type
-    :class:`collections.OrderedDict` containing the fields for the new
-    Schema.
+        templates: Templates of the steps to take (see :func:`_field_steps`).
 
-    :attr:`__fields__` is determined like this:
+        none_safe: If True(ish), None along the way results in None (instead
+            of an error being raised).
 
-    - The :attr:`__fields__` of all base classes are copied (with base classes
-      specified first having precedence).
+        nullable: If True(ish), start itself might be None (only relevant if
+            ``none_safe`` is True(ish)).
 
-      Note that the fields themselves are *not* copied - changing an inherited
-      field would change this field for all base classes referencing this field
-      as well. In general it is *strongly* suggested to treat fields as
-      immutable.
+        name_prefix: A prefix for names intermediate values get bound to.
 
-    - Fields (Class variables of type :class:`lima.abc.FieldABC`) are moved out
-      of the class namespace and into :attr:`__fields__`, overriding any fields
-      of the same name therein.
+        bindings: A list of ``(name, code)``-tuples to append bindings of
+            intermediate values to (see :func:`_field_val_cns`).
 
-    - If present, the class attribute :attr:`__lima_args__` is removed from the
-      class namespace and evaluated as follows:
+    '''
+    code, is_name = start, True
+    for step_num, template in enumerate(templates):
+        if none_safe and (step_num or nullable):
+            # bind intermediate value to a name to stop at the first None
+            if not is_name:
+                name = '{}_{}'.format(name_prefix, step_num)
+                bindings.append((name, code))
+                code = name
+            code = '(None if {} is None else {})'.format(code,
+                                                         template.format(code))
+        else:
+            code = template.format(code)
+        is_name = False
+    return code
 
-      - Fields specified via ``__lima_args__['include']`` (an optional mapping
-        of field names to fields) are inserted into :attr:`__fields__`.
-        overriding any fields of the same name therein.
 
-        If the order of your fields is important, make sure that
-        ``__lima_args__['include']`` is of type
-        :class:`collections.OrderedDict` or similar.
+def _shared_cns(fields, prefix, obj_name, prefetched=()):
+    '''Return (shared, bindings, namespace)-tuple for shared access paths.
 
-        New fields in ``__lima_args__['include']__`` are inserted at the
-        position where ``__lima_args__`` is specified in the class.
+    Args:
+        fields: An ordered mapping of field names to fields.
 
-      - Fields named in an optional sequence ``__lima_args__['exclude']`` are
-        removed from :attr:`__fields__`. If only one field is to be removed,
-        it's ok to supply a simple string instead of a list containing only one
-        string. ``__lima_args__['exclude']`` may not be specified together with
-        ``__lima_args__['only']``.
+        prefix: A prefix for the numbers of the fields (see
+            :func:`_row_cns`).
 
-      - If in an optional sequence ``__lima_args__['only']`` is provided, *all
-        but* the fields mentioned therein are removed from :attr:`__fields__`.
-        If only one field is to remain, it's ok to supply a simple string
-        instead of a list containing only one string. ``__lima_args__['only']``
-        may not be specified together with ``__lima_args__['exclude']``.
+        obj_name: The name of the object in the generated code.
 
-        Think twice before using ``__lima_args__['only']`` - most of the time
-        it's better to rethink your Schema than to remove a lot of fields that
-        maybe shouldn't be there in the first place.
+        prefetched: See :func:`_dump_fields_func`.
 
-    .. versionadded:: 0.3
-        Support for ``__lima_args__['only']``.
+    Returns:
+        A tuple consisting of: a) a dict mapping paths (see :func:`_path`)
+        shared by more than one field to names those paths' values get bound
+        to, b) a list of ``(name, code)``-tuples of those bindings (see
+        :func:`_field_val_cns`) and c) a namespace dict containing the objects
+        necessary for the bindings to work.
 
-    :class:`SchemaMeta` also makes sure the new Schema class is registered with
-    the lima class registry :mod:`lima.registry` (at least if the Schema isn't
-    defined inside a local namespace, where we wouldn't find it later on).
+    This way, the values of attributes, items or getters used by more than
+    one field (like ``obj.profile`` for fields with the attrs
+    ``'profile.name'`` and ``'profile.email'``) are determined only once per
+    object.
 
     '''
-    def __new__(metacls, name, bases, namespace):
+    namespace = {}
+    templates = {}  # step templates per (first field with a) path
+    counts = {}  # number of fields per path
 
-        # aggregate fields from base classes
-        fields = _fields_from_bases(bases)
+    for field_num, (field_name, field) in enumerate(fields.items()):
+        if field_name in prefetched or hasattr(field, 'val'):
+            continue
+        num = '{}{}'.format(prefix, field_num)
+        steps, steps_ns = _field_steps(field, field_name, num)
+        namespace.update(steps_ns)
+        path = _path(field, steps)
+        for length in range(2, len(path) + 1):
+            counts[path[:length]] = counts.get(path[:length], 0) + 1
+            templates.setdefault(path[:length],
+                                 [template for _, template in steps])
+
+    shared = {}
+    bindings = []
+    for path in sorted(counts, key=len):
+        if counts[path] < 2:
+            continue
+        none_safe = path[0]
+
+        # start with the longest shared path leading to this one (if any)
+        start, start_len, nullable = obj_name, 1, False
+        for length in range(len(path) - 1, 1, -1):
+            if path[:length] in shared:
+                start, start_len = shared[path[:length]], length
+                nullable = none_safe
+                break
+
+        name = 's{}{}'.format(prefix, len(shared))
+        code = _chain_code(start, templates[path][start_len - 1:len(path) - 1],
+                           none_safe, nullable, 'c' + name, bindings)
+        bindings.append((name, code))
+        shared[path] = name
+
+    return shared, bindings, namespace
+
+
+def _field_get_cns(field, field_name, field_num, obj_name='obj',
+                   bindings=None, shared=None):
+    '''Return (code, namespace)-tuple for getting a field's unpacked value.
 
-        # get and verify __lima_args__
-        args = namespace.get('__lima_args__', {})
-        with util.exception_context('__lima_args__'):
-            util.ensure_mapping(args)
-            util.ensure_subset_of(args, {'include', 'exclude', 'only'})
-            util.ensure_only_one_of(args, {'exclude', 'only'})
+    Args:
+        field: A :class:`lima.fields.Field` instance.
 
-        # determine individual args (include, exclude, only)
-        include = args.get('include', {})
-        exclude = util.vector_context(args.get('exclude', []))
-        only = util.vector_context(args.get('only', []))
+        field_name: The name (key) of the field.
 
-        # loop over copy of namespace items (we mutate namespace in this loop)
-        for k, v in list(namespace.items()):
-            if k == '__lima_args__':
-                # at position of __lima_args__: insert include (if specified)
-                if include:
-                    with util.exception_context("__lima_args__['include']"):
-                        fields = _fields_include(fields, include)
-            elif isinstance(v, abc.FieldABC):
-                # if a field was found: move it from namespace into fields
-                # (also, mangle its name to allow some special field names)
-                fields[_mangle_name(k)] = namespace.pop(k)
+        field_num: A schema-wide unique number for the field
+
+        obj_name: The name of the object in the generated code.
+
+        bindings: A list of ``(name, code)``-tuples of values to be bound (in
+            order) before the resulting code fragment is evaluated. Might get
+            extended by this function. Required for fields with a
+            ``none_safe`` path.
+
+        shared: An optional mapping of access paths to names of bound values
+            (see :func:`_shared_cns`). If provided, the code starts from the
+            longest shared path matching the field's path.
+
+    Returns:
+        A tuple consisting of: a) a fragment of Python code to get the field's
+        (not yet packed) value from an object called ``obj`` (or whatever was
+        specified via ``obj_name``) and b) a namespace dict containing the
+        objects necessary for this code fragment to work.
+
+    See :func:`_field_val_cns` for details.
+
+    '''
+    if hasattr(field, 'val'):
+        # add constant-field-value-shortcut to namespace
+        name = 'val{}'.format(field_num)
+
+        # later, get value using this shortcut
+        return name, {name: field.val}
+
+    steps, namespace = _field_steps(field, field_name, field_num)
+    templates = [template for _, template in steps]
+    none_safe = getattr(field, 'none_safe', False)
+
+    # start from a shared path (if possible)
+    start, nullable = obj_name, False
+    if shared:
+        path = _path(field, steps)
+        for length in range(len(path), 1, -1):
+            if path[:length] in shared:
+                start, nullable = shared[path[:length]], none_safe
+                templates = templates[length - 1:]
+                break
+
+    get_code = _chain_code(start, templates, none_safe, nullable,
+                           'c{}'.format(field_num), bindings)
+    return get_code, namespace
+
+
+def _field_val_cns(field, field_name, field_num, obj_name='obj',
+                   bindings=None, shared=None, memos=None):
+    '''Return (code, namespace)-tuple for determining a field's value.
+
+    Args:
+        field: A :class:`lima.fields.Field` instance.
+
+        field_name: The name (key) of the field.
+
+        field_num: A schema-wide unique number for the field
+
+        obj_name: The name of the object in the generated code.
+
+        bindings: An optional list of ``(name, code)``-tuples of values to be
+            bound (in order) before the resulting code fragment is evaluated.
+            If provided, the list might get extended by this function.
+
+        shared: See :func:`_field_get_cns`.
+
+        memos: An optional list of names of memo dicts to create once per
+            call of the generated function. If provided (and if the field's
+            ``memoize`` attribute is True(ish)), the list gets extended by
+            this function and packed values are remembered per linked object
+            (see :func:`_memoized`).
+
+    Returns:
+        A tuple consisting of: a) a fragment of Python code to determine the
+        field's value for an object called ``obj`` (or whatever was specified
+        via ``obj_name``) and b) a namespace dict containing the objects
+        necessary for this code fragment to work.
+
+    For a field ``myfield`` that has a ``pack`` and a ``get`` callable defined,
+    the output of this function could look something like this:
+
+    .. code-block:: python
+
+        (
+            'pack3(get3(obj))',  # the code
+            {'get3': myfield.get, 'pack3': myfield.pack}  # the namespace
+        )
+
+    Fields with a ``pack_template`` (see :class:`lima.fields.Field`) get
+    their values packed inline instead. If the template refers to the
+    unpacked value more than once, the value has to be bound to a name first.
+    This is only possible if ``bindings`` is provided, otherwise ``pack`` is
+    called as usual.
+
+    '''
+    val_code, namespace = _field_get_cns(field, field_name, field_num,
+                                         obj_name, bindings, shared)
+
+    if _is_consistent_with_pack(field, 'pack_template'):
+        template = field.pack_template
+        names = [name for _, name, _, _ in string.Formatter().parse(template)
+                 if name is not None]
+        needs_name = names.count('val') > 1 and not val_code.isidentifier()
+        if not needs_name or bindings is not None:
+            if needs_name:
+                # bind unpacked value to a name
+                name = 'p{}'.format(field_num)
+                bindings.append((name, val_code))
+                val_code = name
+
+            # add template globals to namespace (with unique names)
+            mapping = {'val': val_code}
+            for key, value in getattr(field, 'pack_globals', {}).items():
+                name = 'g{}_{}'.format(field_num, key)
+                namespace[name] = value
+                mapping[key] = name
+
+            return '({})'.format(template.format_map(mapping)), namespace
+
+    if hasattr(field, 'pack'):
+        # add pack-shortcut to namespace
+        name = 'pack{}'.format(field_num)
+        if memos is not None and getattr(field, 'memoize', False):
+            memo_name = 'memo{}'.format(field_num)
+            memos.append(memo_name)
+            namespace[name] = _memoized(field.pack)
+            val_code = '{}({}, {})'.format(name, memo_name, val_code)
+        else:
+            namespace[name] = field.pack
+            # later, pass field value to this shortcut
+            val_code = '{}({})'.format(name, val_code)
+
+    return val_code, namespace
+
+
+@_cached
+def _get_field_func(field, field_name):
+    '''Return a customized function that gets a field's unpacked value.
+
+    Args:
+        field: The field.
+
+        field_name: The name (key) of the field.
+
+    Returns:
+        A custom function that expects a single object and returns the
+        field's value for this object - without packing it. (For fields with
+        a coroutine function as getter, this is an awaitable.)
+
+    '''
+    bindings = []
+    get_code, namespace = _field_get_cns(field, field_name, 0,
+                                         bindings=bindings)
+    code = 'def get_field(obj):\n{statements}    return {get_code}'.format(
+        statements=_binding_statements(bindings), get_code=get_code
+    )
+    return _make_function('get_field', code, namespace)
+
+
+def _has_coroutine_getter(field):
+    '''Return True if field's value is determined by a coroutine function.'''
+    return (not hasattr(field, 'val') and
+            inspect.iscoroutinefunction(getattr(field, 'get', None)))
+
+
+def _has_async_target(field, seen=None):
+    '''Return True if field links to objects whose marshalling awaits stuff.
+
+    This is the case for linked object fields whose associated schema (or
+    referenced field) requires awaiting to marshal the linked objects.
+
+    Args:
+        field: The field.
+
+        seen: A set of IDs of linked schemas (and ``(ID, field name)``-tuples
+            of referenced fields) already visited. Used internally to stop
+            recursion for schemas linking to themselves.
+
+    '''
+    if seen is None:
+        seen = set()
+
+    if isinstance(field, lima_fields.Embed):
+        nested = field._schema_inst
+        if not isinstance(nested, Schema) or id(nested) in seen:
+            return False
+        seen.add(id(nested))
+        return any(_is_async_field(f, seen) for f in nested._fields.values())
+
+    if isinstance(field, lima_fields.Reference):
+        nested = field._schema_inst
+        node = (id(nested), field._field)
+        if not isinstance(nested, Schema) or node in seen:
+            return False
+        seen.add(node)
+        return _is_async_field(nested._fields[field._field], seen)
+
+    return False
+
+
+def _is_async_field(field, seen=None):
+    '''Return True if determining field's value requires awaiting.
+
+    This is the case for fields with coroutine functions as getters, as well
+    as for fields linking to objects whose marshalling requires awaiting (see
+    :func:`_has_async_target`).
+
+    '''
+    return _has_coroutine_getter(field) or _has_async_target(field, seen)
+
+
+def _defining_class(obj, attr):
+    '''Return the class defining obj's attribute attr.
+
+    Returns ``None`` if ``obj`` doesn't have an attribute ``attr`` at all, and
+    ``obj`` itself if the attribute is set on the instance level.
+
+    '''
+    if attr in getattr(obj, '__dict__', ()):
+        return obj
+    for cls in type(obj).__mro__:
+        if attr in cls.__dict__:
+            return cls
+    return None
+
+
+def _is_consistent_with_pack(field, attr):
+    '''Return True if field has an attribute attr consistent with its pack.
+
+    Alternatives to a field's ``pack`` method (like ``pack_json`` or
+    ``pack_template``) are only used if they were defined along with (or
+    after) the field's ``pack`` method. This way, overriding ``pack`` in a
+    subclass of a field with a ``pack_json`` method (for example) does not lead
+    to diverging results of :meth:`Schema.dump` and :meth:`Schema.dump_json`.
+
+    '''
+    attr_cls = _defining_class(field, attr)
+    if attr_cls is None or attr_cls is field:
+        return attr_cls is not None
+    pack_cls = _defining_class(field, 'pack')
+    if pack_cls is field:
+        return False
+    return pack_cls is None or issubclass(attr_cls, pack_cls)
+
+
+def _field_json_cns(field, field_name, field_num, bindings, shared=None,
+                    memos=None):
+    '''Return (code, namespace)-tuple for determining a field's JSON text.
+
+    Args:
+        field: A :class:`lima.fields.Field` instance.
+
+        field_name: The name (key) of the field.
+
+        field_num: A schema-wide unique number for the field
+
+        bindings: See :func:`_field_val_cns`.
+
+        shared: See :func:`_field_get_cns`.
+
+        memos: See :func:`_field_val_cns`.
+
+    Returns:
+        A tuple consisting of: a) a fragment of Python code to determine the
+        JSON representation (a string) of the field's value for an object
+        called ``obj`` and b) a namespace dict containing the objects necessary
+        for this code fragment to work.
+
+    Fields that know how to encode their values as JSON provide a method
+    ``pack_json`` that is used instead of ``pack``. For all other fields, the
+    packed value gets encoded via :func:`json.dumps`.
+
+    '''
+    if _is_consistent_with_pack(field, 'pack_json'):
+        get_code, namespace = _field_get_cns(field, field_name, field_num,
+                                             bindings=bindings, shared=shared)
+        name = 'pack_json{}'.format(field_num)
+        if memos is not None and getattr(field, 'memoize', False):
+            memo_name = 'memo{}'.format(field_num)
+            memos.append(memo_name)
+            namespace[name] = _memoized(field.pack_json)
+            return '{}({}, {})'.format(name, memo_name, get_code), namespace
+        namespace[name] = field.pack_json
+        return '{}({})'.format(name, get_code), namespace
+
+    val_code, namespace = _field_val_cns(field, field_name, field_num,
+                                         bindings=bindings, shared=shared,
+                                         memos=memos)
+    namespace['dumps'] = json.dumps
+    return 'dumps({})'.format(val_code), namespace
+
+
+selection_cache_size = 128
+'''The maximum number of field selections to remember per schema object.
+
+Dumping with ``only`` or ``exclude`` (see :meth:`Schema.dump`) creates a
+variant of the schema object (with its own dump functions) once per distinct
+selection. Variants are kept in a per-schema LRU cache of this size. Changes
+only affect schema objects dumping with a selection for the first time
+afterwards.
+
+'''
+
+inline_depth = 2
+'''The number of levels of embedded schemas to inline into dump functions.
+
+When creating a dump function, the code determining the marshalled
+representation of objects linked via :class:`lima.fields.Embed` fields gets
+written directly into the dump function instead of calling the associated
+schema's dump function for every linked object. This is done recursively, up
+to the depth specified here. Set to ``0`` to disable inlining. Changes only
+affect dump functions created afterwards.
+
+'''
+
+
+def _inlinable_schema(field):
+    '''Return the schema of an embed field if it can be inlined (or None).
+
+    Only schemas of :class:`lima.fields.Embed` fields that don't customize
+    how linked objects are packed (and don't memoize them) can be inlined -
+    and only if the schema doesn't profile, record metrics or cache results.
+
+    '''
+    if not isinstance(field, lima_fields.Embed) or field.memoize:
+        return None
+    if (_defining_class(field, 'pack') is not lima_fields.Embed or
+            type(field)._pack_func is not lima_fields.Embed._pack_func):
+        return None
+    nested = field._schema_inst
+    if (not isinstance(nested, Schema) or
+            type(nested)._dump_fields is not Schema._dump_fields):
+        return None
+    if (nested._profile is not None or nested._metrics is not None or
+            nested._cache is not None):
+        return None  # dumps have to go through the schema's function
+    return nested
+
+
+def _guarded(bindings, obj_name):
+    '''Return bindings guarded against obj_name being None.'''
+    return [(name, 'None if {} is None else {}'.format(obj_name, code))
+            for name, code in bindings]
+
+
+OUTPUTS = ('dict', 'tuple', 'namedtuple', 'record')
+'''The output modes supported by schema objects (see :class:`Schema`).'''
+
+
+def _row_attrs(header):
+    '''Return the attribute names of rows for a header (field names).
+
+    Field names that are not valid attribute names (as well as duplicates and
+    names starting with an underscore) are replaced by ``_`` and the field's
+    index, just like ``namedtuple(..., rename=True)`` does.
+
+    '''
+    attrs = []
+    for index, name in enumerate(header):
+        if (not name.isidentifier() or keyword.iskeyword(name) or
+                name.startswith('_') or name in attrs):
+            name = '_{}'.format(index)
+        attrs.append(name)
+    return tuple(attrs)
+
+
+def _row(output, header, values):
+    '''Return a row of the type for output and header (used to unpickle).'''
+    return _row_type(output, header)(*values)
+
+
+def _row_asdict(row):
+    '''Return a dict mapping the field names of row to its values.'''
+    return dict(zip(row._header, row))
+
+
+def _row_reduce(row):
+    '''Return a picklable representation of row.'''
+    return _row, (row._output, row._header, tuple(row))
+
+
+class Record:
+    '''Base class of the records created by schemas with output='record'.
+
+    Records are compact objects with one slot per field (and no instance
+    dict). Their values can be accessed as attributes (see :attr:`_fields`
+    for the attribute names), by index and by iterating over them (in the
+    order of the schema's fields). :meth:`_asdict` converts a record to a
+    dict.
+
+    Record classes are created (and shared) per output mode and header.
+
+    .. versionadded:: 0.6
+
+    '''
+    __slots__ = ()
+    _fields = ()  # attribute names
+    _header = ()  # field names
+    _output = 'record'
+
+    @classmethod
+    def _make(cls, iterable):
+        '''Return a new record containing the values of iterable.'''
+        return cls(*iterable)
+
+    def __iter__(self):
+        for attr in self._fields:
+            yield getattr(self, attr)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        return getattr(self, self._fields[index])
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    __hash__ = None  # records are mutable
+
+    def __repr__(self):
+        return '{}({})'.format(
+            type(self).__name__,
+            ', '.join('{}={!r}'.format(attr, val)
+                      for attr, val in zip(self._fields, self))
+        )
+
+    _asdict = _row_asdict
+    __reduce__ = _row_reduce
+
+
+_row_types = {}
+'''A mapping of (output, header)-tuples to row types (see _row_type).'''
+
+
+def _row_type(output, header):
+    '''Return the row type for output mode and header (field names).
+
+    Args:
+        output: Either ``'namedtuple'`` or ``'record'``.
+
+        header: A tuple of field names.
+
+    Returns:
+        A subclass of a :func:`collections.namedtuple` type or of
+        :class:`Record`. Row types are created once per output mode and
+        header. Instances convert to dicts via ``_asdict()`` and can be
+        pickled.
+
+    '''
+    key = (output, header)
+    row_type = _row_types.get(key)
+    if row_type is not None:
+        return row_type
+
+    attrs = _row_attrs(header)
+    namespace = {'__slots__': (), '_header': header, '_output': output,
+                 '_asdict': _row_asdict, '__reduce__': _row_reduce}
+    if output == 'namedtuple':
+        bases = (namedtuple('Row', attrs, rename=True), )
+    else:
+        code = 'def __init__(_self{params}):\n{statements}'.format(
+            params=''.join(', ' + attr for attr in attrs),
+            statements=''.join('    _self.{0} = {0}\n'.format(attr)
+                               for attr in attrs) or '    pass\n'
+        )
+        namespace.update(__slots__=attrs, _fields=attrs,
+                         __init__=_make_function('__init__', code))
+        bases = (Record, )
+    row_type = type('Row', bases, namespace)
+    return _row_types.setdefault(key, row_type)
+
+
+def _row_cns(fields, ordered, obj_name, prefix, depth, prefetched=(),
+             nullable=False, output='dict', memos=None):
+    '''Return (code, bindings, namespace)-tuple for marshalling an object.
+
+    Args:
+        fields: An ordered mapping of field names to fields.
+
+        ordered: If True(ish), the code will create an OrderedDict object,
+            otherwise it will create an ordinary dict.
+
+        obj_name: The name of the object in the generated code.
+
+        prefix: A prefix for the numbers of the fields (used to keep names
+            of inlined schemas' fields unique).
+
+        depth: The number of levels of embedded schemas to inline (see
+            :data:`inline_depth`).
+
+        prefetched: See :func:`_dump_fields_func`.
+
+        nullable: If True(ish), the object referred to by ``obj_name`` might
+            be ``None``.
+
+        output: One of :data:`OUTPUTS`: The code will create a dict
+            (depending on ``ordered``), a tuple, a namedtuple or a
+            :class:`Record` (see :func:`_row_type`) of the fields' values.
+
+        memos: See :func:`_field_val_cns` (applies to inlined schemas as
+            well).
+
+    Returns:
+        A tuple consisting of: a) a fragment of Python code creating the
+        marshalled representation of the object, b) a list of ``(name,
+        code)``-tuples of values the code fragment relies on (to be bound in
+        order before evaluating the code fragment) and c) a namespace dict
+        containing the objects necessary for the code to work.
+
+    Linked objects of inlined embed fields (as well as the values of fields
+    with a ``pack_template`` referring to them more than once and values of
+    access paths shared by multiple fields) get bound to names. The bindings
+    of values of ``nullable`` objects are guarded against ``None``.
+
+    '''
+    if output != 'dict':
+        entry_tpl = '{val_code}'
+        namespace = {}
+        if output == 'tuple':
+            row_tpl = '({joined_entries},)' if fields else '()'
+        elif output == 'namedtuple':
+            # tuple.__new__ skips the argument handling of namedtuple types
+            row_tpl = 'tuple_new(Row{0}, ({{joined_entries}},))'.format(
+                prefix
+            ) if fields else 'tuple_new(Row{})'.format(prefix)
+            namespace['tuple_new'] = tuple.__new__
+        else:
+            row_tpl = 'Row{}({{joined_entries}})'.format(prefix)
+        if output != 'tuple':
+            namespace['Row' + prefix] = _row_type(output, tuple(fields))
+    elif ordered:
+        row_tpl = 'OrderedDict([{joined_entries}])'
+        entry_tpl = '({field_name!r}, {val_code})'
+        namespace = {'OrderedDict': OrderedDict}
+    else:
+        row_tpl = '{{{joined_entries}}}'
+        entry_tpl = '{field_name!r}: {val_code}'
+        namespace = {}
+
+    # bind values of access paths shared by multiple fields
+    shared, bindings, shared_ns = _shared_cns(fields, prefix, obj_name,
+                                              prefetched)
+    namespace.update(shared_ns)
+    if nullable:
+        bindings = _guarded(bindings, obj_name)
+
+    # one entry per field
+    entries = []
+
+    # iterate over fields to fill up entries
+    for field_num, (field_name, field) in enumerate(fields.items()):
+        num = '{}{}'.format(prefix, field_num)
+        nested = _inlinable_schema(field) if depth > 0 else None
+        own_bindings = []  # bindings of values of the object itself
+        nested_bindings = []  # bindings of values of an inlined object
+
+        if field_name in prefetched:
+            val_code = 'pre{}'.format(num)
+        elif nested is None:
+            val_code, val_ns = _field_val_cns(field, field_name, num,
+                                              obj_name, own_bindings, shared,
+                                              memos)
+            namespace.update(val_ns)
+        else:
+            # bind linked object to a name (unless it is bound already)
+            get_code, get_ns = _field_get_cns(field, field_name, num,
+                                              obj_name, own_bindings, shared)
+            namespace.update(get_ns)
+            if get_code.isidentifier():
+                name = get_code
+            else:
+                name = 'v{}'.format(num)
+                own_bindings.append((name, get_code))
+
+            # inline the code of the associated schema
+            if nested._many:
+                item_name = 'o{}'.format(num)
+                row, item_bindings, nested_ns = _row_cns(
+                    nested._fields, nested._ordered, item_name,
+                    num + '_', depth - 1, output=nested._output,
+                    memos=memos
+                )
+                nested_code = '[{} for {} in {}{}]'.format(
+                    row, item_name, name, _binding_clauses(item_bindings)
+                )
+            else:
+                nested_code, nested_bindings, nested_ns = _row_cns(
+                    nested._fields, nested._ordered, name,
+                    num + '_', depth - 1, nullable=True,
+                    output=nested._output, memos=memos
+                )
+            namespace.update(nested_ns)
+            val_code = '(None if {} is None else {})'.format(name,
+                                                             nested_code)
+
+        if nullable:
+            own_bindings = _guarded(own_bindings, obj_name)
+        bindings.extend(own_bindings)
+        bindings.extend(nested_bindings)
+
+        # add entry
+        entries.append(
+            entry_tpl.format(field_name=field_name, val_code=val_code)
+        )
+
+    row = row_tpl.format(joined_entries=', '.join(entries))
+    return row, bindings, namespace
+
+
+@_cached
+def _dump_field_func(field, field_name, many):
+    '''Return a customized function that dumps a single field.
+
+    Args:
+        field: The field.
+
+        field_name: The name (key) of the field.
+
+        many: If True(ish), the resulting function will expect collections of
+            objects, otherwise it will expect a single object.
+
+    Returns:
+        A custom function that expects an object (or a collection of objects
+        depending on ``many``), and returns a single field's value per object.
+
+    '''
+    bindings = []
+    memos = []
+    val_code, namespace = _field_val_cns(field, field_name, 0,
+                                         bindings=bindings, memos=memos)
+
+    if many:
+        func_tpl = (
+            'def dump_field(objs):\n'
+            '{setup}'
+            '    return [{val_code} for obj in objs{clauses}]'
+        )
+    else:
+        func_tpl = (
+            'def dump_field(obj):\n'
+            '{setup}'
+            '{statements}'
+            '    return {val_code}'
+        )
+
+    # assemble function code
+    code = func_tpl.format(val_code=val_code,
+                           setup=_memo_statements(memos),
+                           clauses=_binding_clauses(bindings),
+                           statements=_binding_statements(bindings))
+
+    # finally create and return function
+    return _make_function('dump_field', code, namespace)
+
+
+@_cached
+def _dump_fields_func(fields, ordered, many, lazy=False, prefetched=(),
+                      inline=0, output='dict'):
+    '''Return a customized function that dumps multiple fields.
+
+    Args:
+        fields: An ordered mapping of field names to fields.
+
+        ordered: If True(ish), the resulting function will return OrderedDict
+            objects, otherwise it will return ordinary dicts.
+
+        many: If True(ish), the resulting function will expect collections of
+            objects, otherwise it will expect a single object.
+
+        lazy: If True(ish) (and if ``many`` is True(ish) as well), the
+            resulting function will return a generator instead of a list.
+
+        prefetched: An optional collection of names of fields whose values
+            have already been determined elsewhere. The resulting function
+            expects those values as additional positional arguments (one per
+            prefetched field, in the order of ``fields``): Either the value
+            itself, or - depending on ``many`` - a sequence containing one
+            value per object.
+
+        inline: The number of levels of embedded schemas to inline (see
+            :data:`inline_depth`).
+
+        output: The type of the marshalled representation of each object
+            (see :func:`_row_cns`).
+
+    Returns:
+        A custom function that expects an object (or a collectionof objects
+        depending on ``many``), and returns multiple fields' values per object.
+
+    '''
+    if many and lazy:
+        func_tpl = (
+            'def dump_fields(objs{params}):\n'
+            '{setup}'
+            '    return ({row} for {targets} in {source}{clauses})'
+        )
+    elif many:
+        func_tpl = (
+            'def dump_fields(objs{params}):\n'
+            '{setup}'
+            '    return [{row} for {targets} in {source}{clauses}]'
+        )
+    else:
+        func_tpl = (
+            'def dump_fields(obj{params}):\n'
+            '{setup}'
+            '{statements}'
+            '    return {row}'
+        )
+
+    memos = []
+    row, bindings, namespace = _row_cns(fields, ordered, 'obj', '', inline,
+                                        prefetched, output=output,
+                                        memos=memos)
+
+    # names of prefetched values (per object) and sequences thereof
+    pre_nums = [field_num for field_num, field_name in enumerate(fields)
+                if field_name in prefetched]
+    pre_names = ['pre{}'.format(field_num) for field_num in pre_nums]
+    pres_names = ['pres{}'.format(field_num) for field_num in pre_nums]
+
+    # determine additional params and (for many) iteration targets & source
+    if not pre_names:
+        params, targets, source = '', 'obj', 'objs'
+    elif many:
+        params = ''.join(', ' + name for name in pres_names)
+        targets = ', '.join(['obj'] + pre_names)
+        source = 'zip(objs{})'.format(params)
+        namespace['zip'] = zip
+    else:
+        params = ''.join(', ' + name for name in pre_names)
+        targets, source = None, None
+
+    # memo dicts live as long as a dump - except for lazy dumps, where they
+    # are created per object (so streams don't keep every linked object)
+    if many and lazy:
+        setup = ''
+        bindings = [(name, '{}') for name in memos] + bindings
+    else:
+        setup = _memo_statements(memos)
+
+    # assemble function code
+    code = func_tpl.format(row=row, params=params, targets=targets,
+                           source=source, setup=setup,
+                           clauses=_binding_clauses(bindings),
+                           statements=_binding_statements(bindings))
+
+    # finally create and return function
+    return _make_function('dump_fields', code, namespace)
+
+
+@_cached
+def _dump_field_json_func(field, field_name, many):
+    '''Return a customized function that dumps a single field as JSON.
+
+    Args:
+        field: The field.
+
+        field_name: The name (key) of the field.
+
+        many: If True(ish), the resulting function will expect collections of
+            objects, otherwise it will expect a single object.
+
+    Returns:
+        A custom function that expects an object (or a collection of objects
+        depending on ``many``), and returns the JSON representation of a
+        single field's value (or of a list of such values).
+
+    '''
+    bindings = []
+    memos = []
+    json_code, namespace = _field_json_cns(field, field_name, 0, bindings,
+                                           memos=memos)
+
+    if many:
+        func_tpl = (
+            'def dump_field_json(objs):\n'
+            '{setup}'
+            '    return "[" + ", ".join(\n'
+            '        [{json_code} for obj in objs{clauses}]\n'
+            '    ) + "]"'
+        )
+    else:
+        func_tpl = (
+            'def dump_field_json(obj):\n'
+            '{setup}'
+            '{statements}'
+            '    return {json_code}'
+        )
+
+    # assemble function code
+    code = func_tpl.format(json_code=json_code,
+                           setup=_memo_statements(memos),
+                           clauses=_binding_clauses(bindings),
+                           statements=_binding_statements(bindings))
+
+    # finally create and return function
+    return _make_function('dump_field_json', code, namespace)
+
+
+@_cached
+def _dump_fields_json_func(fields, many):
+    '''Return a customized function that dumps multiple fields as JSON.
+
+    Args:
+        fields: An ordered mapping of field names to fields.
+
+        many: If True(ish), the resulting function will expect collections of
+            objects, otherwise it will expect a single object.
+
+    Returns:
+        A custom function that expects an object (or a collection of objects
+        depending on ``many``), and returns a string containing the JSON
+        representation of multiple fields' values per object (as a JSON object
+        or as an array of JSON objects).
+
+    The resulting function writes JSON text directly without creating
+    intermediate dicts: JSON object keys are pre-escaped into a constant
+    string template, which gets filled with the JSON representations of the
+    fields' values.
+
+    '''
+    # bind values of access paths shared by multiple fields
+    shared, bindings, namespace = _shared_cns(fields, '', 'obj')
+
+    # one template entry and one value code fragment per field
+    entries = []
+    json_codes = []
+    memos = []
+
+    # iterate over fields to fill up entries
+    for field_num, (field_name, field) in enumerate(fields.items()):
+        json_code, json_ns = _field_json_cns(field, field_name, field_num,
+                                             bindings, shared, memos)
+        namespace.update(json_ns)
+        key = json.dumps(field_name).replace('%', '%%')
+        entries.append('{}: %s'.format(key))
+        json_codes.append(json_code)
+
+    # assemble row code (JSON object template filled with field values)
+    if json_codes:
+        row_tpl = '{' + ', '.join(entries) + '}'
+        row = '{!r} % ({},)'.format(row_tpl, ', '.join(json_codes))
+    else:
+        row = repr('{}')
+
+    if many:
+        func_tpl = (
+            'def dump_fields_json(objs):\n'
+            '{setup}'
+            '    return "[" + ", ".join(\n'
+            '        [{row} for obj in objs{clauses}]\n'
+            '    ) + "]"'
+        )
+    else:
+        func_tpl = (
+            'def dump_fields_json(obj):\n'
+            '{setup}'
+            '{statements}'
+            '    return {row}'
+        )
+
+    # assemble function code
+    code = func_tpl.format(row=row, setup=_memo_statements(memos),
+                           clauses=_binding_clauses(bindings),
+                           statements=_binding_statements(bindings))
+
+    # finally create and return function
+    return _make_function('dump_fields_json', code, namespace)
+
+
+def _each_func(dump_one, many, lazy=False, json=False):
+    '''Return a dump function calling dump_one per object.
+
+    Args:
+        dump_one: A function dumping a single object.
+
+        many: If False(ish), ``dump_one`` itself is returned. Otherwise, the
+            resulting function expects a collection of objects and returns a
+            list of results.
+
+        lazy: If True(ish), the resulting function returns a generator
+            instead of a list.
+
+        json: If True(ish), the resulting function returns a JSON array of
+            the results (which have to be JSON documents).
+
+    Used for dump functions that can't be generated as a whole (like those
+    of schemas with a result cache).
+
+    '''
+    if not many:
+        return dump_one
+
+    if lazy:
+        def dump_fields(objs):
+            return (dump_one(obj) for obj in objs)
+    elif json:
+        def dump_fields(objs):
+            return '[' + ', '.join([dump_one(obj) for obj in objs]) + ']'
+    else:
+        def dump_fields(objs):
+            return [dump_one(obj) for obj in objs]
+
+    return dump_fields
+
+
+def _schema_name(schema):
+    '''Return the fully module-qualified class name of a schema object.'''
+    cls = type(schema)
+    return '{}.{}'.format(cls.__module__, cls.__qualname__)
+
+
+def _timed(report, label, func, *args):
+    '''Call func, appending a (label, seconds)-tuple to report.'''
+    start = time.perf_counter()
+    func(*args)
+    report.append((label, time.perf_counter() - start))
+
+
+def _warmup(schema_classes, json):
+    '''Precompile schema classes and return a report (see warmup).'''
+    start = time.perf_counter()
+    if schema_classes is None:
+        schema_classes = list(registry.global_registry)
+
+    report = {'compiled': [], 'errors': []}
+    seen = {}
+    for cls in schema_classes:
+        for many in (False, True):
+            try:
+                cls(many=many)._precompile(report['compiled'], seen, json)
+            except Exception as e:
+                name = '{}.{}'.format(cls.__module__, cls.__qualname__)
+                report['errors'].append((name, e))
+
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def warmup(schema_classes=None, *, json=False, background=False):
+    '''Precompile the dump functions of schema classes up front.
+
+    Args:
+        schema_classes: An optional iterable of schema classes to precompile.
+            Defaults to all schema classes in the global class registry (see
+            :mod:`lima.registry`), that is, to all Schema classes defined so
+            far (outside of local namespaces).
+
+        json: If True(ish), the functions used by :meth:`Schema.dump_json`
+            are precompiled as well.
+
+        background: If True(ish), precompilation happens in a background
+            thread.
+
+    Returns:
+        A report in the form of a dict containing: A list of
+        ``(what, seconds)``-tuples describing the individual steps taken
+        (``'compiled'``), a list of ``(schema class name, exception)``-tuples
+        for schema classes that could not be precompiled (``'errors'``) and
+        the total number of seconds it took (``'seconds'``).
+
+        If ``background`` is True(ish), a :class:`concurrent.futures.Future`
+        is returned instead, which will eventually contain the report.
+
+    Dump functions are created lazily and linked schemas are resolved lazily.
+    Usually this happens when objects are marshalled for the first time, so
+    the first call to :meth:`Schema.dump` might take some extra time. Calling
+    this function at startup moves this work out of the way. For every schema
+    class, schema objects are created (``many=False`` and ``many=True``) and
+    precompiled via :meth:`Schema.precompile`. Schema objects created later
+    on share the resulting functions (see :data:`function_cache`).
+
+    .. versionadded:: 0.6
+
+    '''
+    if schema_classes is not None:
+        schema_classes = list(schema_classes)
+
+    if not background:
+        return _warmup(schema_classes, json)
+
+    future = futures.Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(_warmup(schema_classes, json))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='lima-warmup', daemon=True).start()
+    return future
+
+
+def _dump_chunk(schema, objs):
+    '''Return a list of marshalled representations of objs.
+
+    Used by :meth:`Schema.dump_parallel` (this needs to be a module-level
+    function so it can be sent to worker processes).
+
+    '''
+    return list(schema._dump_fields_iter(objs))
+
+
+def _profile_node():
+    '''Return a new node of a profile tree (see Schema.profile_report).'''
+    return {'calls': 0, 'get_seconds': 0.0, 'pack_seconds': 0.0,
+            'fields': OrderedDict()}
+
+
+def _profile_snapshot(nodes):
+    '''Return a deep copy of a mapping of field names to profile nodes.'''
+    return OrderedDict(
+        (field_name, dict(node, fields=_profile_snapshot(node['fields'])))
+        for field_name, node in nodes.items()
+    )
+
+
+def _profile_nodes(nodes):
+    '''Yield all profile nodes of a profile tree (depth-first).'''
+    for node in nodes.values():
+        yield node
+        yield from _profile_nodes(node['fields'])
+
+
+def _profiled_field_func(schema, field_name, node, seen, dicts=False):
+    '''Return a function dumping a field of a single object, timing it.
+
+    Args:
+        schema: The schema object the field belongs to.
+
+        field_name: The name of the field.
+
+        node: The profile node to record calls and timings in (see
+            :func:`_profile_node`).
+
+        seen: A tuple of IDs of the schema objects already profiled on the
+            way to this field (used to stop recursion for schemas linking to
+            themselves).
+
+        dicts: If True(ish), linked objects are dumped to dicts (regardless
+            of the output of their schemas), ready to be encoded as JSON.
+
+    The pack step of fields linking to objects of other schemas is profiled
+    recursively (recording its calls and timings in ``node['fields']``).
+
+    '''
+    field = schema._fields[field_name]
+    with util.exception_context('Lazy creation of get field function'):
+        get = _get_field_func(field, field_name)
+    pack = getattr(field, 'pack', None)
+
+    nested = None
+    if _defining_class(field, 'pack') in (lima_fields.Embed,
+                                          lima_fields.Reference):
+        nested = field._schema_inst
+        if not isinstance(nested, Schema) or id(nested) in seen:
+            nested = None
+
+    if nested is not None:
+        nested_seen = seen + (id(nested),)
+        if isinstance(field, lima_fields.Embed):
+            func = _profiled_dump_fields_func(nested, node['fields'],
+                                              nested_seen, dicts=dicts)
+        else:
+            nested_node = node['fields'].setdefault(field._field,
+                                                    _profile_node())
+            nested_func = _profiled_field_func(nested, field._field,
+                                               nested_node, nested_seen,
+                                               dicts)
+            if nested._many:
+                def func(objs):
+                    return [nested_func(o) for o in objs]
+            else:
+                func = nested_func
+
+        def pack(val):
+            return func(val) if val is not None else None
+
+    def dump_field(obj):
+        start = time.perf_counter()
+        val = get(obj)
+        got = time.perf_counter()
+        if pack is not None:
+            val = pack(val)
+        node['calls'] += 1
+        node['get_seconds'] += got - start
+        node['pack_seconds'] += time.perf_counter() - got
+        return val
+
+    return dump_field
+
+
+def _profiled_dump_fields_func(schema, nodes, seen, many=None, lazy=False,
+                               as_json=False, dicts=False):
+    '''Return a dump fields function timing all fields of schema.
+
+    Args:
+        schema: The schema object.
+
+        nodes: A mapping of field names to profile nodes. Missing nodes are
+            added.
+
+        seen: See :func:`_profiled_field_func`.
+
+        many: If True(ish), the resulting function will expect collections of
+            objects. Defaults to the schema's :attr:`~Schema.many` property.
+
+        lazy: See :func:`_each_func`.
+
+        as_json: If True(ish), the resulting function returns JSON documents
+            (like :meth:`Schema.dump_json`).
+
+        dicts: If True(ish), objects are dumped to dicts regardless of the
+            schema's output (as well as linked objects).
+
+    '''
+    if many is None:
+        many = schema._many
+    dicts = dicts or as_json
+
+    funcs = [
+        (field_name,
+         _profiled_field_func(schema, field_name,
+                              nodes.setdefault(field_name, _profile_node()),
+                              seen, dicts))
+        for field_name in schema._fields
+    ]
+    if dicts or schema._output == 'dict':
+        row_type = OrderedDict if schema._ordered and not dicts else dict
+
+        def dump_one(obj):
+            return row_type([(field_name, func(obj))
+                             for field_name, func in funcs])
+    else:
+        funcs = [func for field_name, func in funcs]
+        if schema._output == 'tuple':
+            row_type = tuple
+        else:
+            row_type = _row_type(schema._output, schema.header)._make
+
+        def dump_one(obj):
+            return row_type([func(obj) for func in funcs])
+
+    if as_json:
+        dump_row = dump_one
+
+        def dump_one(obj):
+            return json.dumps(dump_row(obj))
+
+    return _each_func(dump_one, many, lazy, as_json)
+
+
+def _is_binary_stream(stream):
+    '''Return True if stream (probably) expects bytes instead of strings.
+
+    Instances of :class:`io.TextIOBase` and :class:`codecs.StreamWriter`, as
+    well as objects with a ``mode`` lacking ``'b'`` or with an ``encoding``
+    (like most replacements of :data:`sys.stdout`) are text streams. Instances
+    of :class:`io.BufferedIOBase` and :class:`io.RawIOBase`, objects with a
+    ``mode`` containing ``'b'`` and everything else (like pipes or
+    :meth:`socket.socket.makefile` objects) are binary streams.
+
+    '''
+    if isinstance(stream, (io.TextIOBase, codecs.StreamWriter)):
+        return False
+    if isinstance(stream, (io.BufferedIOBase, io.RawIOBase)):
+        return True
+    mode = getattr(stream, 'mode', None)
+    if isinstance(mode, str):
+        return 'b' in mode
+    return getattr(stream, 'encoding', None) is None
+
+
+# Schema Metaclass ############################################################
+
+class SchemaMeta(type):
+    '''Metaclass of Schema.
+
+    .. note::
+       The metaclass :class:`SchemaMeta` is used internally to simplify the
+       configuration of new :class:`Schema` classes. For users of the library
+       there should be no need to use :class:`SchemaMeta` directly.
+
+    When defining a new :class:`Schema` (sub)class, :class:`SchemaMeta` makes
+    sure that the new class has a class attribute :attr:`__fields__` of type
+    :class:`collections.OrderedDict` containing the fields for the new
+    Schema.
+
+    :attr:`__fields__` is determined like this:
+
+    - The :attr:`__fields__` of all base classes are copied (with base classes
+      specified first having precedence).
+
+      Note that the fields themselves are *not* copied - changing an inherited
+      field would change this field for all base classes referencing this field
+      as well. In general it is *strongly* suggested to treat fields as
+      immutable.
+
+    - Fields (Class variables of type :class:`lima.abc.FieldABC`) are moved out
+      of the class namespace and into :attr:`__fields__`, overriding any fields
+      of the same name therein.
+
+    - If present, the class attribute :attr:`__lima_args__` is removed from the
+      class namespace and evaluated as follows:
+
+      - Fields specified via ``__lima_args__['include']`` (an optional mapping
+        of field names to fields) are inserted into :attr:`__fields__`.
+        overriding any fields of the same name therein.
+
+        If the order of your fields is important, make sure that
+        ``__lima_args__['include']`` is of type
+        :class:`collections.OrderedDict` or similar.
+
+        New fields in ``__lima_args__['include']__`` are inserted at the
+        position where ``__lima_args__`` is specified in the class.
+
+      - Fields named in an optional sequence ``__lima_args__['exclude']`` are
+        removed from :attr:`__fields__`. If only one field is to be removed,
+        it's ok to supply a simple string instead of a list containing only one
+        string. ``__lima_args__['exclude']`` may not be specified together with
+        ``__lima_args__['only']``.
+
+      - If in an optional sequence ``__lima_args__['only']`` is provided, *all
+        but* the fields mentioned therein are removed from :attr:`__fields__`.
+        If only one field is to remain, it's ok to supply a simple string
+        instead of a list containing only one string. ``__lima_args__['only']``
+        may not be specified together with ``__lima_args__['exclude']``.
+
+        Think twice before using ``__lima_args__['only']`` - most of the time
+        it's better to rethink your Schema than to remove a lot of fields that
+        maybe shouldn't be there in the first place.
+
+    .. versionadded:: 0.3
+        Support for ``__lima_args__['only']``.
+
+    :class:`SchemaMeta` also makes sure the new Schema class is registered with
+    the lima class registry :mod:`lima.registry` (at least if the Schema isn't
+    defined inside a local namespace, where we wouldn't find it later on).
+
+    '''
+    def __new__(metacls, name, bases, namespace):
+
+        # aggregate fields from base classes
+        fields = _fields_from_bases(bases)
+
+        # get and verify __lima_args__ (if present)
+        include = exclude = only = None
+        if '__lima_args__' in namespace:
+            args = namespace['__lima_args__']
+            with util.exception_context('__lima_args__'):
+                util.ensure_mapping(args)
+                util.ensure_subset_of(args, {'include', 'exclude', 'only'})
+                util.ensure_only_one_of(args, {'exclude', 'only'})
+
+            # determine individual args (include, exclude, only)
+            include = args.get('include')
+            exclude = util.vector_context(args.get('exclude', []))
+            only = util.vector_context(args.get('only', []))
+
+        # names of fields in namespace (and maybe __lima_args__) in order
+        names = [k for k, v in namespace.items()
+                 if isinstance(v, abc.FieldABC) or k == '__lima_args__']
+
+        # loop over names (we mutate namespace in this loop)
+        for k in names:
+            if k == '__lima_args__':
+                # at position of __lima_args__: insert include (if specified)
+                if include:
+                    with util.exception_context("__lima_args__['include']"):
+                        fields = _fields_include(fields, include)
+            else:
+                # if a field was found: move it from namespace into fields
+                # (also, mangle its name to allow some special field names)
+                fields[_mangle_name(k)] = namespace.pop(k)
 
         if exclude:
             with util.exception_context('__lima_args__["exclude"]'):
@@ -384,8 +2069,10 @@ class SchemaMeta(type):
 
         # Try to register the new class. Classes defined in local namespaces
         # cannot be registerd. We're ok with this.
-        with util.suppress(exc.RegisterLocalClassError):
+        try:
             registry.global_registry.register(cls)
+        except exc.RegisterLocalClassError:
+            pass
 
         # return class
         return cls
@@ -403,6 +2090,15 @@ class SchemaMeta(type):
 
 # Schema ######################################################################
 
+variant_cache = util.LRUCache(maxsize=256)
+'''A process-wide cache of schema objects created by :meth:`Schema.variant`.
+
+Keyed by schema class and (normalized) constructor arguments. To change the
+maximum number of cached schema objects, set ``variant_cache.maxsize``.
+
+'''
+
+
 class Schema(abc.SchemaABC, metaclass=SchemaMeta):
     '''Base class for Schemas.
 
@@ -429,10 +2125,56 @@ class Schema(abc.SchemaABC, metaclass=SchemaMeta):
             instead of simple :class:`dict` objects. Defaults to ``False``.
             This does not influence how nested fields are serialized.
 
+        output: An optional string determining the type of the marshalled
+            representation of each object returned by :meth:`dump`:
+            ``'dict'`` (the default), ``'tuple'`` (the fields' values in the
+            order of the schema's :attr:`header`), ``'namedtuple'`` or
+            ``'record'`` (a compact :class:`Record` with one slot per
+            field). Rows other than dicts don't repeat the field names for
+            every object, which saves lots of memory for large collections.
+            Use :meth:`as_dict` to convert them. :meth:`dump_json` is not
+            affected. ``ordered`` can only be specified for dicts.
+
         many: An optional boolean indicating if the new Schema will be
             serializing single objects (``many=False``) or collections of
-            objects (``many=True``) per default. This can later be overridden
-            in the :meth:`dump` Method.
+            objects (``many=True``) per default. Regardless of this,
+            :meth:`dump_one` and :meth:`dump_many` marshal single objects
+            and collections respectively.
+
+        profile: An optional boolean indicating if dumps should record the
+            number of calls and the time spent getting and packing values per
+            field (see :meth:`profile_report`). This is done by :meth:`dump`,
+            :meth:`dump_one`, :meth:`dump_many`, :meth:`dump_iter`,
+            :meth:`dump_chunks`, :meth:`dump_json` and :meth:`dump_to`.
+            Profiling schema objects dump sequentially (ignoring the
+            ``executor`` of :meth:`dump`) and can't :meth:`dump_parallel`.
+            :meth:`dump_columns` and fields requiring awaiting in
+            :meth:`dump_async` are not profiled.
+            This makes dumps a lot slower, so only use it to find out where
+            time is spent. Defaults to ``False``.
+
+        metrics: An optional :class:`lima.metrics.MetricsRegistry` to record
+            the number of dumps, the number of objects dumped and (sampled)
+            latencies of :meth:`dump` (with or without ``executor``),
+            :meth:`dump_json` and :meth:`dump_async` in - including dumps of
+            linked objects via :class:`lima.fields.Embed` and
+            :class:`lima.fields.Reference` fields. ``True`` means the default
+            registry :data:`lima.metrics.registry`. Defaults to ``False``
+            (nothing gets recorded, and there is no overhead at all).
+            Streaming dumps (:meth:`dump_iter`, :meth:`dump_chunks` and
+            :meth:`dump_to`) and :meth:`dump_columns` record no dumps of the
+            schema itself, and neither does :meth:`dump_parallel` (metrics
+            would be recorded in the worker processes and lost).
+
+        cache: An optional :class:`lima.cache.ResultCache` to look up the
+            marshalled representations of objects in before marshalling
+            them (and to store them in afterwards). Applies to :meth:`dump`
+            (with an ``executor``, only the blocking fields of objects not
+            found in the cache are determined concurrently),
+            :meth:`dump_iter`, :meth:`dump_json` and :meth:`dump_async`, as
+            well as to objects linked via :class:`lima.fields.Embed` fields
+            using this schema. Schema objects with a cache can't
+            :meth:`dump_parallel`. Defaults to ``None`` (no caching).
 
     .. versionadded:: 0.3
         The ``include`` parameter.
@@ -440,6 +2182,18 @@ class Schema(abc.SchemaABC, metaclass=SchemaMeta):
     .. versionadded:: 0.3
         The ``ordered`` parameter.
 
+    .. versionadded:: 0.6
+        The ``profile`` parameter.
+
+    .. versionadded:: 0.6
+        The ``metrics`` parameter.
+
+    .. versionadded:: 0.6
+        The ``output`` parameter.
+
+    .. versionadded:: 0.6
+        The ``cache`` parameter.
+
     Upon creation, each Schema object gets an internal mapping of field names
     to fields. This mapping starts out as a copy of the class's
     :attr:`__fields__` attribute.  (For an explanation on how this
@@ -467,6 +2221,8 @@ class Schema(abc.SchemaABC, metaclass=SchemaMeta):
     Also upon creation, each Schema object gets an individually created dump
     function that aims to unroll most of the loops and to minimize the number
     of attribute lookups, resulting in a little speed gain on serialization.
+    (Schema objects with equivalent configurations share their dump functions
+    via :data:`function_cache`.)
 
     :class:`Schema` classes defined outside of local namespaces can be
     referenced by name (used by :class:`lima.fields.Nested`).
@@ -478,12 +2234,29 @@ class Schema(abc.SchemaABC, metaclass=SchemaMeta):
                  only=None,
                  include=None,
                  ordered=False,
-                 many=False):
+                 many=False,
+                 profile=False,
+                 metrics=False,
+                 output='dict',
+                 cache=None):
         fields = self.__class__.__fields__.copy()
         if exclude and only:
             msg = "Can't specify exclude and only at the same time."
             raise ValueError(msg)
 
+        if output not in OUTPUTS:
+            msg = 'output must be one of {}: {!r}'
+            raise ValueError(msg.format(', '.join(OUTPUTS), output))
+
+        if ordered and output != 'dict':
+            msg = "Can't specify ordered for output other than 'dict'."
+            raise ValueError(msg)
+
+        if cache is not None and not isinstance(cache,
+                                                lima_cache.ResultCache):
+            msg = 'cache must be a ResultCache: {!r}'
+            raise TypeError(msg.format(cache))
+
         if include:
             with util.exception_context('include'):
                 fields = _fields_include(fields, include)
@@ -498,8 +2271,110 @@ class Schema(abc.SchemaABC, metaclass=SchemaMeta):
         # add instance vars to self
         self._fields = fields
         self._dump_field_func_cache = {}  # dict of funcs dumping single fields
+        self._dump_field_json_func_cache = {}  # same, but dumping to JSON
         self._ordered = ordered
         self._many = many
+        self._output = output
+        self._profile = OrderedDict() if profile else None  # profile tree
+        if metrics is True:
+            metrics = lima_metrics.registry
+        elif not metrics:
+            metrics = None
+        elif not isinstance(metrics, lima_metrics.MetricsRegistry):
+            msg = 'metrics must be a bool or a MetricsRegistry: {!r}'
+            raise TypeError(msg.format(metrics))
+        self._metrics = metrics  # registry to record metrics in (or None)
+        self._cache = cache  # cache of marshalled objects (or None)
+
+    def __getstate__(self):
+        '''Return picklable state (without instance-specific functions).
+
+        Instance-specific dump functions can't be pickled. They get recreated
+        lazily from the schema's fields after unpickling.
+
+        '''
+        state = util.unreified_state(self)
+        state['_dump_field_func_cache'] = {}
+        state['_dump_field_json_func_cache'] = {}
+        return state
+
+    def precompile(self, *, json=False):
+        '''Create dump functions and resolve linked schemas up front.
+
+        Args:
+            json: If True(ish), the functions used by :meth:`dump_json` are
+                created as well.
+
+        Returns:
+            A list of ``(what, seconds)``-tuples describing the individual
+            steps taken (steps that had been taken before are skipped).
+
+        Usually, dump functions are created and the schemas of linked objects
+        are resolved lazily, when needed for the first time. This method does
+        all of this at once (for this schema object and - recursively - for
+        all schemas linked by its fields). See also :func:`warmup`.
+
+        .. versionadded:: 0.6
+
+        '''
+        report = []
+        self._precompile(report, {}, json)
+        return report
+
+    def _precompile(self, report, seen, json):
+        '''Precompile self and linked schemas (see precompile).
+
+        Args:
+            report: A list to append ``(what, seconds)``-tuples to.
+
+            seen: A dict mapping IDs of schema objects already visited to
+                those objects (referencing the objects keeps their IDs
+                unique).
+
+            json: See :meth:`precompile`.
+
+        '''
+        if id(self) in seen:
+            return
+        seen[id(self)] = self
+
+        name = _schema_name(self)
+        attrs = ['_dump_fields']
+        pack_attrs = ['_pack_func']
+        if json:
+            attrs.append('_dump_fields_json')
+            pack_attrs.append('_pack_json_func')
+
+        for attr in attrs:
+            if attr not in self.__dict__:
+                _timed(report, '{}.{}'.format(name, attr), getattr, self, attr)
+
+        for field_name, field in self._fields.items():
+            if not isinstance(field, lima_fields._LinkedObjectField):
+                continue
+            label = '{}.{}'.format(name, field_name)
+
+            if '_schema_inst' not in field.__dict__:
+                _timed(report, label + '._schema_inst',
+                       getattr, field, '_schema_inst')
+            nested = field._schema_inst
+
+            if isinstance(field, lima_fields.Reference):
+                nested_label = '{}.{}'.format(_schema_name(nested),
+                                              field._field)
+                if '_pack_func' not in field.__dict__:
+                    _timed(report, nested_label + ' (field function)',
+                           nested._dump_field_func, field._field)
+                if json and '_pack_json_func' not in field.__dict__:
+                    _timed(report, nested_label + ' (JSON field function)',
+                           nested._dump_field_json_func, field._field)
+            elif isinstance(nested, Schema):
+                nested._precompile(report, seen, json)
+
+            for attr in pack_attrs:
+                if hasattr(type(field), attr) and attr not in field.__dict__:
+                    _timed(report, '{}.{}'.format(label, attr),
+                           getattr, field, attr)
 
     @property
     def many(self):
@@ -511,35 +2386,549 @@ class Schema(abc.SchemaABC, metaclass=SchemaMeta):
         '''Read-only property: does the dump method return ordered dicts?'''
         return self._ordered
 
+    @property
+    def output(self):
+        '''Read-only property: the type of rows the dump method returns.'''
+        return self._output
+
+    @property
+    def header(self):
+        '''Read-only property: a tuple of the schema's field names.
+
+        The values of tuples, namedtuples and records returned by
+        :meth:`dump` appear in this order.
+
+        '''
+        return tuple(self._fields)
+
+    def as_dict(self, row):
+        '''Return a row returned by :meth:`dump` as a dict.
+
+        Args:
+            row: The marshalled representation of a single object (a dict,
+                tuple, namedtuple or :class:`Record`, depending on the
+                schema's :attr:`output`).
+
+        Returns:
+            A dict mapping the schema's field names to the row's values (or
+            ``row`` itself if it already is a dict).
+
+        .. versionadded:: 0.6
+
+        '''
+        if self._output == 'dict':
+            return row
+        return dict(zip(self._fields, row))
+
+    @classmethod
+    def variant(cls, **kwargs):
+        '''Return a shared schema object for the arguments specified.
+
+        Args:
+            kwargs: Keyword arguments for the constructor (see
+                :class:`Schema`).
+
+        Returns:
+            A schema object created by calling ``cls(**kwargs)`` - or the
+            very same object returned by an earlier call with equal
+            arguments (see :data:`variant_cache`).
+
+        Use this instead of creating equal schema objects in different
+        places: Shared schema objects create their dump functions only
+        once. Linked schemas specified by class or name (see
+        :class:`lima.fields.Embed`) are shared this way as well.
+
+        Arguments equal to their default values are ignored. Sequences of
+        field names are compared in order, and arguments that are not
+        hashable (even after converting lists and mappings to tuples) always
+        result in a new schema object.
+
+        .. versionadded:: 0.6
+
+        '''
+        defaults = cls.__dict__.get('_variant_defaults')
+        if defaults is None:
+            defaults = {
+                name: param.default
+                for name, param in inspect.signature(cls).parameters.items()
+                if param.default is not param.empty
+            }
+            cls._variant_defaults = defaults  # per class (not inherited)
+
+        # leave out arguments equal to their defaults
+        key = (cls, tuple(sorted(
+            (name, _frozen(value)) for name, value in kwargs.items()
+            if not (name in defaults and
+                    type(value) is type(defaults[name]) and
+                    value == defaults[name])
+        )))
+        try:
+            schema = variant_cache.get(key)
+        except TypeError:
+            return cls(**kwargs)  # unhashable arguments
+        if schema is None:
+            schema = cls(**kwargs)
+            variant_cache.set(key, schema)
+        return schema
+
+    def _metered(self, func, many=None, size=False):
+        '''Return func recording metrics (or func itself without metrics).
+
+        See :meth:`lima.metrics.MetricsRegistry.wrap` for the arguments. If
+        ``many`` is not specified, the schema's :attr:`many` property is used.
+
+        '''
+        if self._metrics is None:
+            return func
+        if many is None:
+            many = self._many
+        return self._metrics.wrap(_schema_name(self), func, many, size)
+
+    def _cache_fingerprint(self, json):
+        '''Return the fingerprint of the schema for the result cache.
+
+        Fields (including those of linked schemas) are compared by identity,
+        so schema objects with the same field names but other fields (like
+        fields overridden via ``include``) don't share cached results.
+        Variants for equal nested field selections share their fields (see
+        :func:`_selected_field`) and thereby their results.
+
+        '''
+        return (_schema_name(self), _deep_fingerprint(self),
+                'json' if json else self._output, self._ordered)
+
+    @util.reify
+    def _dump_one_cached(self):
+        '''Return single object dump function using the cache (reified).'''
+        with util.exception_context('Lazy creation of dump fields function'):
+            func = _dump_fields_func(self._fields, self._ordered, many=False,
+                                     inline=inline_depth, output=self._output)
+        return self._cache.wrap(self._cache_fingerprint(json=False), func)
+
+    @util.reify
+    def _dump_json_one_cached(self):
+        '''Return single object JSON dump function using the cache.'''
+        with util.exception_context('Lazy creation of dump fields function'):
+            func = _dump_fields_json_func(self._fields, many=False)
+        return self._cache.wrap(self._cache_fingerprint(json=True), func)
+
+    def _profiled(self, many, lazy=False, as_json=False):
+        '''Return a dump function recording the schema's profile.
+
+        See :func:`_profiled_dump_fields_func` for the arguments.
+
+        '''
+        with util.exception_context('Lazy creation of dump fields function'):
+            return _profiled_dump_fields_func(self, self._profile,
+                                              (id(self),), many, lazy,
+                                              as_json)
+
+    def _dump_fields_for(self, many):
+        '''Return a new instance-specific dump function for all fields.'''
+        if self._profile is not None:
+            return self._metered(self._profiled(many), many)
+        with util.exception_context('Lazy creation of dump fields function'):
+            if self._cache is not None:
+                func = _each_func(self._dump_one_cached, many)
+            else:
+                func = _dump_fields_func(self._fields, self._ordered, many,
+                                         inline=inline_depth,
+                                         output=self._output)
+        return self._metered(func, many)
+
     @util.reify
     def _dump_fields(self):
         '''Return instance-specific dump function for all fields (reified).'''
+        return self._dump_fields_for(self._many)
+
+    @util.reify
+    def _dump_fields_one(self):
+        '''Return instance-specific dump function for single objects.'''
+        if not self._many:
+            return self._dump_fields
+        return self._dump_fields_for(many=False)
+
+    @util.reify
+    def _dump_fields_many(self):
+        '''Return instance-specific dump function for collections.'''
+        if self._many:
+            return self._dump_fields
+        return self._dump_fields_for(many=True)
+
+    def profile_report(self, *, reset=False):
+        '''Return the profile recorded by dumps (see ``profile``).
+
+        Args:
+            reset: If True(ish), the recorded profile is cleared afterwards.
+
+        Returns:
+            An ordered mapping of field names to dicts containing the number
+            of ``calls`` of a field (one per object dumped), the cumulative
+            time (in seconds) spent getting the field's values
+            (``get_seconds``) and packing them (``pack_seconds``), as well
+            as a mapping of the same structure for the ``fields`` of the
+            schema of linked objects (empty for other fields). The time spent
+            packing linked objects includes the time spent on the fields of
+            their schema.
+
+        Raises:
+            ValueError: If the schema object was not created with
+                ``profile=True``.
+
+        Example: ::
+
+            schema = BookSchema(profile=True)
+            schema.dump(book)
+            schema.profile_report()
+            # {'title': {'calls': 1, 'get_seconds': 1e-06,
+            #            'pack_seconds': 0.0, 'fields': {}},
+            #  'author': {'calls': 1, 'get_seconds': 1e-06,
+            #             'pack_seconds': 2e-05, 'fields': {...}}}
+
+        .. versionadded:: 0.6
+
+        '''
+        if self._profile is None:
+            raise ValueError('Schema object was not created with profile=True')
+        report = _profile_snapshot(self._profile)
+        if reset:
+            for node in _profile_nodes(self._profile):
+                node.update(_profile_node(), fields=node['fields'])
+        return report
+
+    @util.reify
+    def _blocking_field_names(self):
+        '''Return a tuple of the names of blocking fields (reified).'''
+        return tuple(field_name for field_name, field in self._fields.items()
+                     if getattr(field, 'blocking', False))
+
+    @util.reify
+    def _dump_fields_prefetched(self):
+        '''Return dump function expecting values of blocking fields.'''
+        with util.exception_context('Lazy creation of dump fields function'):
+            return _dump_fields_func(self._fields, self._ordered, self._many,
+                                     prefetched=self._blocking_field_names,
+                                     inline=inline_depth,
+                                     output=self._output)
+
+    @util.reify
+    def _dump_fields_prefetched_one(self):
+        '''Return single object dump function expecting blocking values.'''
+        if not self._many:
+            return self._dump_fields_prefetched
+        with util.exception_context('Lazy creation of dump fields function'):
+            return _dump_fields_func(self._fields, self._ordered, many=False,
+                                     prefetched=self._blocking_field_names,
+                                     inline=inline_depth,
+                                     output=self._output)
+
+    @util.reify
+    def _dump_fields_executor(self):
+        '''Return dump function expecting an executor as well (reified).'''
+        if self._cache is None:
+            return self._metered(self._dump_with_executor)
+
+        # look up objects one by one (determining blocking values of misses)
+        dump_one = self._cache.wrap(self._cache_fingerprint(json=False),
+                                    self._dump_one_with_executor)
+        if not self._many:
+            return self._metered(dump_one)
+
+        def dump_fields(objs, executor):
+            return [dump_one(obj, executor) for obj in objs]
+
+        return self._metered(dump_fields)
+
+    def _dump_one_with_executor(self, obj, executor):
+        '''Dump a single object, determining blocking values via executor.'''
+        pending = [executor.submit(self._dump_field_func(field_name,
+                                                         many=False), obj)
+                   for field_name in self._blocking_field_names]
+        values = [future.result() for future in pending]
+        return self._dump_fields_prefetched_one(obj, *values)
+
+    def _dump_with_executor(self, obj, executor):
+        '''Dump obj, determining blocking fields' values via executor.'''
+        if not self._many:
+            return self._dump_one_with_executor(obj, executor)
+
+        funcs = [self._dump_field_func(field_name, many=False)
+                 for field_name in self._blocking_field_names]
+
+        # we'll iterate over objs more than once
+        objs = obj
+        if not isinstance(objs, collections_abc.Sequence):
+            objs = list(objs)
+        pending = [[executor.submit(func, o) for o in objs]
+                   for func in funcs]
+        values = [[future.result() for future in column]
+                  for column in pending]
+        return self._dump_fields_prefetched(objs, *values)
+
+    @util.reify
+    def _async_field_names(self):
+        '''Return a tuple of the names of fields requiring awaiting.'''
+        with util.exception_context('Lazy detection of async fields'):
+            return tuple(field_name
+                         for field_name, field in self._fields.items()
+                         if _is_async_field(field))
+
+    @util.reify
+    def _dump_fields_async(self):
+        '''Return single object dump function expecting async fields.'''
+        with util.exception_context('Lazy creation of dump fields function'):
+            return _dump_fields_func(self._fields, self._ordered, many=False,
+                                     prefetched=self._async_field_names,
+                                     inline=inline_depth,
+                                     output=self._output)
+
+    def _resolve_func(self, field_name):
+        '''Return coroutine function determining a field's packed value.'''
+        field = self._fields[field_name]
+        with util.exception_context('Lazy creation of get field function'):
+            get = _get_field_func(field, field_name)
+        awaits = _has_coroutine_getter(field)
+
+        if not _has_async_target(field):
+            # only the getter (if anything) has to be awaited
+            pack = getattr(field, 'pack', None)
+
+            async def resolve(obj):
+                val = get(obj)
+                if awaits:
+                    val = await val
+                return pack(val) if pack is not None else val
+
+        elif isinstance(field, lima_fields.Embed):
+            nested = field._schema_inst
+
+            async def resolve(obj):
+                val = get(obj)
+                if awaits:
+                    val = await val
+                if val is None:
+                    return None
+                return await nested._dump_async(val)
+
+        else:
+            nested = field._schema_inst
+            nested_field_name = field._field
+
+            async def resolve(obj):
+                val = get(obj)
+                if awaits:
+                    val = await val
+                if val is None:
+                    return None
+                return await nested._dump_field_async(nested_field_name, val)
+
+        return resolve
+
+    @util.reify
+    def _resolve_funcs(self):
+        '''Return a list of resolve functions for async fields (reified).'''
+        return [self._resolve_func(field_name)
+                for field_name in self._async_field_names]
+
+    async def _dump_one_async(self, obj):
+        '''Return the marshalled representation of a single object.'''
+        values = await asyncio.gather(
+            *[resolve(obj) for resolve in self._resolve_funcs]
+        )
+        return self._dump_fields_async(obj, *values)
+
+    async def _dump_async(self, obj, limit=None):
+        '''Return the marshalled representation of obj (see dump_async).'''
+        if not self._async_field_names:
+            return self._dump_fields(obj)
+        return await self._dump_fields_awaiting(obj, limit)
+
+    @util.reify
+    def _dump_fields_awaiting(self):
+        '''Return coroutine function dumping obj with async fields.'''
+        return self._metered(self._dump_awaiting)
+
+    @util.reify
+    def _dump_one_async_cached(self):
+        '''Return single object coroutine function using the cache.'''
+        return self._cache.wrap(self._cache_fingerprint(json=False),
+                                self._dump_one_async)
+
+    async def _dump_awaiting(self, obj, limit=None):
+        '''Return the marshalled representation of obj with async fields.'''
+        if self._cache is not None:
+            dump_object = self._dump_one_async_cached
+        else:
+            dump_object = self._dump_one_async
+
+        if not self._many:
+            return await dump_object(obj)
+
+        if limit is None:
+            dump_one = dump_object
+        else:
+            semaphore = asyncio.Semaphore(limit)
+
+            async def dump_one(o):
+                async with semaphore:
+                    return await dump_object(o)
+
+        return list(await asyncio.gather(*[dump_one(o) for o in obj]))
+
+    async def _dump_field_async(self, field_name, obj):
+        '''Return a single field's value for obj (or for collection obj).'''
+        if field_name not in self._async_field_names:
+            return self._dump_field_func(field_name)(obj)
+
+        resolve = self._resolve_funcs[
+            self._async_field_names.index(field_name)
+        ]
+        if not self._many:
+            return await resolve(obj)
+        return list(await asyncio.gather(*[resolve(o) for o in obj]))
+
+    @util.reify
+    def _dump_fields_iter(self):
+        '''Return instance-specific lazy dump function for collections.'''
+        if self._profile is not None:
+            return self._profiled(many=True, lazy=True)
+        if self._cache is not None:
+            return _each_func(self._dump_one_cached, many=True, lazy=True)
         with util.exception_context('Lazy creation of dump fields function'):
-            return _dump_fields_func(self._fields, self._ordered, self._many)
+            return _dump_fields_func(self._fields, self._ordered,
+                                     many=True, lazy=True,
+                                     inline=inline_depth,
+                                     output=self._output)
 
-    def _dump_field_func(self, field_name):
+    def _dump_field_func(self, field_name, many=None):
         '''Return instance-specific dump function for a single field.
 
         Functions are created when requested for the first time and get cached
         for subsequent calls of this method.
 
+        If ``many`` is not specified, the schema's :attr:`many` property
+        determines whether the function expects collections.
+
+        '''
+        if many is None:
+            many = self._many
+
+        cache_key = (field_name, bool(many))
+        if cache_key in self._dump_field_func_cache:
+            return self._dump_field_func_cache[cache_key]
+
+        with util.exception_context('Lazy creation of dump field function'):
+            func = _dump_field_func(self._fields[field_name], field_name, many)
+            self._dump_field_func_cache[cache_key] = func
+            return func
+
+    @util.reify
+    def _dump_fields_json(self):
+        '''Return instance-specific JSON dump function (reified).'''
+        if self._profile is not None:
+            return self._metered(self._profiled(self._many, as_json=True),
+                                 size=True)
+        if self._cache is not None:
+            return self._metered(_each_func(self._dump_json_one_cached,
+                                            self._many, json=True),
+                                 size=True)
+        with util.exception_context('Lazy creation of dump fields function'):
+            return self._metered(
+                _dump_fields_json_func(self._fields, self._many), size=True
+            )
+
+    @util.reify
+    def _dump_fields_json_one(self):
+        '''Return instance-specific JSON dump function for single objects.'''
+        if not self._many and self._metrics is None:
+            return self._dump_fields_json  # (which is not metered then)
+        if self._profile is not None:
+            return self._profiled(many=False, as_json=True)
+        if self._cache is not None:
+            return self._dump_json_one_cached
+        with util.exception_context('Lazy creation of dump fields function'):
+            return _dump_fields_json_func(self._fields, many=False)
+
+    def _dump_field_json_func(self, field_name):
+        '''Return instance-specific JSON dump function for a single field.
+
+        Functions are created when requested for the first time and get cached
+        for subsequent calls of this method.
+
         '''
-        if field_name in self._dump_field_func_cache:
-            return self._dump_field_func_cache[field_name]
+        if field_name in self._dump_field_json_func_cache:
+            return self._dump_field_json_func_cache[field_name]
 
         with util.exception_context('Lazy creation of dump field function'):
-            func = _dump_field_func(self._fields[field_name],
-                                   field_name, self._many)
-            self._dump_field_func_cache[field_name] = func
+            func = _dump_field_json_func(self._fields[field_name],
+                                         field_name, self._many)
+            self._dump_field_json_func_cache[field_name] = func
             return func
 
-    def dump(self, obj):
+    def _derived(self, fields):
+        '''Return a copy of self with other fields (skipping __init__).'''
+        derived = object.__new__(type(self))
+        derived.__dict__.update(util.unreified_state(self))
+        derived._fields = fields
+        derived._dump_field_func_cache = {}
+        derived._dump_field_json_func_cache = {}
+        return derived
+
+    @util.reify
+    def _selections(self):
+        '''Return a cache of variants of self per field selection (reified).'''
+        return util.LRUCache(maxsize=selection_cache_size)
+
+    def _selection(self, key, exclude):
+        '''Return the variant of self for a selection key (see dump).'''
+        cache_key = (key, bool(exclude))
+        variant = self._selections.get(cache_key)
+        if variant is None:
+            context = 'exclude' if exclude else 'only'
+            with util.exception_context(context):
+                fields = _selected_fields(self._fields, key, exclude)
+            variant = self._derived(fields)
+            self._selections.set(cache_key, variant)
+        return variant
+
+    def _selected(self, only, exclude):
+        '''Return the variant of self for only or exclude (see dump).'''
+        if only and exclude:
+            msg = "Can't specify exclude and only at the same time."
+            raise ValueError(msg)
+        if only:
+            return self._selection(_selection_key(only), False)
+        return self._selection(_selection_key(exclude), True)
+
+    def dump(self, obj, *, executor=None, only=None, exclude=None):
         '''Return a marshalled representation of obj.
 
         Args:
             obj: The object (or collection of objects, depending on the
                 schema's :attr:`many` property) to marshall.
 
+            executor: An optional :class:`concurrent.futures.Executor` (like
+                a :class:`~concurrent.futures.ThreadPoolExecutor`). If
+                provided, the values of all of the schema's *blocking* fields
+                (see :class:`lima.fields.Field`) are determined concurrently
+                via this executor - for every object to marshall. The values
+                of all other fields are determined as usual. Nested schemas
+                do not use the executor.
+
+            only: An optional selection of the only fields to dump this
+                time: A field name, a sequence of field names or a mapping
+                of field names to nested selections for the schemas of
+                :class:`lima.fields.Embed` fields (``None`` meaning all of
+                the linked object's fields). Mappings can be part of
+                sequences as well: ``['title', {'author': ['name']}]``.
+                ``only`` may not be specified together with ``exclude``. As
+                on schema object creation, empty selections (like
+                ``only=[]`` or ``{'author': []}``) select all fields.
+
+            exclude: An optional selection of fields *not* to dump this time
+                (see ``only``). Nested selections exclude fields of linked
+                objects, but keep the linked objects themselves.
+
         Returns:
             A representation of ``obj`` in the form of a JSON-serializable dict
             (or :class:`collections.OrderedDict`, depending on the schema's
@@ -550,6 +2939,438 @@ class Schema(abc.SchemaABC, metaclass=SchemaMeta):
         .. versionchanged:: 0.4
             Removed the ``many`` parameter of this method.
 
+        .. versionadded:: 0.6
+            The ``executor`` parameter.
+
+        .. versionadded:: 0.6
+            The ``only`` and ``exclude`` parameters.
+
+        Selecting fields at dump time is cheap: A variant of the schema
+        object (with its own dump functions) is created once per distinct
+        selection and kept in a per-schema cache of bounded size (see
+        :data:`selection_cache_size`).
+
         '''
+        if only or exclude:
+            return self._selected(only, exclude).dump(obj, executor=executor)
+
+        if (executor is not None and self._profile is None and
+                self._blocking_field_names):
+            return self._dump_fields_executor(obj, executor)
+
         # call the instance-specific dump function
         return self._dump_fields(obj)
+
+    def dump_one(self, obj, *, only=None, exclude=None):
+        '''Return a marshalled representation of a single object.
+
+        Args:
+            obj: The object to marshall - regardless of the schema's
+                :attr:`many` property.
+
+            only: See :meth:`dump`.
+
+            exclude: See :meth:`dump`.
+
+        Returns:
+            A representation of ``obj`` (see :meth:`dump`).
+
+        This allows a single schema object to marshall both single objects
+        and collections (see :meth:`dump_many`). The dump function not
+        matching the schema's :attr:`many` property is only created when
+        needed for the first time.
+
+        .. versionadded:: 0.6
+
+        '''
+        if only or exclude:
+            return self._selected(only, exclude)._dump_fields_one(obj)
+        return self._dump_fields_one(obj)
+
+    def dump_many(self, objs, *, only=None, exclude=None):
+        '''Return a list of marshalled representations of objs.
+
+        Args:
+            objs: An iterable of objects to marshall - regardless of the
+                schema's :attr:`many` property.
+
+            only: See :meth:`dump`.
+
+            exclude: See :meth:`dump`.
+
+        Returns:
+            A list of representations of the objects in ``objs`` (see
+            :meth:`dump`).
+
+        See :meth:`dump_one`.
+
+        .. versionadded:: 0.6
+
+        '''
+        if only or exclude:
+            return self._selected(only, exclude)._dump_fields_many(objs)
+        return self._dump_fields_many(objs)
+
+    async def dump_async(self, obj, *, limit=None):
+        '''Return a marshalled representation of obj (coroutine).
+
+        Args:
+            obj: The object (or collection of objects, depending on the
+                schema's :attr:`many` property) to marshall.
+
+            limit: An optional maximum number of objects of a collection to
+                marshall concurrently.
+
+        Returns:
+            A representation of ``obj`` (see :meth:`dump`).
+
+        This coroutine supports fields with coroutine functions as getters
+        (``Field(get=some_coroutine_function)``) as well as linked objects
+        whose schemas have such fields. The values of those fields are
+        determined concurrently (per object and across all objects of a
+        collection). All other fields are determined by the same
+        instance-specific function that's used by :meth:`dump`. If a schema
+        has no fields requiring awaiting, this is just as fast as
+        :meth:`dump`.
+
+        .. versionadded:: 0.6
+
+        '''
+        return await self._dump_async(obj, limit)
+
+    def dump_json(self, obj, *, only=None, exclude=None):
+        '''Return the JSON representation of obj.
+
+        Args:
+            obj: The object (or collection of objects, depending on the
+                schema's :attr:`many` property) to marshall.
+
+            only: See :meth:`dump` (an empty selection selects all fields).
+
+            exclude: See :meth:`dump`.
+
+        Returns:
+            A string containing a JSON document equivalent to
+            ``json.dumps(self.dump(obj))``. (Without :attr:`ordered` having
+            any effect: fields always appear in the schema's order.)
+
+        This is faster than calling :func:`json.dumps` on the result of
+        :meth:`dump`: The JSON text is written directly by an instance-specific
+        function, with no intermediate dicts being created and without walking
+        the result a second time. Field types that know how to encode their
+        values (like :class:`lima.fields.Integer`,
+        :class:`lima.fields.String` or :class:`lima.fields.Date`) are encoded
+        with as little overhead as possible.
+
+        .. versionadded:: 0.6
+
+        '''
+        if only or exclude:
+            return self._selected(only, exclude)._dump_fields_json(obj)
+        return self._dump_fields_json(obj)
+
+    def dump_to(self,
+                stream,
+                objs,
+                *,
+                format='json',
+                buffer_size=65536,
+                envelope=None,
+                envelope_key='data',
+                binary=None):
+        '''Write the JSON representations of objs to a file-like object.
+
+        Args:
+            stream: A file-like object to write to. Text streams get written
+                strings, binary streams get written UTF-8 encoded bytes (see
+                ``binary``).
+
+            objs: An iterable of objects to marshall (see :meth:`dump_iter`),
+                regardless of the schema's :attr:`many` property.
+
+            format: Either ``'json'`` (write a single JSON array) or
+                ``'ndjson'`` (write one JSON object per line).
+
+            buffer_size: The approximate number of characters to collect
+                before writing them to ``stream`` at once.
+
+            envelope: An optional mapping of additional members of a JSON
+                object to put around the array of marshalled objects, which
+                itself gets stored under the key ``envelope_key`` (only for
+                ``format='json'``). For example, ``envelope={'meta': meta}``
+                writes ``{"data": [...], "meta": ...}``.
+
+            envelope_key: The name of the JSON object member containing the
+                array of marshalled objects if ``envelope`` is provided.
+                Defaults to ``'data'``.
+
+            binary: True if ``stream`` expects bytes, False if it expects
+                strings. Defaults to ``None``: Determine this from the stream
+                (see :func:`_is_binary_stream`).
+
+        Returns:
+            The number of objects written.
+
+        Objects are pulled from ``objs`` lazily, and the output is written in
+        chunks of about ``buffer_size`` characters. This way, memory
+        consumption depends on the size of the buffer only, not on the number
+        of objects.
+
+        .. versionadded:: 0.6
+
+        '''
+        if format not in ('json', 'ndjson'):
+            raise ValueError('Unknown format: {!r}'.format(format))
+        if envelope is not None and format != 'json':
+            raise ValueError('envelope is only supported for json format.')
+        if not isinstance(buffer_size, int) or buffer_size < 1:
+            msg = 'buffer_size must be a positive integer: {!r}'
+            raise ValueError(msg.format(buffer_size))
+
+        if binary is None:
+            binary = _is_binary_stream(stream)
+        if not binary:
+            write = stream.write
+        else:
+            def write(text):
+                stream.write(text.encode('utf-8'))
+
+        if format == 'json':
+            head, separator, tail = '[', ', ', ']'
+            if envelope is not None:
+                util.ensure_mapping(envelope)
+                head = '{{{}: ['.format(json.dumps(envelope_key))
+                tail = ''.join(
+                    [']'] +
+                    [', {}: {}'.format(json.dumps(k), json.dumps(v))
+                     for k, v in envelope.items()] +
+                    ['}']
+                )
+        else:
+            head, separator, tail = '', '\n', '\n'
+
+        dump = self._dump_fields_json_one
+        buffer = [head]
+        buffered = len(head)
+        count = 0
+
+        for obj in objs:
+            text = dump(obj)
+            if count:
+                buffer.append(separator)
+                buffered += len(separator)
+            buffer.append(text)
+            buffered += len(text)
+            count += 1
+            if buffered >= buffer_size:
+                write(''.join(buffer))
+                buffer = []
+                buffered = 0
+
+        if count or format == 'json':
+            buffer.append(tail)
+        rest = ''.join(buffer)
+        if rest:
+            write(rest)
+
+        return count
+
+    def dump_columns(self, objs, *, arrays=False):
+        '''Return a column-oriented marshalled representation of objs.
+
+        Args:
+            objs: An iterable of objects to marshall, regardless of the
+                schema's :attr:`many` property.
+
+            arrays: If True(ish), the columns of numeric fields
+                (:class:`lima.fields.Integer` and :class:`lima.fields.Float`)
+                are returned as compact :class:`array.array` objects instead
+                of lists. Those columns must not contain ``None`` values then.
+
+        Returns:
+            A dict (or :class:`collections.OrderedDict`, depending on the
+            schema's :attr:`ordered` property) mapping each of the schema's
+            field names to a list of this field's values - one per object in
+            ``objs``.
+
+        Each column is determined by its own instance-specific function, so
+        no per-object dicts have to be created and transposed.
+
+        .. versionadded:: 0.6
+
+        '''
+        # we'll iterate over objs once per field
+        if not isinstance(objs, collections_abc.Sequence):
+            objs = list(objs)
+
+        columns = OrderedDict() if self._ordered else {}
+        for field_name, field in self._fields.items():
+            column = self._dump_field_func(field_name, many=True)(objs)
+            if arrays:
+                typecode = _array_typecode(field)
+                if typecode is not None:
+                    with util.exception_context(field_name):
+                        column = array.array(typecode, column)
+            columns[field_name] = column
+        return columns
+
+    def dump_array(self, objs, *, columns=False):
+        '''Return a NumPy-based marshalled representation of objs.
+
+        Args:
+            objs: An iterable of objects to marshall, regardless of the
+                schema's :attr:`many` property.
+
+            columns: If True(ish), a dict of one-dimensional arrays (one per
+                field) gets returned instead of a structured array.
+
+        Returns:
+            A :class:`numpy.ndarray` with a structured dtype containing one
+            record per object in ``objs`` (or a dict mapping field names to
+            one array per field, if ``columns`` is True(ish)).
+
+        Raises:
+            TypeError: If the schema has fields of types other than
+                :class:`lima.fields.Boolean`, :class:`lima.fields.Float` and
+                :class:`lima.fields.Integer`.
+
+            ImportError: If NumPy is not installed.
+
+        The dtype of each field is derived from the native Python type
+        associated with the field's type in :data:`lima.fields.TYPE_MAPPING`.
+        Values are written into preallocated arrays, column by column, without
+        creating per-object dicts.
+
+        NumPy is an optional dependency. It is only imported when this method
+        is called.
+
+        .. versionadded:: 0.6
+
+        '''
+        native_types = OrderedDict()
+        for field_name, field in self._fields.items():
+            with util.exception_context(field_name):
+                native_types[field_name] = _native_type(field)
+
+        numpy = _import_numpy()
+
+        # we'll iterate over objs once per field
+        if not isinstance(objs, collections_abc.Sequence):
+            objs = list(objs)
+        count = len(objs)
+
+        if columns:
+            result = OrderedDict() if self._ordered else {}
+            for field_name, native_type in native_types.items():
+                column = self._dump_field_func(field_name, many=True)(objs)
+                result[field_name] = numpy.fromiter(
+                    column, numpy.dtype(native_type), count
+                )
+            return result
+
+        dtype = numpy.dtype([(field_name, numpy.dtype(native_type))
+                             for field_name, native_type
+                             in native_types.items()])
+        result = numpy.empty(count, dtype=dtype)
+        for field_name in native_types:
+            column = self._dump_field_func(field_name, many=True)(objs)
+            result[field_name] = column
+        return result
+
+    def dump_parallel(self, objs, *, workers=None, chunk_size=1000,
+                      executor=None):
+        '''Return a list of marshalled representations of objs.
+
+        Marshalling is distributed across multiple processes.
+
+        Args:
+            objs: An iterable of objects to marshall, regardless of the
+                schema's :attr:`many` property.
+
+            workers: The number of worker processes to use. Defaults to the
+                number of processors on the machine. Ignored if ``executor``
+                is provided.
+
+            chunk_size: The number of objects to send to a worker process at
+                once.
+
+            executor: An optional :class:`concurrent.futures.Executor` to use
+                instead of creating a new
+                :class:`~concurrent.futures.ProcessPoolExecutor`. Providing a
+                long-lived executor saves the cost of starting new processes
+                for every call.
+
+        Returns:
+            A list of representations (as described in :meth:`dump`), one per
+            object in ``objs``, in the original order.
+
+        Raises:
+            ValueError: If the schema object was created with
+                ``profile=True`` or with a ``cache``.
+
+        The schema and the objects are sent to the worker processes via
+        :mod:`pickle`, so they have to be picklable: Schema classes (and the
+        classes of the objects) must not be defined in local namespaces, and
+        fields must not have unpicklable attributes (like getters that are
+        lambda functions). Instance-specific dump functions are not pickled
+        but recreated within the worker processes.
+
+        .. versionadded:: 0.6
+
+        '''
+        if self._profile is not None:
+            # profiles would be recorded in the worker processes (and lost)
+            raise ValueError("Schema objects created with profile=True can't "
+                             "dump in parallel.")
+        if self._cache is not None:
+            # caches can't be shared with the worker processes
+            raise ValueError("Schema objects with a result cache can't dump "
+                             "in parallel.")
+        chunks = util.chunks(objs, chunk_size)
+        dump_chunk = functools.partial(_dump_chunk, self)
+
+        if executor is None:
+            with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(dump_chunk, chunks))
+        else:
+            results = list(executor.map(dump_chunk, chunks))
+
+        return [dumped for result in results for dumped in result]
+
+    def dump_iter(self, objs):
+        '''Return an iterator over the marshalled representations of objs.
+
+        Args:
+            objs: An iterable of objects to marshall. This can be any iterable
+                (like a database cursor or a generator), regardless of the
+                schema's :attr:`many` property.
+
+        Returns:
+            An iterator yielding one representation (as described in
+            :meth:`dump`) per object in ``objs``. Objects are pulled from
+            ``objs`` lazily, one at a time, so only the representation
+            currently being processed has to be kept in memory.
+
+        .. versionadded:: 0.6
+
+        '''
+        return self._dump_fields_iter(objs)
+
+    def dump_chunks(self, objs, size):
+        '''Return an iterator over lists of marshalled representations.
+
+        Args:
+            objs: An iterable of objects to marshall (see :meth:`dump_iter`).
+
+            size: The maximum number of representations per list. Must be a
+                positive integer.
+
+        Returns:
+            An iterator yielding lists of at most ``size`` representations
+            each (the last list might be shorter). Objects are pulled from
+            ``objs`` lazily, one chunk at a time.
+
+        .. versionadded:: 0.6
+
+        '''
+        return util.chunks(self._dump_fields_iter(objs), size)
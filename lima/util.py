@@ -7,7 +7,9 @@
     any time without deprecation notice or upgrade path.
 
 '''
-from collections import abc
+import itertools
+import threading
+from collections import OrderedDict, abc
 from contextlib import contextmanager
 
 
@@ -69,6 +71,19 @@ class reify:
         return val
 
 
+def unreified_state(obj):
+    '''Return a copy of obj's instance dict without values cached by reify.
+
+    Useful to implement ``__getstate__`` for classes with :class:`reify`
+    attributes that hold unpicklable values (like dynamically created
+    functions). Those values get recreated lazily after unpickling.
+
+    '''
+    cls = type(obj)
+    return {k: v for k, v in obj.__dict__.items()
+            if not isinstance(getattr(cls, k, None), reify)}
+
+
 # The code for this class is taken directly from the Python 3.4 standard
 # library (to support Python 3.3), licensed under the PSF License (see
 # https://docs.python.org/3/license.html)
@@ -104,6 +119,95 @@ class suppress:
         return exctype is not None and issubclass(exctype, self._exceptions)
 
 
+class LRUCache:
+    '''A thread-safe mapping of bounded size with least-recently-used eviction.
+
+    Args:
+        maxsize: The maximum number of entries. When adding an entry to a full
+            cache, the least recently used entry gets evicted.
+
+    Apart from the cached values, an :class:`LRUCache` keeps track of the
+    number of cache hits, cache misses and evictions (see :meth:`stats`).
+
+    '''
+    def __init__(self, maxsize=128):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._maxsize = None
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def maxsize(self):
+        '''The maximum number of entries (evicts entries when lowered).'''
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        if not isinstance(maxsize, int) or maxsize < 1:
+            msg = 'maxsize must be a positive integer: {!r}'
+            raise ValueError(msg.format(maxsize))
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def _evict(self):
+        '''Evict least recently used entries until size is ok.'''
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        '''Return the value for key (or default), counting hits & misses.'''
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        '''Set the value for key (evicting other entries if necessary).'''
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+
+    def pop(self, key, default=None):
+        '''Remove key and return its value (or default).'''
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        '''Remove all entries and reset statistics.'''
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        '''Return a dict containing statistics on the usage of the cache.'''
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self._maxsize,
+        }
+
+
 def vector_context(obj):
     '''Return obj if obj is a vector, or [obj] in case obj is a scalar.
 
@@ -126,6 +230,37 @@ def vector_context(obj):
     return [obj]
 
 
+def chunks(iterable, size):
+    '''Return an iterator over lists of consecutive elements of iterable.
+
+    Args:
+        iterable: Any iterable. Its elements are pulled lazily, one chunk at a
+            time.
+
+        size: The maximum number of elements per list. Must be a positive
+            integer.
+
+    Returns:
+        An iterator yielding lists of at most ``size`` elements each (only the
+        last list might be shorter).
+
+    Raises:
+        ValueError: If ``size`` is not a positive integer.
+
+    '''
+    if not isinstance(size, int) or size < 1:
+        raise ValueError('size must be a positive integer: {!r}'.format(size))
+
+    def generate(iterator):
+        while True:
+            chunk = list(itertools.islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
+
+    return generate(iter(iterable))
+
+
 def ensure_iterable(obj):
     '''Raise TypeError if obj is not iterable.'''
     if not isinstance(obj, abc.Iterable):
@@ -8,8 +8,8 @@ import sys
 from setuptools import setup, find_packages
 from setuptools.command.test import test as TestCommand
 
-# require Python 3.3 or newer
-assert sys.version_info >= (3, 3), 'Python 3.3 oder newer required.'
+# require Python 3.7 or newer
+assert sys.version_info >= (3, 7), 'Python 3.7 oder newer required.'
 
 
 class PyTest(TestCommand):
@@ -67,14 +67,20 @@ setup(
         'Operating System :: OS Independent',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
         'Topic :: Software Development :: Libraries :: Python Modules',
     ],
+    python_requires='>=3.7',
     packages=find_packages(exclude=['test*']),
     include_package_data=True,
     zip_safe=True,
     install_requires=[],
+    extras_require={'numpy': ['numpy']},
     tests_require=['pytest'],
     cmdclass={'test': PyTest},
 )
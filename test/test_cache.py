@@ -0,0 +1,125 @@
+'''Tests for the cache module.'''
+import asyncio
+
+import pytest
+
+from lima import cache
+
+
+def test_memory_backend():
+    backend = cache.MemoryBackend(maxsize=2)
+    assert backend.get('a') is None
+    backend.set('a', 1)
+    backend.set('b', 2)
+    assert backend.get('a') == 1
+    backend.set('c', 3)  # evicts b (least recently used)
+    assert backend.get('b') is None
+    assert backend.get('c') == 3
+    assert len(backend) == 2
+    backend.clear()
+    assert len(backend) == 0
+
+
+def test_memory_backend_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    backend = cache.MemoryBackend(ttl=10)
+    backend.set('a', 1)
+    now[0] += 10
+    assert backend.get('a') == 1
+    now[0] += 1
+    assert backend.get('a') is None
+    assert len(backend) == 0
+
+
+def test_memory_backend_invalid():
+    with pytest.raises(ValueError):
+        cache.MemoryBackend(maxsize=0)
+    with pytest.raises(ValueError):
+        cache.MemoryBackend(ttl=0)
+
+
+def test_result_cache_wrap():
+    versions = {1: 'v1', 2: 'v1'}
+    calls = []
+
+    def dump(obj):
+        calls.append(obj)
+        return {'id': obj}
+
+    result_cache = cache.ResultCache(key=lambda obj: obj,
+                                     version=versions.get)
+    cached_dump = result_cache.wrap('fingerprint', dump)
+    assert result_cache.stats()['hit_rate'] is None
+
+    assert cached_dump(1) == {'id': 1}
+    assert cached_dump(1) is cached_dump(1)
+    assert cached_dump(2) == {'id': 2}
+    assert calls == [1, 2]
+
+    versions[1] = 'v2'
+    assert cached_dump(1) == {'id': 1}
+    assert calls == [1, 2, 1]
+
+    # fingerprints separate results
+    result_cache.wrap('other', lambda obj: None)(1)
+    assert cached_dump(1) == {'id': 1}
+
+    assert result_cache.stats() == {'hits': 3, 'misses': 3, 'stale': 1,
+                                    'hit_rate': 3 / 7}
+    result_cache.clear()
+    assert result_cache.stats()['hits'] == 0
+    cached_dump(1)
+    assert calls == [1, 2, 1, 1]
+
+
+def test_result_cache_custom_backend():
+    class DictBackend(cache.CacheBackend):
+        def __init__(self):
+            self.data = {}
+
+        def get(self, key):
+            return self.data.get(key)
+
+        def set(self, key, value):
+            self.data[key] = value
+
+        def clear(self):
+            self.data.clear()
+
+    backend = DictBackend()
+    result_cache = cache.ResultCache(key=str, backend=backend)
+    result_cache.wrap('fingerprint', lambda obj: obj * 2)(21)
+    [(token, key)] = backend.data
+    assert key == '21'
+    assert backend.data[token, key] == (None, 42)
+
+    # equal fingerprints share the same (cheap) token
+    result_cache.wrap(('finger' + 'print'), lambda obj: obj * 3)(22)
+    assert backend.data[token, '22'] == (None, 66)
+    result_cache.wrap(('other', ), lambda obj: obj)(23)
+    assert len({token for token, key in backend.data}) == 2
+
+
+def test_result_cache_extra_args_and_coroutines():
+    result_cache = cache.ResultCache(key=str)
+    dump = result_cache.wrap('f', lambda obj, factor: obj * factor)
+    assert dump(2, 3) == 6
+    assert dump(2, 4) == 6  # cached
+
+    async def dump_async(obj, factor):
+        return obj * factor
+
+    cached_async = result_cache.wrap('g', dump_async)
+    assert asyncio.run(cached_async(2, 5)) == 10
+    assert asyncio.run(cached_async(2, 6)) == 10
+    assert result_cache.stats()['hits'] == 2
+
+
+def test_result_cache_invalid():
+    with pytest.raises(TypeError):
+        cache.ResultCache(key='id')
+    with pytest.raises(TypeError):
+        cache.ResultCache(key=id, version='version')
+    with pytest.raises(TypeError):
+        cache.ResultCache(key=id, backend={})
@@ -0,0 +1,117 @@
+'''tests for the compile module'''
+import importlib.util
+
+import pytest
+
+from lima import compile, fields, schema
+
+
+class AuthorSchema(schema.Schema):
+    name = fields.String()
+    born = fields.Date()
+
+
+class BookSchema(schema.Schema):
+    title = fields.String()
+    author = fields.Embed(schema=AuthorSchema, exclude='born')
+    author_name = fields.Reference(schema=__name__ + '.AuthorSchema',
+                                   field='name', attr='author')
+
+
+class Author:
+    def __init__(self, name):
+        self.name = name
+
+
+class Book:
+    def __init__(self, title, author):
+        self.title = title
+        self.author = author
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    yield
+    schema._precompiled.clear()
+    schema.function_cache.clear()
+
+
+def import_path(path, name='lima_compiled'):
+    spec = importlib.util.spec_from_file_location(name, str(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_generate(tmp_path):
+    source = compile.generate([__name__])
+    path = tmp_path / 'lima_compiled.py'
+    path.write_text(source)
+    module = import_path(path)
+
+    # importing the generated module loads the precompiled functions
+    assert module.FUNCTIONS
+    assert set(module.FUNCTIONS) <= set(schema._precompiled)
+
+    # fresh schema objects use precompiled functions (which are closures)
+    schema.function_cache.clear()
+    book_schema = BookSchema(many=True)
+    assert book_schema._dump_fields.__closure__ is not None
+    book = Book('Gorgias', Author('Plato'))
+    expected = [{
+        'title': 'Gorgias',
+        'author': {'name': 'Plato'},
+        'author_name': 'Plato',
+    }]
+    assert book_schema.dump([book]) == expected
+    assert book_schema.dump_json([book]) == (
+        '[{"title": "Gorgias", "author": {"name": "Plato"}, '
+        '"author_name": "Plato"}]'
+    )
+
+
+def test_generate_keeps_caches():
+    book_schema = BookSchema(many=True)
+    book_schema.dump([Book('Gorgias', Author('Plato'))])
+    function_cache, variant_cache = schema.function_cache, schema.variant_cache
+    size = len(function_cache)
+    stats = function_cache.stats()
+
+    source = compile.generate([__name__])
+    assert 'def _f0(' in source
+    assert schema.function_cache is function_cache
+    assert schema.variant_cache is variant_cache
+    assert len(function_cache) == size
+    assert function_cache.stats() == stats
+
+
+def test_fallback_without_precompiled_function():
+    compile.load({})
+    author_schema = AuthorSchema(ordered=True)
+    assert author_schema._dump_fields.__closure__ is None  # made via exec
+
+
+def test_main(tmp_path):
+    path = tmp_path / 'out.py'
+    compile.main([__name__, '-o', str(path)])
+    source = path.read_text()
+    assert source == compile.generate([__name__])
+    assert 'lima.compile.load(FUNCTIONS)' in source
+
+
+def test_generate_after_dump():
+    # dump functions stored on (possibly shared) schema objects and fields
+    # don't keep them from being generated
+    for many in (False, True):
+        book_schema = BookSchema(many=many)
+        books = Book('Gorgias', Author('Plato'))
+        if many:
+            books = [books]
+        book_schema.dump(books)
+        book_schema.dump_json(books)
+    source = compile.generate([__name__])
+
+    # dump and JSON dump functions of BookSchema and AuthorSchema (many and
+    # not), of the embedded AuthorSchema and of the referenced field
+    assert source.count('\ndef _f') == 12
+    assert compile.generate([__name__]) == source
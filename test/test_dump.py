@@ -1,9 +1,20 @@
+import asyncio
+import codecs
+import io
+import json
+import pickle
+import sys
+import threading
+import weakref
+from array import array
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
+from decimal import Decimal
 
 import pytest
 
-from lima import fields, schema
+from lima import cache, fields, metrics, schema
 
 
 # model -----------------------------------------------------------------------
@@ -417,3 +428,1320 @@ def test_dump_exotic_field_names():
         result = dump_field_func(obj)
         expected = 'foobar'
         assert result == expected
+
+
+class Book:
+    def __init__(self, title, author):
+        self.title = title
+        self.author = author
+
+
+class BookSchema(schema.Schema):
+    title = fields.String()
+    author_name = fields.String(attr='author.name', none_safe=True)
+    author_born = fields.Date(attr='author.born', none_safe=True)
+    author_boss = fields.String(attr='author.boss.name', none_safe=True)
+
+
+class BookDictSchema(schema.Schema):
+    title = fields.String(key='title')
+    author_name = fields.String(key=['author', 'name'])
+    author_born = fields.Date(key=['author', 'born'], none_safe=True)
+
+
+@pytest.mark.parametrize('many', [False, True])
+def test_dump_paths(lancelot, arthur, many):
+    lancelot.boss = arthur
+    books = [Book('Grail', lancelot), Book('Nothing', None)]
+    expected = [
+        {'title': 'Grail', 'author_name': 'Lancelot',
+         'author_born': '0503-03-03', 'author_boss': 'Arthur'},
+        {'title': 'Nothing', 'author_name': None,
+         'author_born': None, 'author_boss': None},
+    ]
+    book_schema = BookSchema(many=many)
+    if many:
+        assert book_schema.dump(books) == expected
+        assert json.loads(book_schema.dump_json(books)) == expected
+    else:
+        assert [book_schema.dump(b) for b in books] == expected
+        assert json.loads(book_schema.dump_json(books[1])) == expected[1]
+
+    book_dict = {'title': 'Grail', 'author': {'name': 'Lancelot',
+                                              'born': None}}
+    assert BookDictSchema().dump(book_dict) == {
+        'title': 'Grail', 'author_name': 'Lancelot', 'author_born': None
+    }
+
+
+def test_dump_paths_not_none_safe():
+
+    class MySchema(schema.Schema):
+        author_number = fields.Integer(attr='author.number')
+
+    with pytest.raises(AttributeError):
+        MySchema().dump(Book('Nothing', None))
+
+
+class Profile:
+    def __init__(self, name, boss=None):
+        self.name = name
+        self.boss = boss
+
+
+class Account:
+    profile_calls = 0
+
+    def __init__(self, profile):
+        self._profile = profile
+
+    @property
+    def profile(self):
+        self.profile_calls += 1
+        return self._profile
+
+
+class ProfileSchema(schema.Schema):
+    name = fields.String()
+
+
+@pytest.mark.parametrize('many', [False, True])
+def test_dump_shared_paths(many):
+    getter_calls = []
+
+    def get_name(obj):
+        getter_calls.append(obj)
+        return obj.profile.name
+
+    class AccountSchema(schema.Schema):
+        name = fields.String(attr='profile.name')
+        boss = fields.String(attr='profile.boss.name', none_safe=True)
+        boss_again = fields.String(attr='profile.boss.name', none_safe=True)
+        profile = fields.Embed(schema=ProfileSchema)
+        profile_name = fields.Reference(schema=ProfileSchema, field='name',
+                                        attr='profile')
+        name_upper = UpperString(get=get_name)
+        name_lower = fields.String(get=get_name)
+
+    accounts = [Account(Profile('Lancelot', Profile('Arthur'))),
+                Account(Profile('Arthur'))]
+    expected = [
+        {'name': 'Lancelot', 'boss': 'Arthur', 'boss_again': 'Arthur',
+         'profile': {'name': 'Lancelot'}, 'profile_name': 'Lancelot',
+         'name_upper': 'LANCELOT', 'name_lower': 'Lancelot'},
+        {'name': 'Arthur', 'boss': None, 'boss_again': None,
+         'profile': {'name': 'Arthur'}, 'profile_name': 'Arthur',
+         'name_upper': 'ARTHUR', 'name_lower': 'Arthur'},
+    ]
+
+    account_schema = AccountSchema(many=many)
+    dumps = [account_schema.dump,
+             lambda obj: json.loads(account_schema.dump_json(obj))]
+    for dump in dumps:
+        getter_calls.clear()
+        for account in accounts:
+            account.profile_calls = 0
+        if many:
+            assert dump(accounts) == expected
+        else:
+            assert [dump(account) for account in accounts] == expected
+
+        # shared paths and getters are evaluated once per object: once for
+        # the none-safe paths, once for the others and once by the getter
+        assert getter_calls == accounts
+        assert [a.profile_calls for a in accounts] == [3, 3]
+
+
+@pytest.mark.parametrize('many', [False, True])
+def test_dump_unhashable_getter(many, lancelot):
+
+    class Getter:
+        def __init__(self, attr):
+            self.attr = attr
+
+        def __eq__(self, other):  # no __hash__
+            return isinstance(other, Getter) and other.attr == self.attr
+
+        def __call__(self, obj):
+            return getattr(obj, self.attr)
+
+    class GetterSchema(schema.Schema):
+        name = fields.String(get=Getter('name'))
+        name_again = fields.String(get=Getter('name'))
+        number = fields.Integer(get=Getter('number'))
+
+    getter_schema = GetterSchema(many=many)
+    expected = {'name': 'Lancelot', 'name_again': 'Lancelot', 'number': 3}
+    obj, expected = ([lancelot], [expected]) if many else (lancelot, expected)
+    assert getter_schema.dump(obj) == expected
+    assert json.loads(getter_schema.dump_json(obj)) == expected
+
+
+def test_dump_iter(knights):
+    knight_schema = KnightSchema()  # many=False doesn't matter here
+    result = knight_schema.dump_iter(iter(knights))
+    assert not isinstance(result, list)
+    expected = [
+        dict(title='Sir', name='Bedevere', number=2, born='0502-02-02'),
+        dict(title='Sir', name='Lancelot', number=3, born='0503-03-03'),
+        dict(title='Sir', name='Galahad', number=4, born='0504-04-04'),
+    ]
+    assert list(result) == expected
+
+
+def test_dump_iter_is_lazy(knights):
+    pulled = []
+
+    def cursor():
+        for knight in knights:
+            pulled.append(knight)
+            yield knight
+
+    knight_schema = KnightSchema(ordered=True)
+    result = knight_schema.dump_iter(cursor())
+    assert pulled == []
+    first = next(result)
+    assert type(first) == OrderedDict
+    assert first['name'] == 'Bedevere'
+    assert len(pulled) == 1
+
+
+def test_dump_chunks(knights):
+    knight_schema = KnightSchema(only='name')
+    result = list(knight_schema.dump_chunks(iter(knights), 2))
+    expected = [
+        [dict(name='Bedevere'), dict(name='Lancelot')],
+        [dict(name='Galahad')],
+    ]
+    assert result == expected
+
+    with pytest.raises(ValueError):
+        knight_schema.dump_chunks(knights, 0)
+
+
+@pytest.mark.parametrize(
+    'schema_cls',
+    [KnightSchema,
+     FieldWithAttrArgSchema,
+     FieldWithGetterArgSchema,
+     FieldWithValArgSchema,
+     KingWithEmbeddedSubjectsObjSchema,
+     KingWithEmbeddedSubjectsClassSchema,
+     KingWithEmbeddedSubjectsStrSchema,
+     KingWithReferencedSubjectsObjSchema,
+     KingWithReferencedSubjectsClassSchema,
+     KingWithReferencedSubjectsStrSchema]
+)
+@pytest.mark.parametrize('many', [False, True])
+def test_dump_json(schema_cls, many, arthur):
+    knight_schema = schema_cls(many=many)
+    obj = [arthur, arthur] if many else arthur
+    assert knight_schema.dump_json(obj) == json.dumps(knight_schema.dump(obj))
+
+
+def test_dump_json_values():
+
+    class Foo:
+        pass
+
+    class ValueSchema(schema.Schema):
+        boolean = fields.Boolean()
+        decimal = fields.Decimal()
+        float = fields.Float()
+        integer = fields.Integer()
+        string = fields.String()
+        date = fields.Date()
+        datetime = fields.DateTime()
+        nil__class = fields.Field(attr='untyped')
+        __lima_args__ = {'include': {'"%s♥': fields.String(attr='string')}}
+
+    value_schema = ValueSchema()
+    values = [
+        (True, Decimal('1.10'), 1.5, 1, 'a"b\\c♥\n', date(2015, 1, 1),
+         datetime(2015, 1, 1, 12), [1, {'a': None}]),
+        (False, 1.5, float('nan'), True, 1, None, None, None),
+        (None, None, float('-inf'), None, None, None, None, 'x'),
+    ]
+    for vals in values:
+        obj = Foo()
+        (obj.boolean, obj.decimal, obj.float, obj.integer, obj.string,
+         obj.date, obj.datetime, obj.untyped) = vals
+        expected = json.dumps(value_schema.dump(obj))
+        assert value_schema.dump_json(obj) == expected
+        assert json.loads(value_schema.dump_json(obj)) is not None
+
+
+def test_dump_json_overridden_pack(lancelot):
+
+    class MyDate(fields.Date):
+        @staticmethod
+        def pack(val):
+            return val.year
+
+    class MySchema(schema.Schema):
+        born = MyDate()
+
+    assert MySchema().dump_json(lancelot) == '{"born": 503}'
+
+
+class UpperString(fields.String):
+    pack_template = 'None if {val} is None else {upper}({val})'
+    pack_globals = {'upper': str.upper}
+
+    @staticmethod
+    def pack(val):
+        return None if val is None else str.upper(val)
+
+
+@pytest.mark.parametrize('many', [False, True])
+def test_dump_pack_template(knights, many):
+
+    class MyDate(fields.Date):
+        @staticmethod
+        def pack(val):
+            return val.year
+
+    class MySchema(schema.Schema):
+        name = UpperString()
+        title = UpperString(get=lambda obj: None)
+        born = MyDate()
+        date = fields.Date(attr='born')
+
+    knights_schema = MySchema(many=many)
+    expected = [
+        {'name': 'BEDEVERE', 'title': None, 'born': 502,
+         'date': '0502-02-02'},
+        {'name': 'LANCELOT', 'title': None, 'born': 503,
+         'date': '0503-03-03'},
+        {'name': 'GALAHAD', 'title': None, 'born': 504,
+         'date': '0504-04-04'},
+    ]
+    if many:
+        assert knights_schema.dump(knights) == expected
+        assert knights_schema.dump_columns(knights)['name'] == [
+            'BEDEVERE', 'LANCELOT', 'GALAHAD'
+        ]
+    else:
+        assert [knights_schema.dump(k) for k in knights] == expected
+        assert json.loads(knights_schema.dump_json(knights[0])) == expected[0]
+
+
+def test_dump_json_empty_schema(knights):
+
+    class EmptySchema(schema.Schema):
+        pass
+
+    assert EmptySchema().dump_json(knights[0]) == '{}'
+    assert EmptySchema(many=True).dump_json(knights) == '[{}, {}, {}]'
+    assert EmptySchema(many=True).dump_json([]) == '[]'
+
+
+@pytest.mark.parametrize('buffer_size', [1, 10, 65536])
+def test_dump_to_text_stream(knights, buffer_size):
+    knight_schema = KnightSchema(many=True)
+    stream = io.StringIO()
+    count = knight_schema.dump_to(stream, iter(knights),
+                                  buffer_size=buffer_size)
+    assert count == 3
+    assert stream.getvalue() == json.dumps(knight_schema.dump(knights))
+
+
+def test_dump_to_binary_stream_ndjson(knights):
+    knight_schema = KnightSchema()
+    stream = io.BytesIO()
+    count = knight_schema.dump_to(stream, knights, format='ndjson')
+    assert count == 3
+    lines = stream.getvalue().decode('utf-8').split('\n')
+    assert lines[-1] == ''
+    assert [json.loads(l) for l in lines[:-1]] == [
+        knight_schema.dump(knight) for knight in knights
+    ]
+
+
+def test_dump_to_other_text_streams(knights):
+    knight_schema = KnightSchema(many=True, only='name')
+    expected = json.dumps(knight_schema.dump(knights))
+
+    class TextWriter:
+        encoding = 'utf-8'
+
+        def __init__(self):
+            self.chunks = []
+
+        def write(self, text):
+            self.chunks.append(text + '')  # fails for bytes
+
+    stream = TextWriter()
+    knight_schema.dump_to(stream, knights)
+    assert ''.join(stream.chunks) == expected
+
+    bytes_stream = io.BytesIO()
+    knight_schema.dump_to(codecs.getwriter('utf-8')(bytes_stream), knights)
+    assert bytes_stream.getvalue().decode('utf-8') == expected
+
+    # no hints at all: override the default (bytes)
+    del TextWriter.encoding
+    stream = TextWriter()
+    knight_schema.dump_to(stream, knights, binary=False)
+    assert ''.join(stream.chunks) == expected
+
+
+def test_dump_to_envelope(knights):
+    knight_schema = KnightSchema(only='name')
+    stream = io.StringIO()
+    envelope = OrderedDict([('meta', {'count': 3}), ('"%', None)])
+    knight_schema.dump_to(stream, knights, envelope=envelope, buffer_size=5)
+    expected = ('{"data": [{"name": "Bedevere"}, {"name": "Lancelot"}, '
+                '{"name": "Galahad"}], "meta": {"count": 3}, "\\"%": null}')
+    assert stream.getvalue() == expected
+
+    stream = io.StringIO()
+    knight_schema.dump_to(stream, [], envelope={}, envelope_key='items')
+    assert stream.getvalue() == '{"items": []}'
+
+
+def test_dump_to_empty(knights):
+    knight_schema = KnightSchema()
+    stream = io.StringIO()
+    assert knight_schema.dump_to(stream, []) == 0
+    assert stream.getvalue() == '[]'
+    stream = io.StringIO()
+    assert knight_schema.dump_to(stream, [], format='ndjson') == 0
+    assert stream.getvalue() == ''
+
+
+def test_dump_to_fail_on_wrong_args(knights):
+    knight_schema = KnightSchema()
+    stream = io.StringIO()
+    with pytest.raises(ValueError):
+        knight_schema.dump_to(stream, knights, format='xml')
+    with pytest.raises(ValueError):
+        knight_schema.dump_to(stream, knights, format='ndjson', envelope={})
+    with pytest.raises(ValueError):
+        knight_schema.dump_to(stream, knights, buffer_size=0)
+    assert stream.getvalue() == ''
+
+
+def test_dump_columns(knights):
+    knight_schema = KnightSchema()
+    result = knight_schema.dump_columns(iter(knights))
+    expected = {
+        'title': ['Sir', 'Sir', 'Sir'],
+        'name': ['Bedevere', 'Lancelot', 'Galahad'],
+        'number': [2, 3, 4],
+        'born': ['0502-02-02', '0503-03-03', '0504-04-04'],
+    }
+    assert type(result) == dict
+    assert result == expected
+
+    knight_schema = KnightSchema(ordered=True, many=True)
+    result = knight_schema.dump_columns(knights)
+    assert type(result) == OrderedDict
+    assert list(result) == ['title', 'name', 'number', 'born']
+    assert result == expected
+
+
+def test_dump_columns_arrays(knights):
+
+    class NumberSchema(schema.Schema):
+        number = fields.Integer()
+        ratio = fields.Float(get=lambda obj: obj.number / 2)
+        name = fields.String()
+
+    number_schema = NumberSchema()
+    result = number_schema.dump_columns(knights, arrays=True)
+    assert result['number'] == array('q', [2, 3, 4])
+    assert result['ratio'] == array('d', [1.0, 1.5, 2.0])
+    assert result['name'] == ['Bedevere', 'Lancelot', 'Galahad']
+
+    result = number_schema.dump_columns(knights)
+    assert result['number'] == [2, 3, 4]
+
+
+def test_dump_columns_empty():
+    result = KnightSchema().dump_columns([], arrays=True)
+    assert result == dict(title=[], name=[], number=array('q'), born=[])
+
+
+class NumericSchema(schema.Schema):
+    number = fields.Integer()
+    ratio = fields.Float(get=lambda obj: obj.number / 2)
+    odd = fields.Boolean(get=lambda obj: obj.number % 2 == 1)
+
+
+def test_dump_array(knights):
+    numpy = pytest.importorskip('numpy')
+    numeric_schema = NumericSchema()
+    result = numeric_schema.dump_array(iter(knights))
+    assert isinstance(result, numpy.ndarray)
+    assert result.dtype.names == ('number', 'ratio', 'odd')
+    assert result['number'].tolist() == [2, 3, 4]
+    assert result['ratio'].tolist() == [1.0, 1.5, 2.0]
+    assert result['odd'].tolist() == [False, True, False]
+    assert result['number'].dtype == numpy.dtype(int)
+    assert result['ratio'].dtype == numpy.dtype(float)
+    assert result['odd'].dtype == numpy.dtype(bool)
+
+
+def test_dump_array_columns(knights):
+    numpy = pytest.importorskip('numpy')
+    numeric_schema = NumericSchema(ordered=True)
+    result = numeric_schema.dump_array(knights, columns=True)
+    assert type(result) == OrderedDict
+    assert list(result) == ['number', 'ratio', 'odd']
+    assert all(isinstance(c, numpy.ndarray) for c in result.values())
+    assert result['number'].tolist() == [2, 3, 4]
+    assert result['odd'].tolist() == [False, True, False]
+
+
+def test_dump_array_fail_on_non_numeric_fields(knights):
+    with pytest.raises(TypeError):
+        KnightSchema().dump_array(knights)
+
+
+def test_dump_array_fail_without_numpy(knights, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    with pytest.raises(ImportError):
+        NumericSchema().dump_array(knights)
+
+
+@pytest.mark.parametrize(
+    'schema_cls',
+    [KnightSchema,
+     KingWithEmbeddedSubjectsClassSchema,
+     KingWithReferencedSubjectsStrSchema]
+)
+def test_pickle_schema(schema_cls, arthur):
+    king_schema = schema_cls(many=True)
+    expected = king_schema.dump([arthur])  # lazily creates dump functions
+    king_schema.dump_json([arthur])
+    unpickled = pickle.loads(pickle.dumps(king_schema))
+    assert unpickled.many
+    assert unpickled.dump([arthur]) == expected
+
+
+def test_dump_parallel(knights):
+    knight_schema = KnightSchema(ordered=True)
+    objs = knights * 5
+    result = knight_schema.dump_parallel(iter(objs), workers=2, chunk_size=4)
+    assert result == [knight_schema.dump(obj) for obj in objs]
+    assert all(type(x) == OrderedDict for x in result)
+
+
+def test_dump_parallel_executor(knights):
+    knight_schema = KnightSchema()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = knight_schema.dump_parallel(knights, chunk_size=2,
+                                             executor=executor)
+    assert result == [knight_schema.dump(obj) for obj in knights]
+    assert knight_schema.dump_parallel([], workers=1) == []
+
+
+def test_dump_with_executor(knights):
+    # the getter only succeeds if called concurrently for all knights
+    barrier = threading.Barrier(len(knights), timeout=5)
+    threads = set()
+
+    def slow_get(obj):
+        barrier.wait()
+        threads.add(threading.get_ident())
+        return obj.name.upper()
+
+    class SlowSchema(schema.Schema):
+        name = fields.String()
+        shout = fields.String(get=slow_get, blocking=True)
+        number = fields.Integer()
+
+    slow_schema = SlowSchema(many=True, ordered=True)
+    with ThreadPoolExecutor(max_workers=len(knights)) as executor:
+        result = slow_schema.dump(iter(knights), executor=executor)
+    expected = [
+        OrderedDict([('name', 'Bedevere'), ('shout', 'BEDEVERE'),
+                     ('number', 2)]),
+        OrderedDict([('name', 'Lancelot'), ('shout', 'LANCELOT'),
+                     ('number', 3)]),
+        OrderedDict([('name', 'Galahad'), ('shout', 'GALAHAD'),
+                     ('number', 4)]),
+    ]
+    assert result == expected
+    assert len(threads) == len(knights)
+
+
+def test_dump_single_with_executor(lancelot):
+
+    class SlowSchema(schema.Schema):
+        name = fields.String(blocking=True)
+        born = fields.Date(blocking=True)
+        number = fields.Integer()
+
+    slow_schema = SlowSchema()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = slow_schema.dump(lancelot, executor=executor)
+        # no blocking fields: executor doesn't matter
+        assert (KnightSchema().dump(lancelot, executor=executor) ==
+                KnightSchema().dump(lancelot))
+    expected = {'name': 'Lancelot', 'born': '0503-03-03', 'number': 3}
+    assert result == expected
+
+
+async def async_upper_name(obj):
+    await asyncio.sleep(0)
+    return obj.name.upper()
+
+
+async def async_subjects(obj):
+    await asyncio.sleep(0)
+    return obj.subjects
+
+
+class AsyncKnightSchema(KnightSchema):
+    shout = fields.String(get=async_upper_name)
+
+
+class AsyncKingSchema(KnightSchema):
+    subjects = fields.Embed(schema=__name__ + '.AsyncKnightSchema',
+                            only=['name', 'shout'], many=True)
+    subject_shouts = fields.Reference(
+        schema=__name__ + '.AsyncKnightSchema', field='shout', many=True,
+        get=async_subjects
+    )
+    subject_names = fields.Reference(schema=KnightSchema, field='name',
+                                     many=True, get=async_subjects)
+
+
+def test_dump_async(lancelot):
+    knight_schema = AsyncKnightSchema(only=['name', 'shout'])
+    result = asyncio.run(knight_schema.dump_async(lancelot))
+    assert result == {'name': 'Lancelot', 'shout': 'LANCELOT'}
+
+
+@pytest.mark.parametrize('limit', [None, 1, 2])
+def test_dump_async_many(knights, limit):
+    knight_schema = AsyncKnightSchema(many=True, ordered=True)
+    result = asyncio.run(knight_schema.dump_async(knights, limit=limit))
+    assert [list(r) for r in result] == [
+        ['title', 'name', 'number', 'born', 'shout']
+    ] * 3
+    assert [r['shout'] for r in result] == ['BEDEVERE', 'LANCELOT', 'GALAHAD']
+
+
+def test_dump_async_linked(arthur):
+    king_schema = AsyncKingSchema(only=['name', 'subjects', 'subject_shouts',
+                                        'subject_names'])
+    result = asyncio.run(king_schema.dump_async(arthur))
+    expected = {
+        'name': 'Arthur',
+        'subjects': [
+            {'name': 'Bedevere', 'shout': 'BEDEVERE'},
+            {'name': 'Lancelot', 'shout': 'LANCELOT'},
+            {'name': 'Galahad', 'shout': 'GALAHAD'},
+        ],
+        'subject_shouts': ['BEDEVERE', 'LANCELOT', 'GALAHAD'],
+        'subject_names': ['Bedevere', 'Lancelot', 'Galahad'],
+    }
+    assert result == expected
+
+    arthur.subjects = None
+    result = asyncio.run(king_schema.dump_async(arthur))
+    assert result['subjects'] is None
+    assert result['subject_shouts'] is None
+
+
+def test_dump_async_sync_schema(arthur):
+    # no awaiting necessary, even for schemas linking to themselves
+    arthur.boss = arthur
+    king_schema = KingSchemaEmbedSelf()
+    result = asyncio.run(king_schema.dump_async(arthur))
+    assert result == king_schema.dump(arthur)
+    assert king_schema._async_field_names == ()
+
+
+class AsyncTreeSchema(schema.Schema):
+    shout = fields.String(get=async_upper_name)
+    subjects = fields.Embed(schema=__name__ + '.AsyncTreeSchema', many=True)
+
+
+def test_dump_async_self_linking(arthur, knights):
+    for knight in knights:
+        knight.subjects = []
+    result = asyncio.run(AsyncTreeSchema().dump_async(arthur))
+    expected = {
+        'shout': 'ARTHUR',
+        'subjects': [
+            {'shout': 'BEDEVERE', 'subjects': []},
+            {'shout': 'LANCELOT', 'subjects': []},
+            {'shout': 'GALAHAD', 'subjects': []},
+        ]
+    }
+    assert result == expected
+
+
+class CourtSchema(schema.Schema):
+    king = fields.Embed(schema=KingWithEmbeddedSubjectsClassSchema,
+                        ordered=True)
+    boss = fields.Embed(schema=KingSchemaEmbedSelf, attr='king')
+
+
+class CustomEmbed(fields.Embed):
+    def pack(self, val):
+        return 'custom'
+
+
+class CustomEmbedSchema(schema.Schema):
+    king = CustomEmbed(schema=KnightSchema)
+
+
+@pytest.mark.parametrize('depth', [0, 1, 2, 3])
+@pytest.mark.parametrize('many', [False, True])
+def test_dump_inlined_embed(arthur, monkeypatch, depth, many):
+    arthur.boss = None
+    court = King('', 'Court', 0, date(500, 1, 1))
+    court.king = arthur
+    empty_court = King('', 'Empty', 0, date(500, 1, 1))
+    empty_court.king = None
+
+    expected_king = OrderedDict([
+        ('title', 'King'),
+        ('name', 'Arthur'),
+        ('number', 1),
+        ('born', '0501-01-01'),
+        ('subjects', [
+            {'title': 'Sir', 'name': 'Bedevere', 'number': 2,
+             'born': '0502-02-02'},
+            {'title': 'Sir', 'name': 'Lancelot', 'number': 3,
+             'born': '0503-03-03'},
+            {'title': 'Sir', 'name': 'Galahad', 'number': 4,
+             'born': '0504-04-04'},
+        ]),
+    ])
+    expected_boss = {
+        'title': 'King',
+        'name': 'Arthur',
+        'number': 1,
+        'born': '0501-01-01',
+        'boss': None,
+    }
+    expected = [
+        {'king': expected_king, 'boss': expected_boss},
+        {'king': None, 'boss': None},
+    ]
+
+    monkeypatch.setattr(schema, 'inline_depth', depth)
+    schema.function_cache.clear()
+    court_schema = CourtSchema(many=many)
+    if many:
+        result = court_schema.dump([court, empty_court])
+    else:
+        result = [court_schema.dump(court), court_schema.dump(empty_court)]
+    assert result == expected
+    assert type(result[0]['king']) == OrderedDict
+
+
+def test_dump_inlined_embed_custom_pack(arthur):
+    arthur.king = arthur
+    assert CustomEmbedSchema().dump(arthur) == {'king': 'custom'}
+
+
+@pytest.mark.parametrize(
+    'schema_cls',
+    [KingWithEmbeddedSubjectsClassSchema,
+     KingWithReferencedSubjectsClassSchema,
+     KingSchemaEmbedSelf]
+)
+def test_dump_profile(schema_cls, arthur):
+    arthur.boss = arthur
+    king_schema = schema_cls(profile=True)
+    assert king_schema.dump(arthur) == schema_cls().dump(arthur)
+    assert king_schema.dump(arthur) == schema_cls().dump(arthur)
+
+    report = king_schema.profile_report()
+    assert list(report) == list(king_schema._fields)
+    for node in report.values():
+        assert node['calls'] == 2
+        assert node['get_seconds'] >= 0
+        assert node['pack_seconds'] >= 0
+
+    if schema_cls is KingSchemaEmbedSelf:
+        linked_field_name = 'boss'
+    else:
+        linked_field_name = 'subjects'
+    nested_report = report[linked_field_name]['fields']
+    if schema_cls is KingWithReferencedSubjectsClassSchema:
+        assert list(nested_report) == ['name']
+        assert nested_report['name']['calls'] == 6
+    elif schema_cls is KingSchemaEmbedSelf:
+        assert list(nested_report) == ['title', 'name', 'number', 'born']
+        assert nested_report['name']['calls'] == 2
+    else:
+        assert list(nested_report) == ['title', 'name', 'number', 'born']
+        assert nested_report['name']['calls'] == 6
+    assert report['name']['fields'] == {}
+
+    # reports are snapshots
+    king_schema.dump(arthur)
+    assert report['name']['calls'] == 2
+
+    king_schema.profile_report(reset=True)
+    report = king_schema.profile_report()
+    assert report[linked_field_name]['calls'] == 0
+    assert all(node['calls'] == 0
+               for node in report[linked_field_name]['fields'].values())
+
+
+def test_dump_profile_other_dumps(arthur, knights):
+    king_schema = KingWithEmbeddedSubjectsClassSchema(profile=True)
+    plain_schema = KingWithEmbeddedSubjectsClassSchema()
+    assert king_schema.dump_json(arthur) == plain_schema.dump_json(arthur)
+    assert list(king_schema.dump_iter([arthur])) == [plain_schema.dump(arthur)]
+    with ThreadPoolExecutor() as executor:
+        assert king_schema.dump(arthur, executor=executor) == \
+            plain_schema.dump(arthur)
+    stream = io.StringIO()
+    king_schema.dump_to(stream, [arthur])
+    assert stream.getvalue() == '[{}]'.format(plain_schema.dump_json(arthur))
+    assert king_schema.profile_report()['name']['calls'] == 4
+    with pytest.raises(ValueError):
+        king_schema.dump_parallel([arthur])
+
+    # JSON of linked objects doesn't depend on the output of their schemas
+    knight_schema = KnightSchema(output='tuple', many=True, profile=True)
+    assert json.loads(knight_schema.dump_json(knights)) == \
+        KnightSchema(many=True).dump(knights)
+
+
+def test_dump_profile_not_enabled(arthur):
+    with pytest.raises(ValueError):
+        KnightSchema().profile_report()
+
+
+def test_dump_metrics(arthur):
+    registry = metrics.MetricsRegistry()
+    king_schema = KingWithEmbeddedSubjectsClassSchema(metrics=registry,
+                                                      many=True)
+    knight_schema = king_schema._fields['subjects']._schema_inst
+    assert knight_schema._metrics is None
+    expected = KingWithEmbeddedSubjectsClassSchema(many=True).dump([arthur])
+    assert king_schema.dump([arthur]) == expected
+    assert king_schema.dump_json([arthur]) == json.dumps(expected)
+
+    name = __name__ + '.KingWithEmbeddedSubjectsClassSchema'
+    snapshot = registry.snapshot()
+    assert list(snapshot) == [name]
+    assert snapshot[name]['dumps'] == 2
+    assert snapshot[name]['objects'] == 2
+    assert snapshot[name]['size'] == len(json.dumps(expected))
+
+
+class BlockingKnightSchema(KnightSchema):
+    name = fields.String(blocking=True)
+
+
+def test_dump_metrics_executor_async(lancelot, bedevere):
+    registry = metrics.MetricsRegistry()
+    blocking_schema = BlockingKnightSchema(many=True, metrics=registry)
+    with ThreadPoolExecutor() as executor:
+        assert blocking_schema.dump([lancelot, bedevere],
+                                    executor=executor) == \
+            KnightSchema(many=True).dump([lancelot, bedevere])
+    async_schema = AsyncKnightSchema(only=['name', 'shout'],
+                                     metrics=registry)
+    assert asyncio.run(async_schema.dump_async(lancelot)) == \
+        {'name': 'Lancelot', 'shout': 'LANCELOT'}
+
+    snapshot = registry.snapshot()
+    blocking = snapshot[__name__ + '.BlockingKnightSchema']
+    assert (blocking['dumps'], blocking['objects']) == (1, 2)
+    knights = snapshot[__name__ + '.AsyncKnightSchema']
+    assert (knights['dumps'], knights['objects']) == (1, 1)
+    assert knights['sampled'] == 1
+    assert knights['seconds'] > 0
+
+
+@pytest.mark.parametrize(
+    'field',
+    [fields.Embed(schema=KnightSchema, many=True, metrics=True),
+     fields.Reference(schema=KnightSchema, field='name', many=True,
+                      metrics=True)]
+)
+def test_dump_metrics_linked(field, arthur):
+    class KingSchema(KnightSchema):
+        subjects = field
+
+    metrics.registry.reset()
+    king_schema = KingSchema(many=True)
+    king_schema.dump([arthur, arthur])
+    king_schema.dump_json([arthur])
+
+    # linked objects are not inlined into dumps of schemas with metrics
+    knights = metrics.registry.snapshot()[__name__ + '.KnightSchema']
+    assert knights['dumps'] == 3
+    assert knights['objects'] == 9
+    assert knights['size'] > 0
+    assert knights['sampled'] == 3
+
+
+def test_dump_metrics_default_registry(arthur):
+    assert KnightSchema(metrics=True)._metrics is metrics.registry
+    assert KnightSchema(metrics=False)._metrics is None
+    with pytest.raises(TypeError):
+        KnightSchema(metrics='yes')
+
+    knight_schema = pickle.loads(pickle.dumps(KnightSchema(metrics=True)))
+    assert knight_schema._metrics is metrics.registry
+
+
+@pytest.mark.parametrize('output', ['tuple', 'namedtuple', 'record'])
+def test_dump_output(output, lancelot, arthur):
+    knight_schema = KnightSchema(output=output)
+    assert knight_schema.output == output
+    assert knight_schema.header == ('title', 'name', 'number', 'born')
+
+    row = knight_schema.dump(lancelot)
+    assert tuple(row) == ('Sir', 'Lancelot', 3, '0503-03-03')
+    assert knight_schema.as_dict(row) == KnightSchema().dump(lancelot)
+    if output != 'tuple':
+        assert row.name == 'Lancelot'
+        assert row._asdict() == KnightSchema().dump(lancelot)
+        assert type(row) is type(KnightSchema(output=output).dump(arthur))
+    assert pickle.loads(pickle.dumps(row)) == row
+
+    many_schema = KnightSchema(output=output, many=True)
+    assert many_schema.dump([lancelot, lancelot]) == [row, row]
+    assert list(many_schema.dump_iter([lancelot])) == [row]
+    profile_schema = KnightSchema(output=output, profile=True)
+    assert profile_schema.dump(lancelot) == row
+
+    # output doesn't affect JSON
+    assert knight_schema.dump_json(lancelot) == \
+        KnightSchema().dump_json(lancelot)
+
+
+@pytest.mark.parametrize('output', ['tuple', 'namedtuple', 'record'])
+def test_dump_output_nested(output, arthur):
+    class KingRowSchema(schema.Schema):
+        name = fields.String()
+        subjects = fields.Embed(schema=KnightSchema, many=True,
+                                output=output, only='name')
+
+    king_schema = KingRowSchema(output=output)
+    row = king_schema.dump(arthur)
+    assert [tuple(r) for r in row[1]] == [('Bedevere',), ('Lancelot',),
+                                          ('Galahad',)]
+
+
+def test_dump_output_names():
+    class WeirdSchema(schema.Schema):
+        at__id = fields.Integer(val=1)
+        _private = fields.Integer(val=2)
+        class_ = fields.Integer(val=3)
+
+    weird_schema = WeirdSchema(output='record')
+    assert weird_schema.header == ('@id', '_private', 'class_')
+    row = weird_schema.dump(None)
+    assert row._fields == ('_0', '_1', 'class_')
+    assert row._0 == row[0] == 1
+    assert row[1:] == (2, 3)
+    assert row._asdict() == {'@id': 1, '_private': 2, 'class_': 3}
+    with pytest.raises(AttributeError):
+        row.foo = 'bar'  # records have slots only
+
+
+def test_dump_output_invalid():
+    with pytest.raises(ValueError):
+        KnightSchema(output='list')
+    with pytest.raises(ValueError):
+        KnightSchema(output='tuple', ordered=True)
+
+
+@pytest.mark.parametrize('link', ['embed', 'reference'])
+def test_dump_memoize(link, arthur, lancelot):
+    calls = []
+
+    def get_name(obj):
+        calls.append(obj)
+        return obj.name
+
+    class NameSchema(schema.Schema):
+        name = fields.String(get=get_name)
+
+    if link == 'embed':
+        boss_field = fields.Embed(schema=NameSchema, memoize=True)
+    else:
+        boss_field = fields.Reference(schema=NameSchema, field='name',
+                                      memoize=True)
+
+    class BossSchema(schema.Schema):
+        name = fields.String()
+        boss = boss_field
+
+    lancelot.boss = arthur
+    arthur.boss = arthur
+    boss_schema = BossSchema(many=True)
+    assert boss_schema._fields['boss'].memoize
+    objs = [lancelot, arthur, lancelot]
+    expected = [{'name': 'Lancelot'}, {'name': 'Arthur'}, {'name': 'Lancelot'}]
+    if link == 'embed':
+        for e in expected:
+            e['boss'] = {'name': 'Arthur'}
+    else:
+        for e in expected:
+            e['boss'] = 'Arthur'
+
+    assert boss_schema.dump(objs) == expected
+    assert calls == [arthur]  # packed once per dump
+    result = boss_schema.dump(objs)
+    assert len(calls) == 2  # ... but not across dumps
+    if link == 'embed':
+        assert result[0]['boss'] is result[1]['boss']
+
+    assert boss_schema.dump_json(objs) == json.dumps(expected)
+    assert len(calls) == 3
+    assert list(BossSchema(many=True).dump_iter(objs)) == expected
+    assert BossSchema().dump(lancelot) == expected[0]
+    assert boss_schema.dump_columns(objs)['boss'] == \
+        [e['boss'] for e in expected]
+
+
+def test_dump_memoize_lazy(arthur):
+    class NameSchema(schema.Schema):
+        name = fields.String()
+
+    class BossSchema(schema.Schema):
+        name = fields.String()
+        boss = fields.Embed(schema=NameSchema, memoize=True)
+        boss_name = fields.Reference(schema=NameSchema, field='name',
+                                     attr='boss', memoize=True)
+
+    refs = []
+
+    def knights():
+        for number in range(3):
+            boss = Knight('King', 'Boss', number, arthur.born)
+            refs.append(weakref.ref(boss))
+            knight = Knight('Sir', 'Knight', number, arthur.born)
+            knight.boss = boss
+            yield knight
+
+    expected = {'name': 'Knight', 'boss': {'name': 'Boss'},
+                'boss_name': 'Boss'}
+    stream = BossSchema().dump_iter(knights())
+    assert next(stream) == expected
+    assert next(stream) == expected
+    assert refs[0]() is None  # not kept by the memo dicts
+    assert list(stream) == [expected]
+
+
+def test_dump_cache(arthur, lancelot, bedevere):
+    knight_cache = cache.ResultCache(key=lambda knight: knight.name,
+                                     version=lambda knight: knight.number)
+    knight_schema = KnightSchema(many=True, cache=knight_cache)
+    knights = [lancelot, bedevere, lancelot]
+    expected = KnightSchema(many=True).dump(knights)
+
+    assert knight_schema.dump(knights) == expected
+    assert knight_cache.stats()['misses'] == 2
+    assert knight_cache.stats()['hits'] == 1
+    assert list(knight_schema.dump_iter(knights)) == expected
+    assert knight_cache.stats()['hits'] == 4
+
+    lancelot.title = 'Lord'  # same number: old result gets used
+    assert knight_schema.dump([lancelot]) == expected[:1]
+    lancelot.number = 5  # changed version: marshalled again
+    assert knight_schema.dump([lancelot])[0]['number'] == 5
+
+    # JSON results are cached separately
+    json_knights = json.loads(knight_schema.dump_json(knights))
+    assert json_knights == KnightSchema(many=True).dump(knights)
+    assert knight_schema.dump_json(knights) == json.dumps(json_knights)
+
+    # other schemas (and single objects) share the cache, not the results
+    single_schema = KnightSchema(only='name', cache=knight_cache)
+    assert single_schema.dump(bedevere) == {'name': 'Bedevere'}
+
+
+def test_dump_cache_embed(arthur):
+    knight_cache = cache.ResultCache(key=id)
+
+    class CachedKingSchema(KnightSchema):
+        subjects = fields.Embed(schema=KnightSchema, many=True,
+                                cache=knight_cache)
+
+    king_schema = CachedKingSchema()
+    expected = KingWithEmbeddedSubjectsClassSchema().dump(arthur)
+    assert king_schema.dump(arthur) == expected
+    assert king_schema.dump(arthur) == expected
+    assert king_schema.dump_json(arthur) == json.dumps(expected)
+    assert knight_cache.stats()['hits'] == 3
+    assert knight_cache.stats()['misses'] == 6
+
+
+def test_dump_cache_other_fields(lancelot):
+    knight_cache = cache.ResultCache(key=id)
+    knight_schema = KnightSchema(only='name', cache=knight_cache)
+    other_schema = KnightSchema(
+        only='name', cache=knight_cache,
+        include={'name': fields.String(get=lambda knight: 'Other')}
+    )
+    assert knight_schema.dump(lancelot) == {'name': 'Lancelot'}
+    assert other_schema.dump(lancelot) == {'name': 'Other'}
+    assert knight_schema.dump_json(lancelot) == '{"name": "Lancelot"}'
+    assert other_schema.dump_json(lancelot) == '{"name": "Other"}'
+
+    # equal schemas share results
+    assert KnightSchema(only='name', cache=knight_cache).dump(lancelot) == \
+        {'name': 'Lancelot'}
+    assert knight_cache.stats()['hits'] == 1
+
+
+def test_dump_cache_executor_async(lancelot, bedevere):
+    calls = []
+
+    def get_name(knight):
+        calls.append(knight)
+        return knight.name
+
+    class SlowKnightSchema(KnightSchema):
+        name = fields.String(get=get_name, blocking=True)
+
+    knight_cache = cache.ResultCache(key=id)
+    knights = [lancelot, bedevere]
+    expected = KnightSchema(many=True).dump(knights)
+    slow_schema = SlowKnightSchema(many=True, cache=knight_cache)
+    with ThreadPoolExecutor() as executor:
+        assert slow_schema.dump(knights, executor=executor) == expected
+        assert slow_schema.dump(knights, executor=executor) == expected
+        assert SlowKnightSchema(cache=knight_cache).dump(
+            lancelot, executor=executor) == expected[0]
+    assert len(calls) == 2
+    assert knight_cache.stats()['hits'] == 3
+
+    async_cache = cache.ResultCache(key=id)
+    async_schema = AsyncKnightSchema(only=['name', 'shout'], many=True,
+                                     cache=async_cache)
+    expected = [{'name': 'Lancelot', 'shout': 'LANCELOT'},
+                {'name': 'Bedevere', 'shout': 'BEDEVERE'}]
+    assert asyncio.run(async_schema.dump_async(knights)) == expected
+    assert asyncio.run(async_schema.dump_async(knights, limit=1)) == expected
+    assert async_cache.stats()['hits'] == 2
+
+    with pytest.raises(ValueError):
+        slow_schema.dump_parallel(knights)
+
+
+def test_dump_cache_invalid():
+    with pytest.raises(TypeError):
+        KnightSchema(cache={})
+
+
+class GrailBookSchema(schema.Schema):
+    title = fields.String()
+    author = fields.Embed(schema=KnightSchema)
+    coauthors = fields.Embed(schema=KnightSchema, many=True)
+    reviewer = fields.Reference(schema=KnightSchema, field='name')
+
+
+@pytest.fixture
+def grail(arthur, lancelot, bedevere):
+    grail = Knight('Book', 'Grail', 1, date(500, 1, 1))
+    grail.author = arthur
+    grail.coauthors = [lancelot, bedevere]
+    grail.reviewer = lancelot
+    return grail
+
+
+@pytest.mark.parametrize(
+    'kwargs, expected',
+    [({'only': 'title'},
+      {'title': 'Book'}),
+     ({'only': ['title', 'reviewer']},
+      {'title': 'Book', 'reviewer': 'Lancelot'}),
+     ({'only': {'author': ['name'], 'coauthors': 'number'}},
+      {'author': {'name': 'Arthur'},
+       'coauthors': [{'number': 3}, {'number': 2}]}),
+     ({'only': ['title', {'author': None}]},
+      {'title': 'Book',
+       'author': {'title': 'King', 'name': 'Arthur', 'number': 1,
+                  'born': '0501-01-01'}}),
+     ({'exclude': ['author', 'coauthors']},
+      {'title': 'Book', 'reviewer': 'Lancelot'}),
+     ({'exclude': ['coauthors', {'author': ['title', 'born', 'number']}]},
+      {'title': 'Book', 'author': {'name': 'Arthur'},
+       'reviewer': 'Lancelot'})]
+)
+def test_dump_selection(kwargs, expected, grail):
+    grail_schema = GrailBookSchema()
+    assert grail_schema.dump(grail, **kwargs) == expected
+    assert grail_schema.dump(grail, **kwargs) == expected
+    assert json.loads(grail_schema.dump_json(grail, **kwargs)) == expected
+
+    # the schema itself stays the same
+    assert grail_schema.dump(grail) == GrailBookSchema().dump(grail)
+
+
+@pytest.mark.parametrize('selection', [[], (), {}, ''])
+def test_dump_selection_empty(selection, grail):
+    # just like on schema object creation: empty selections select all
+    grail_schema = GrailBookSchema()
+    expected = GrailBookSchema(only=selection).dump(grail)
+    assert expected == grail_schema.dump(grail)
+    assert grail_schema.dump(grail, only=selection) == expected
+    assert grail_schema.dump(grail, exclude=selection) == expected
+    assert grail_schema.dump_one(grail, only=selection) == expected
+    assert grail_schema.dump_many([grail], only=selection) == [expected]
+    assert json.loads(grail_schema.dump_json(grail, only=selection)) == \
+        expected
+    assert grail_schema.dump(grail, only=selection, exclude='title') == \
+        GrailBookSchema(only=selection, exclude='title').dump(grail)
+
+    # empty nested selections select all fields of linked objects
+    assert grail_schema.dump(grail, only={'author': selection}) == \
+        {'author': expected['author']}
+    assert grail_schema.dump(grail, exclude={'author': selection}) == \
+        expected
+
+
+def test_dump_selection_cached(grail):
+    grail_schema = GrailBookSchema(many=True)
+    dump = grail_schema.dump([grail], only=['title', {'author': 'name'}])
+    assert dump == [{'title': 'Book', 'author': {'name': 'Arthur'}}]
+    variant = grail_schema._selected(['title', {'author': 'name'}], None)
+    assert grail_schema._selected(('title', {'author': ['name']}),
+                                 None) is variant
+    assert grail_schema._selected({'author': 'name', 'title': None},
+                                 None) is variant
+    assert grail_schema._selected(['title'], None) is not variant
+    assert variant.many
+    assert variant._dump_fields is variant._dump_fields
+
+    # bounded per-schema cache
+    grail_schema._selections.maxsize = 1
+    grail_schema._selected(['title'], None)
+    assert grail_schema._selected(['title', {'author': 'name'}],
+                                 None) is not variant
+
+
+def test_dump_selection_shared_functions(grail):
+    only = ['title', {'author': 'name'}]
+    GrailBookSchema().dump(grail, only=only)
+    with schema._recording_code() as recorded:
+        for _ in range(5):
+            grail_schema = GrailBookSchema()
+            assert grail_schema.dump(grail, only=only) == \
+                {'title': 'Book', 'author': {'name': 'Arthur'}}
+
+            # variants evicted from the per-schema cache share functions too
+            grail_schema._selections.maxsize = 1
+            grail_schema.dump(grail, only='title')
+            grail_schema.dump(grail, only=only)
+    assert recorded == []
+
+
+def test_dump_selection_result_cache(grail):
+    grail_schema = GrailBookSchema(cache=cache.ResultCache(key=id))
+    only_name = ['title', {'author': ['name']}]
+    assert grail_schema.dump(grail, only=only_name) == \
+        {'title': 'Book', 'author': {'name': 'Arthur'}}
+    expected = GrailBookSchema().dump(grail, only=['title', 'author'])
+    assert grail_schema.dump(grail, only=['title', 'author']) == expected
+    assert json.loads(grail_schema.dump_json(grail, only=only_name)) == \
+        {'title': 'Book', 'author': {'name': 'Arthur'}}
+    assert json.loads(grail_schema.dump_json(grail, exclude='coauthors')) == \
+        GrailBookSchema().dump(grail, exclude='coauthors')
+
+
+def test_dump_selection_result_cache_tokens(monkeypatch, grail):
+    grail_cache = cache.ResultCache(key=id)
+    selections = [['title', {'author': 'name'}],
+                  ['title', {'author': 'number'}],
+                  {'coauthors': 'name'}]
+    for _ in range(50):
+        for only in selections:
+            grail_schema = GrailBookSchema(cache=grail_cache)
+            grail_schema.dump(grail, only=only)
+    assert len(grail_cache._tokens) == len(selections)
+    assert grail_cache.stats()['misses'] == len(selections)
+
+    # fingerprints of schemas with new fields every time get forgotten
+    monkeypatch.setattr(cache, 'token_cache_size', 10)
+    grail_cache = cache.ResultCache(key=id)
+    for _ in range(50):
+        GrailBookSchema(include={'isbn': fields.String(val='1')},
+                        cache=grail_cache).dump(grail)
+    assert len(grail_cache._tokens) == 10
+
+
+def test_dump_selection_invalid(grail):
+    grail_schema = GrailBookSchema()
+    with pytest.raises(ValueError):
+        grail_schema.dump(grail, only='title', exclude='author')
+    with pytest.raises(ValueError):
+        grail_schema.dump(grail, only='isbn')
+    with pytest.raises(ValueError):
+        grail_schema.dump(grail, only={'author': 'isbn'})
+    with pytest.raises(ValueError):
+        grail_schema.dump(grail, only={'reviewer': 'name'})  # no Embed
+    with pytest.raises(ValueError):
+        grail_schema.dump(grail, only=['author', {'author': 'name'}])
+    with pytest.raises(TypeError):
+        grail_schema.dump(grail, only=[1])
+
+
+@pytest.mark.parametrize('many', [False, True])
+def test_dump_one_many(many, lancelot, bedevere):
+    knight_schema = KnightSchema(many=many)
+    expected = KnightSchema().dump(lancelot)
+    assert knight_schema.dump_one(lancelot) == expected
+    assert knight_schema.dump_many([lancelot, bedevere]) == \
+        KnightSchema(many=True).dump([lancelot, bedevere])
+    assert knight_schema.dump_many(iter([lancelot])) == [expected]
+    assert knight_schema.dump_one(lancelot, only='name') == \
+        {'name': 'Lancelot'}
+    assert knight_schema.dump_many([lancelot], exclude='born') == \
+        [{'title': 'Sir', 'name': 'Lancelot', 'number': 3}]
+
+    # the function matching many is reused
+    if many:
+        assert knight_schema._dump_fields_many is knight_schema._dump_fields
+    else:
+        assert knight_schema._dump_fields_one is knight_schema._dump_fields
+
+
+def test_dump_one_many_profile_metrics(lancelot):
+    registry = metrics.MetricsRegistry()
+    knight_schema = KnightSchema(profile=True, metrics=registry)
+    knight_schema.dump_many([lancelot, lancelot])
+    knight_schema.dump_one(lancelot)
+    assert knight_schema.profile_report()['name']['calls'] == 3
+    snapshot = registry.snapshot()[__name__ + '.KnightSchema']
+    assert snapshot['dumps'] == 2
+    assert snapshot['objects'] == 3
+
+
+def test_variant():
+    schema.variant_cache.clear()
+    knight_schema = KnightSchema.variant(many=True)
+    assert knight_schema.many
+    assert KnightSchema.variant(many=True) is knight_schema
+    assert KnightSchema.variant(many=True, ordered=False) is knight_schema
+    assert KnightSchema.variant(many=True, only='name') is not knight_schema
+    assert KnightSchema.variant(only=['name', 'title']) is \
+        KnightSchema.variant(only=('name', 'title'))
+    assert KnightDictSchema.variant(many=True) is not knight_schema
+    assert KnightSchema.variant() is KnightSchema.variant(many=False)
+
+    # linked schemas are shared
+    field = fields.Embed(schema=KnightSchema, many=True)
+    assert field._schema_inst is knight_schema
+    field = fields.Embed(schema=__name__ + '.KnightSchema', many=True)
+    assert field._schema_inst is knight_schema
+
+    # unhashable arguments
+    class ContextKnightSchema(KnightSchema):
+        def __init__(self, *, context=None, **kwargs):
+            super().__init__(**kwargs)
+            self.context = context
+
+    context = bytearray(b'unhashable')
+    assert ContextKnightSchema.variant(context=context) is not \
+        ContextKnightSchema.variant(context=context)
+    assert ContextKnightSchema.variant(context=[1]).context == [1]
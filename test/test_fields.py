@@ -72,6 +72,28 @@ def test_illegal_attr_fails(cls):
         field = cls(attr='0not;an,identifier')
 
 
+@pytest.mark.parametrize('cls', SIMPLE_FIELDS)
+def test_simple_fields_paths(cls):
+    '''Test creation of simple fields with attr and key paths.'''
+    field = cls(attr='foo.bar.baz', none_safe=True)
+    assert field.attr == 'foo.bar.baz'
+    assert field.none_safe is True
+    field = cls(key=['foo', 0])
+    assert field.key == ['foo', 0]
+    assert field.none_safe is False
+
+
+@pytest.mark.parametrize('cls', SIMPLE_FIELDS)
+def test_illegal_paths_fail(cls):
+    '''Test if supplying illegal attr or key paths raises an error.'''
+    with pytest.raises(ValueError):
+        field = cls(attr='foo..bar')
+    with pytest.raises(ValueError):
+        field = cls(attr='foo.0bar')
+    with pytest.raises(ValueError):
+        field = cls(key=[])
+
+
 @pytest.mark.parametrize('cls', SIMPLE_FIELDS)
 def test_illegal_getter_fails(cls):
     '''Test if supplying a non-callable getter raises an error.'''
@@ -94,6 +116,13 @@ def test_attr_and_getter_fails(cls):
         field = cls(attr='foo', get=lambda obj: 'bar', val='baz')
 
 
+@pytest.mark.parametrize('cls', SIMPLE_FIELDS)
+def test_simple_fields_blocking(cls):
+    '''Test creation of simple fields with blocking.'''
+    assert cls().blocking is False
+    assert cls(get=lambda obj: obj, blocking=True).blocking is True
+
+
 @pytest.mark.parametrize('cls', PASSTHROUGH_FIELDS)
 def test_passthrough_field_no_attrs(cls):
     '''Test simple fields having neither get nor pack attrs ...
@@ -126,6 +155,24 @@ def test_decimal_pack():
     assert fields.Decimal.pack(val) == '1.2345'
 
 
+@pytest.mark.parametrize(
+    'cls, val',
+    [(fields.Date, dt.date(1952, 9, 1)),
+     (fields.DateTime, dt.datetime(1952, 9, 1, 23, 11, 59, 123456)),
+     (fields.Decimal, decimal.Decimal('1.2345')),
+     (fields.Date, None),
+     (fields.DateTime, None),
+     (fields.Decimal, None)]
+)
+def test_pack_template(cls, val):
+    '''Test pack templates are equivalent to pack static methods'''
+    namespace = dict(getattr(cls, 'pack_globals', {}), __builtins__={})
+    namespace['val'] = val
+    mapping = {key: key for key in namespace}
+    code = cls.pack_template.format_map(mapping)
+    assert eval(code, namespace) == cls.pack(val)
+
+
 class SomeClass:
     '''Arbitrary class (to test linked object fields).'''
     def __init__(self, name, number):
@@ -12,3 +12,4 @@ def test_namespace_pollution():
     assert hasattr(lima, 'fields')
     assert hasattr(lima, 'schema')
     assert hasattr(lima, 'Schema')
+    assert hasattr(lima, 'warmup')
@@ -0,0 +1,142 @@
+'''Tests for the metrics module.'''
+import asyncio
+import pickle
+import threading
+
+import pytest
+
+from lima import metrics
+
+
+def test_registry_invalid_sample_rate():
+    for sample_rate in [0, -1, 1.5, None]:
+        with pytest.raises(ValueError):
+            metrics.MetricsRegistry(sample_rate=sample_rate)
+
+
+def test_registry_wrap():
+    registry = metrics.MetricsRegistry(buckets=[1e-3, 1.0])
+    dump = registry.wrap('foo', lambda objs: [str(o) for o in objs], True)
+    assert dump([1, 2, 3]) == ['1', '2', '3']
+    assert dump([4]) == ['4']
+
+    snapshot = registry.snapshot()
+    assert list(snapshot) == ['foo']
+    assert snapshot['foo']['dumps'] == 2
+    assert snapshot['foo']['objects'] == 4
+    assert snapshot['foo']['sampled'] == 2
+    assert snapshot['foo']['seconds'] >= 0
+    assert snapshot['foo']['size'] == 0
+    bounds = [bound for bound, count in snapshot['foo']['histogram']]
+    assert bounds == [1e-3, 1.0, float('inf')]
+    assert sum(count for bound, count in snapshot['foo']['histogram']) == 2
+
+
+def test_registry_wrap_size():
+    registry = metrics.MetricsRegistry()
+    dump = registry.wrap('foo', lambda objs: '[1, 2]', True, size=True)
+    dump([1, 2])
+    dump(iter([1, 2]))  # unknown number of objects
+    snapshot = registry.snapshot()['foo']
+    assert snapshot['objects'] == 2
+    assert snapshot['size'] == 12
+
+
+def test_registry_sample_rate():
+    registry = metrics.MetricsRegistry(sample_rate=3)
+    dump = registry.wrap('foo', str, False)
+    for i in range(7):
+        dump(i)
+    snapshot = registry.snapshot()['foo']
+    assert snapshot['dumps'] == 7
+    assert snapshot['objects'] == 7
+    assert snapshot['sampled'] == 2
+
+
+def test_registry_threads():
+    registry = metrics.MetricsRegistry(sample_rate=5)
+    dump = registry.wrap('foo', lambda objs: list(objs), True)
+
+    def run():
+        for i in range(100):
+            dump([i, i])
+
+    threads = [threading.Thread(target=run) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    run()
+    for thread in threads:
+        thread.join()
+    snapshot = registry.snapshot()['foo']
+    assert snapshot['dumps'] == 500
+    assert snapshot['objects'] == 1000
+    assert snapshot['sampled'] == 100
+    assert registry.snapshot()['foo'] == snapshot  # finished threads folded
+
+
+def test_registry_unsampled_lock_free():
+    class CountingLock:
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.count = 0
+
+        def __enter__(self):
+            self.count += 1
+            return self.lock.__enter__()
+
+        def __exit__(self, *exc_info):
+            return self.lock.__exit__(*exc_info)
+
+    registry = metrics.MetricsRegistry(sample_rate=10)
+    registry._lock = lock = CountingLock()
+    dump = registry.wrap('foo', str, False)
+    dump(1)  # registers the thread's counters
+    count = lock.count
+    for i in range(8):
+        dump(i)
+    assert lock.count == count  # unsampled
+    dump(1)
+    assert lock.count == count + 1  # sampled
+
+
+def test_registry_wrap_extra_args_and_coroutines():
+    registry = metrics.MetricsRegistry()
+    dump = registry.wrap('foo', lambda obj, suffix: str(obj) + suffix, False)
+    assert dump(1, '!') == '1!'
+
+    async def dump_async(objs, limit):
+        await asyncio.sleep(0)
+        return objs[:limit]
+
+    dump_many = registry.wrap('bar', dump_async, True)
+    assert asyncio.run(dump_many([1, 2, 3], 2)) == [1, 2]
+    snapshot = registry.snapshot()
+    assert snapshot['foo']['dumps'] == 1
+    assert (snapshot['bar']['dumps'], snapshot['bar']['objects']) == (1, 2)
+    assert snapshot['bar']['sampled'] == 1
+
+
+def test_registry_reset():
+    registry = metrics.MetricsRegistry()
+    dump = registry.wrap('foo', str, False)
+    dump(1)
+    snapshot = registry.snapshot()
+    registry.reset()
+    assert snapshot['foo']['dumps'] == 1  # snapshots stay the same
+    assert registry.snapshot()['foo']['dumps'] == 0
+    assert registry.snapshot()['foo']['histogram'][0][1] == 0
+    dump(1)
+    assert registry.snapshot()['foo']['dumps'] == 1
+
+
+def test_registry_pickle():
+    registry = metrics.MetricsRegistry(sample_rate=2)
+    registry.wrap('foo', str, False)(1)
+    unpickled = pickle.loads(pickle.dumps(registry))
+    assert unpickled.sample_rate == 2
+    assert unpickled.snapshot() == registry.snapshot()
+    unpickled.wrap('foo', str, False)(1)
+    assert unpickled.snapshot()['foo']['dumps'] == 2
+
+    # the default registry is pickled by reference
+    assert pickle.loads(pickle.dumps(metrics.registry)) is metrics.registry
@@ -72,3 +72,11 @@ def test_register_local_class_error(reg):
 
     with pytest.raises(exc.ClassNotFoundError):
         reg.get('LocallyDefinedClass')
+
+
+def test_iter(reg):
+    '''Test if iterating over a registry yields registered classes.'''
+    assert list(reg) == []
+    reg.register(Schema)
+    reg.register(schema.Schema)
+    assert list(reg) == [Schema, schema.Schema]
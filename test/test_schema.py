@@ -3,6 +3,7 @@ from collections import OrderedDict
 
 import pytest
 
+import lima
 from lima import abc, fields, schema
 from lima.registry import global_registry
 
@@ -73,6 +74,41 @@ class TestHelperFunctions:
         with pytest.raises(NameError):
             func_in_namespace
 
+    def test_make_function_code_cache(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(schema, 'code_cache_dir', str(tmp_path / 'c'))
+        code = 'def func_in_namespace(): return a'
+        my_function = schema._make_function('func_in_namespace',
+                                            code, dict(a=1))
+        assert my_function() == 1
+        cached_files = list((tmp_path / 'c').iterdir())
+        assert len(cached_files) == 1
+
+        # the second time around, nothing gets compiled
+        def fail(*args):
+            raise AssertionError('compile called')
+
+        monkeypatch.setattr(schema, 'compile', fail, raising=False)
+        my_function = schema._make_function('func_in_namespace',
+                                            code, dict(a=2))
+        assert my_function() == 2
+
+        # broken cache files are ignored (and replaced)
+        cached_files[0].write_bytes(b'garbage')
+        monkeypatch.undo()
+        monkeypatch.setattr(schema, 'code_cache_dir', str(tmp_path / 'c'))
+        my_function = schema._make_function('func_in_namespace',
+                                            code, dict(a=3))
+        assert my_function() == 3
+        assert cached_files[0].read_bytes() != b'garbage'
+
+    def test_make_function_unusable_code_cache(self, tmp_path, monkeypatch):
+        not_a_dir = tmp_path / 'file'
+        not_a_dir.write_text('')
+        monkeypatch.setattr(schema, 'code_cache_dir', str(not_a_dir))
+        code = 'def func_in_namespace(): return 1'
+        my_function = schema._make_function('func_in_namespace', code)
+        assert my_function() == 1
+
 
 class TestSchemaDefinition:
     '''Class collecting tests of Schema class definition.'''
@@ -303,6 +339,34 @@ class TestSchemaDefinition:
         assert 'bar' not in TestSchema.__fields__
         assert 'baz' not in TestSchema.__fields__
 
+    def test_schema_inherits_copy_of_fields(self, str_field, int_field):
+        '''Test if schemas get their own copies of inherited fields.'''
+        class BaseSchema(schema.Schema):
+            foo = str_field
+
+        class SameSchema(BaseSchema):
+            pass
+
+        class ChangedSchema(SameSchema):
+            bar = int_field
+
+        assert SameSchema.__fields__ == BaseSchema.__fields__
+        assert SameSchema.__fields__ is not BaseSchema.__fields__
+        assert ChangedSchema.__fields__ is not BaseSchema.__fields__
+        SameSchema.__fields__['baz'] = int_field
+        assert 'baz' not in BaseSchema.__fields__
+        assert list(BaseSchema.__fields__) == ['foo']
+        assert list(ChangedSchema.__fields__) == ['foo', 'bar']
+
+    def test_fail_on_unhashable_exclude(self, str_field):
+        '''Test if unhashable names in exclude raise a TypeError.'''
+        with pytest.raises(TypeError) as excinfo:
+            class TestSchema(schema.Schema):
+                foo = str_field
+                __lima_args__ = {'exclude': [['foo']]}
+
+        assert excinfo.value.args[0].startswith('__lima_args__["exclude"]')
+
     def test_fail_on_nonexistent_fields(self, str_field, int_field):
         '''Test if mentining nonexistent field in exlcude raises an error.'''
         with pytest.raises(ValueError):
@@ -740,3 +804,102 @@ class TestLazyDumpFunctionCreation:
         fn1 = test_schema._dump_field_func('foo')
         fn2 = test_schema._dump_field_func('foo')
         assert fn1 is fn2  # after first eval, the same obj should be returned
+
+
+class TestFunctionCache:
+
+    def test_equivalent_instances_share_functions(self, person_schema_cls):
+        schema1 = person_schema_cls(only=['name', 'number'])
+        schema2 = person_schema_cls(exclude='born')
+        schema3 = person_schema_cls(only=['name', 'number'], many=True)
+        assert schema1._dump_fields is schema2._dump_fields
+        assert schema1._dump_fields is not schema3._dump_fields
+        assert schema1._dump_fields is not person_schema_cls()._dump_fields
+        assert (schema1._dump_field_func('name') is
+                schema3._dump_field_func('name', many=False))
+        assert schema1._dump_fields_json is schema2._dump_fields_json
+
+    def test_linked_schemas_share_functions(self, person_schema_cls):
+
+        class EmbeddingSchema(schema.Schema):
+            person = fields.Embed(schema=person_schema_cls, only='name')
+
+        embed_field = EmbeddingSchema.__fields__['person']
+        person_schema = person_schema_cls(only='name')
+        assert embed_field._schema_inst is not person_schema
+        assert embed_field._pack_func is person_schema._dump_fields
+
+    def test_cache_stats(self, person_schema_cls):
+        schema.function_cache.clear()
+        person_schema_cls()._dump_fields
+        person_schema_cls()._dump_fields
+        stats = schema.function_cache.stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+        assert stats['size'] == 1
+
+
+class TestPrecompile:
+
+    @pytest.fixture
+    def linking_schema_cls(self, person_schema_cls):
+
+        class LinkingSchema(schema.Schema):
+            person = fields.Embed(schema=person_schema_cls, only='name')
+            person_name = fields.Reference(schema=person_schema_cls,
+                                           field='name', attr='person')
+        return LinkingSchema
+
+    def test_precompile(self, linking_schema_cls):
+        linking_schema = linking_schema_cls()
+        report = linking_schema.precompile(json=True)
+        what = [w for w, seconds in report]
+        assert all(seconds >= 0 for w, seconds in report)
+        assert any(w.endswith('LinkingSchema._dump_fields') for w in what)
+        assert any(w.endswith('LinkingSchema._dump_fields_json')
+                   for w in what)
+        assert any(w.endswith('PersonSchema._dump_fields') for w in what)
+        assert any(w.endswith('person_name._pack_func') for w in what)
+
+        assert '_dump_fields' in linking_schema.__dict__
+        for field in linking_schema._fields.values():
+            assert '_schema_inst' in field.__dict__
+            assert '_pack_func' in field.__dict__
+            assert '_pack_json_func' in field.__dict__
+
+        # nothing left to do the second time around
+        assert linking_schema.precompile(json=True) == []
+
+    def test_warmup(self, linking_schema_cls, person_schema_cls):
+
+        class BrokenSchema(schema.Schema):
+            foo = fields.String(attr='foo')
+            foo.attr = 'not an identifier'
+
+        report = lima.warmup([linking_schema_cls, BrokenSchema])
+        assert report['seconds'] >= 0
+        assert [name for name, e in report['errors']] == [
+            BrokenSchema.__module__ + '.' + BrokenSchema.__qualname__
+        ] * 2
+        assert all(isinstance(e, ValueError) for n, e in report['errors'])
+        what = [w for w, seconds in report['compiled']]
+        assert any(w.endswith('LinkingSchema._dump_fields') for w in what)
+        assert not any(w.endswith('_json') for w in what)
+
+        # dump functions of schema objects created later are shared
+        schema.function_cache.clear()
+        lima.warmup([person_schema_cls])
+        misses = schema.function_cache.stats()['misses']
+        person_schema_cls(many=True)._dump_fields
+        assert schema.function_cache.stats()['misses'] == misses
+
+    def test_warmup_background(self, linking_schema_cls):
+        future = lima.warmup([linking_schema_cls], background=True)
+        report = future.result(timeout=5)
+        assert report['errors'] == []
+        assert report['compiled']
+
+    def test_warmup_registry(self):
+        report = lima.warmup()
+        names = [name for name, e in report['errors']]
+        assert __name__ + '.NonLocalSchema' not in names
@@ -88,6 +88,20 @@ def test_vector_context():
     assert util.vector_context('foo') == ['foo']
 
 
+def test_chunks():
+    assert list(util.chunks([], 2)) == []
+    assert list(util.chunks([1, 2, 3], 1)) == [[1], [2], [3]]
+    assert list(util.chunks([1, 2, 3], 2)) == [[1, 2], [3]]
+    assert list(util.chunks(range(4), 2)) == [[0, 1], [2, 3]]
+    assert list(util.chunks((i for i in range(3)), 5)) == [[0, 1, 2]]
+
+    with pytest.raises(ValueError):
+        util.chunks([1, 2, 3], 0)
+
+    with pytest.raises(ValueError):
+        util.chunks([1, 2, 3], 1.5)
+
+
 def test_ensure_iterable():
     # none of these should raise anything
     util.ensure_iterable([1, 2, 3])
@@ -156,3 +170,52 @@ def test_only_instances_of():
 
     with pytest.raises(TypeError):
         util.ensure_only_instances_of([1, 2, 3.3, 4], int)
+
+
+def test_unreified_state():
+
+    class Dummy:
+        def __init__(self):
+            self.foo = 'foo'
+
+        @util.reify
+        def bar(self):
+            return lambda: 'bar'
+
+    dummy = Dummy()
+    assert util.unreified_state(dummy) == {'foo': 'foo'}
+    dummy.bar
+    assert 'bar' in dummy.__dict__
+    assert util.unreified_state(dummy) == {'foo': 'foo'}
+
+
+class TestLRUCache:
+
+    def test_get_and_set(self):
+        cache = util.LRUCache(maxsize=2)
+        assert cache.get('a') is None
+        assert cache.get('a', 42) == 42
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)  # evicts 'b' (least recently used)
+        assert 'b' not in cache
+        assert len(cache) == 2
+        assert cache.get('c') == 3
+        assert cache.pop('c') == 3
+        assert cache.stats() == {'hits': 2, 'misses': 2, 'evictions': 1,
+                                 'size': 1, 'maxsize': 2}
+
+    def test_maxsize(self):
+        cache = util.LRUCache(maxsize=3)
+        for i in range(3):
+            cache.set(i, i)
+        cache.maxsize = 1
+        assert len(cache) == 1
+        assert 2 in cache
+        assert cache.stats()['evictions'] == 2
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.stats()['evictions'] == 0
+        with pytest.raises(ValueError):
+            cache.maxsize = 0